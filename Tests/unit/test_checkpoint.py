@@ -0,0 +1,108 @@
+import copy
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from kss.license.checkpoint import Checkpoint, CheckpointedScan, resolve_pending
+from kss.license.scanner import Scanner
+from kss.license.util import GitHub, NotAvailableException
+
+
+class _FakeScanner(Scanner):
+    def __init__(self, modulename: str, items: list):
+        super().__init__(modulename)
+        self._items = items
+        self.resolved = []
+
+    def should_scan(self) -> bool:
+        return True
+
+    def scan(self) -> list:
+        return []
+
+    def discover(self) -> list:
+        return list(range(len(self._items)))
+
+    def resolve(self, item) -> list:
+        self.resolved.append(item)
+        return copy.deepcopy(self._items[item])
+
+
+def _make_scanners() -> list:
+    return [
+        _FakeScanner('proj', [[{'moduleName': 'ignoreme', 'x-ignored': True}]]),
+        _FakeScanner('proj', [
+            [{'moduleName': name, 'moduleUrl': 'https://github.com/%s/%s' % (org, name)}]
+            for org, name in (('one', 'a'), ('two', 'b'), ('three', 'c'), ('one', 'ignoreme'))
+        ] + [[{'moduleName': 'd', 'moduleLicense': 'MIT', 'x-usedBy': ['a']}]]),
+    ]
+
+
+def _lookup(limit: int):
+    calls = []
+    def lookup(url: str) -> str:
+        calls.append(url)
+        if len(calls) > limit:
+            raise NotAvailableException('Out of GitHub API calls')
+        return 'Apache-2.0' if '/one/' in url else None
+    return lookup
+
+
+class CheckpointTestCase(unittest.TestCase):
+    def setUp(self):
+        self._expected = {}
+        with mock.patch.object(GitHub, 'lookup', side_effect=_lookup(100)):
+            for scanner in _make_scanners():
+                scanner.add_licenses(self._expected)
+        Scanner.reset_ignored()
+
+    def tearDown(self):
+        Scanner.reset_ignored()
+        GitHub.set_deferred(False)
+
+    def test_resume(self):
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint = Checkpoint("%s/checkpoint.json" % directory)
+            licenses = {}
+            with mock.patch.object(GitHub, 'lookup', side_effect=_lookup(1)):
+                with self.assertRaises(NotAvailableException):
+                    CheckpointedScan(_make_scanners(), checkpoint).run('proj', licenses)
+            progress = checkpoint.read()
+            self.assertEqual(progress['sequence'], 2)
+            self.assertEqual(sorted(progress['licenses']), ['a'])
+            self.assertEqual(progress['ignored'], ['ignoreme'])
+
+            Scanner.reset_ignored()
+            licenses = {}
+            scanners = _make_scanners()
+            with mock.patch.object(GitHub, 'lookup', side_effect=_lookup(100)):
+                CheckpointedScan(scanners, checkpoint, resume=True).run('proj', licenses)
+            self.assertEqual(licenses, self._expected)
+            self.assertEqual(scanners[1].resolved, [1, 2, 3, 4])
+
+            with self.assertRaises(ValueError):
+                CheckpointedScan(_make_scanners(), checkpoint, resume=True).run('other', {})
+            checkpoint.remove()
+            self.assertFalse(os.path.exists(checkpoint.filename))
+
+    def test_deferred_lookups(self):
+        GitHub.set_deferred(True)
+        licenses = {}
+        with mock.patch.object(GitHub, 'lookup', side_effect=_lookup(0)):
+            for scanner in _make_scanners():
+                scanner.add_licenses(licenses)
+        self.assertEqual(sorted(name for name, lic in licenses.items()
+                                if lic.get(Scanner.GITHUB_PENDING_KEY, False)),
+                         ['a', 'b', 'c'])
+
+        entries = list(licenses.values())
+        with mock.patch.object(GitHub, 'lookup', side_effect=_lookup(1)):
+            self.assertEqual(resolve_pending(entries), 2)
+        with mock.patch.object(GitHub, 'lookup', side_effect=_lookup(100)):
+            self.assertEqual(resolve_pending(entries), 0)
+        self.assertEqual(licenses, self._expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
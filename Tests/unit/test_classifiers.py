@@ -0,0 +1,21 @@
+import unittest
+
+from kss.license.classifiers import CLASSIFIER_SPDX_IDS, spdx_id_from_classifiers
+from kss.license.util import SPDX
+
+
+class ClassifiersTestCase(unittest.TestCase):
+    def test_spdx_ids_are_valid(self):
+        spdx = SPDX()
+        for licenseid in CLASSIFIER_SPDX_IDS.values():
+            self.assertIsNotNone(spdx.get_entry(licenseid), licenseid)
+
+    def test_spdx_id_from_classifiers(self):
+        mit = 'License :: OSI Approved :: MIT License'
+        gpl = 'License :: OSI Approved :: GNU General Public License v3 (GPLv3)'
+        self.assertEqual(spdx_id_from_classifiers([mit, 'Programming Language :: Python']),
+                         'MIT')
+        self.assertEqual(spdx_id_from_classifiers([mit, mit]), 'MIT')
+        self.assertIsNone(spdx_id_from_classifiers([mit, gpl]))
+        self.assertIsNone(spdx_id_from_classifiers(['License :: OSI Approved :: BSD License']))
+        self.assertIsNone(spdx_id_from_classifiers(None))
@@ -0,0 +1,71 @@
+import base64
+import json
+import os
+import tempfile
+import unittest
+
+from kss.license.database import LicenseDatabase
+from kss.license.util import LicenseText
+
+
+def _write(filename: str, project: str, dependencies: list):
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    with open(filename, 'w') as outfile:
+        json.dump({'dependencies': dependencies, 'generated': {'project': project}}, outfile)
+
+
+class LicenseDatabaseTestCase(unittest.TestCase):
+    def test_ingest_and_query(self):
+        text = 'R1BMIHRleHQ='
+        with tempfile.TemporaryDirectory() as directory:
+            first = "%s/one/Dependencies/prereqs-licenses.json" % directory
+            second = "%s/two/Dependencies/prereqs-licenses.json" % directory
+            _write(first, 'one', [
+                {'moduleName': 'a', 'moduleLicense': 'GPL-3.0', 'x-spdxId': 'GPL-3.0',
+                 'x-usedBy': ['one'], LicenseText.ENCODED_KEY: text},
+                {'moduleName': 'b', 'moduleLicense': 'MIT', 'x-usedBy': ['a']}])
+            _write(second, 'two', [
+                {'moduleName': 'a', 'moduleLicense': 'GPL-3.0', 'x-spdxId': 'GPL-3.0',
+                 'x-usedBy': ['two'], LicenseText.ENCODED_KEY: text, 'x-extra': 1}])
+
+            database = LicenseDatabase("%s/licenses.db" % directory)
+            try:
+                self.assertTrue(database.ingest(first))
+                self.assertTrue(database.ingest(second))
+                self.assertFalse(database.ingest(first))
+
+                self.assertEqual(database.projects_using('GPL%'),
+                                 [('one', 'a', 'GPL-3.0'), ('two', 'a', 'GPL-3.0')])
+                self.assertEqual(database.license_counts(),
+                                 [('GPL-3.0', 'GPL-3.0', 1, 2), ('MIT', '', 1, 1)])
+                self.assertEqual(database.users_of('b'), [('one', 'a')])
+
+                licenses = list(database.get_licenses())
+                self.assertEqual([lic['moduleName'] for lic in licenses], ['a', 'b'])
+                self.assertEqual(licenses[0]['x-usedBy'], ['one', 'two'])
+                self.assertEqual(LicenseText.decode(licenses[0]), "GPL text")
+                licenses = list(database.get_licenses('two'))
+                self.assertEqual(licenses[0]['x-extra'], 1)
+
+                _write(first, 'one', [{'moduleName': 'c', 'moduleLicense': 'MIT'}])
+                self.assertTrue(database.ingest(first))
+                self.assertEqual(database.modules('one'), [('c', '', 'MIT')])
+
+                # A text that is not UTF-8, and the rows no longer used once it is replaced.
+                latin1 = base64.b64encode("Lizenz \u00a9".encode('latin-1')).decode('utf-8')
+                _write(second, 'two', [{'moduleName': 'd', 'moduleLicense': 'Other',
+                                        LicenseText.ENCODED_KEY: latin1}])
+                self.assertTrue(database.ingest(second))
+                licenses = list(database.get_licenses('two'))
+                self.assertEqual(LicenseText.get_data(licenses[0]),
+                                 "Lizenz \u00a9".encode('latin-1'))
+                self.assertEqual(database.modules(), [('c', '', 'MIT'), ('d', '', 'Other')])
+                self.assertEqual(database.license_counts(),
+                                 [('MIT', '', 1, 1), ('Other', '', 1, 1)])
+                connection = database._connection
+                self.assertEqual(connection.execute("SELECT COUNT(*) FROM texts").fetchone(),
+                                 (1,))
+                self.assertEqual(connection.execute("SELECT COUNT(*) FROM licenses").fetchone(),
+                                 (2,))
+            finally:
+                database.close()
@@ -0,0 +1,62 @@
+import json
+import os
+import tempfile
+import unittest
+
+from kss.license import diff
+from kss.license.util import LicenseText
+
+
+def _entries(**changes) -> list:
+    lics = [{'moduleName': 'a', 'moduleVersion': '1.0', 'moduleLicense': 'MIT',
+             LicenseText.ENCODED_KEY: 'TUlUIHRleHQ='},
+            {'moduleName': 'b', 'moduleVersion': '2.0', 'moduleLicense': 'Apache-2.0'},
+            {'moduleName': 'c', 'moduleVersion': '3.0'}]
+    for lic in lics:
+        lic.update(changes.get(lic['moduleName'], {}))
+    return lics
+
+
+class DiffTestCase(unittest.TestCase):
+    def test_unchanged(self):
+        delta = diff.compare(diff.signatures(_entries()), diff.signatures(_entries()))
+        self.assertTrue(diff.is_empty(delta))
+        self.assertEqual(delta['unchanged'], 3)
+        self.assertEqual(diff.affected(delta), set())
+
+    def test_changes(self):
+        old = diff.signatures(_entries())
+        new = _entries(a={LicenseText.ENCODED_KEY: 'R1BMIHRleHQ='}, b={'moduleVersion': '2.1'})
+        del new[2]
+        new.append({'moduleName': 'd'})
+        new.append({'moduleName': 'b', 'moduleVersion': '1.0'})
+        delta = diff.compare(old, diff.signatures(new))
+        self.assertFalse(diff.is_empty(delta))
+        self.assertEqual(delta['added'], ['d'])
+        self.assertEqual(delta['removed'], ['c'])
+        self.assertEqual(delta['changed'], {'a': ['textDigest'], 'b': ['count', 'version']})
+        self.assertEqual(delta['unchanged'], 0)
+        self.assertFalse(delta['reordered'])
+        self.assertEqual(diff.affected(delta), {'a', 'b', 'd'})
+
+    def test_reordered(self):
+        delta = diff.compare(diff.signatures(_entries()),
+                             diff.signatures(list(reversed(_entries()))))
+        self.assertTrue(delta['reordered'])
+        self.assertFalse(diff.is_empty(delta))
+        self.assertEqual(diff.affected(delta), set())
+
+    def test_diff_files(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filenames = [os.path.join(directory, name) for name in ('old.json', 'new.json')]
+            contents = (_entries(), _entries(c={'moduleLicense': 'MIT'}))
+            for filename, lics in zip(filenames, contents):
+                with open(filename, 'w') as outfile:
+                    json.dump({'dependencies': lics}, outfile)
+            delta = diff.diff_files(*filenames)
+        self.assertEqual(delta['changed'], {'c': ['license']})
+        self.assertEqual(delta['unchanged'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
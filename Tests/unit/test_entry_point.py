@@ -0,0 +1,59 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from kss.license import entry_point
+from kss.license.util import LicenseText
+
+
+class EntryPointTestCase(unittest.TestCase):
+    def tearDown(self):
+        LicenseText.configure()
+
+    def test_scanning_restores_license_text(self):
+        LicenseText.configure(compress=True, max_size=100)
+        cwd = os.getcwd()
+        options = entry_point._parse_command_line(['--max-license-text-size=10',
+                                                   '--policy-only'])
+        with entry_point._scanning('Tests', options):
+            self.assertEqual((LicenseText.compress, LicenseText.max_size, LicenseText.enabled),
+                             (False, 10, False))
+        self.assertEqual(os.getcwd(), cwd)
+        self.assertEqual(LicenseText.configure(), (True, 100, True, None))
+
+    def test_scan_with_text_store(self):
+        def scan_directory(directory, modulename, options, *_args):
+            with entry_point._scanning(directory, options):
+                lic = {'moduleName': 'a', 'moduleLicense': 'MIT'}
+                LicenseText.add_data(b"MIT text", lic)
+                self.assertIn(LicenseText.STORED_KEY, lic)
+                return {'a': lic}
+
+        with tempfile.TemporaryDirectory() as directory:
+            output = "%s/licenses.json" % directory
+            with mock.patch.object(entry_point, 'scan_directory', scan_directory):
+                entry_point.scan(['--directory=%s' % directory, '--output=%s' % output,
+                                  '--text-store=%s/texts' % directory,
+                                  '--compress-license-text'])
+            with open(output, 'r') as infile:
+                lic = json.load(infile)['dependencies'][0]
+            self.assertNotIn(LicenseText.STORED_KEY, lic)
+            self.assertIn(LicenseText.COMPRESSED_KEY, lic)
+            self.assertEqual(LicenseText.decode(lic), "MIT text")
+            self.assertIsNone(LicenseText.store)
+
+    def test_optional_modules_are_not_imported(self):
+        code = ("import sys, kss.license.entry_point; "
+                + "print(' '.join(sorted(name for name in sys.modules "
+                + "if name in ('sqlite3', 'asyncio', 'cProfile', 'mmap'))))")
+        output = subprocess.run([sys.executable, '-c', code], check=True,
+                                stdout=subprocess.PIPE).stdout
+        self.assertEqual(output.decode('utf-8').strip(), '')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import os
+import subprocess
+import tempfile
+import unittest
+
+from kss.license.git_store import GitObjectStore
+
+
+def _git(directory: str, *args):
+    subprocess.run(['git', '-C', directory, '-c', 'user.name=test', '-c', 'user.email=test@test']
+                   + list(args), check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+class GitObjectStoreTestCase(unittest.TestCase):
+    def test_extract_license(self):
+        with tempfile.TemporaryDirectory() as directory:
+            os.environ['LICENSE_SCANNER_CACHE_DIRECTORY'] = "%s/cache" % directory
+            try:
+                source = "%s/source" % directory
+                os.makedirs("%s/sub" % source)
+                with open("%s/LICENSE.md" % source, 'w') as outfile:
+                    outfile.write("the license")
+                with open("%s/sub/LICENSE" % source, 'w') as outfile:
+                    outfile.write("not this one")
+                _git(directory, 'init', '-q', source)
+                _git(source, 'add', '.')
+                _git(source, 'commit', '-q', '-m', 'initial')
+                _git(directory, 'clone', '-q', '--mirror', source, "%s/mirror/proj.git" % directory)
+
+                store = GitObjectStore.for_repository("%s/mirror/proj.git" % directory)
+                self.assertTrue(store is GitObjectStore.for_repository("%s/mirror/proj.git"
+                                                                       % directory))
+                commit, licdir = store.extract_license()
+                self.assertEqual(len(commit), 40)
+                with open("%s/LICENSE.md" % licdir, 'r') as infile:
+                    self.assertEqual(infile.read(), "the license")
+                self.assertEqual(store.extract_license('notthere'), (None, None))
+                self.assertTrue(store.read_object('notthere') is None)
+                self.assertTrue(GitObjectStore.is_repository("%s/mirror/proj.git" % directory))
+                self.assertFalse(GitObjectStore.is_repository(source))
+                store.close()
+                self.assertTrue(store._process.stdout.closed)
+            finally:
+                GitObjectStore.close_all()
+                del os.environ['LICENSE_SCANNER_CACHE_DIRECTORY']
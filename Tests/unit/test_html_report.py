@@ -0,0 +1,143 @@
+import glob
+import json
+import os
+import re
+import tempfile
+import unittest
+from unittest import mock
+
+from kss.license import html_report
+from kss.license.html_report import generate_report
+from kss.license.util import LicenseText
+
+
+class LazyReportTestCase(unittest.TestCase):
+    def test_data_island(self):
+        text = 'R1BMIHRleHQ='
+        with tempfile.TemporaryDirectory() as directory:
+            input_filename = os.path.join(directory, 'licenses.json')
+            output_filename = os.path.join(directory, 'licenses.html')
+            with open(input_filename, 'w') as outfile:
+                json.dump({'dependencies': [
+                    {'moduleName': 'a', 'moduleLicense': 'MIT', 'x-spdxId': 'MIT',
+                     'moduleUrl': 'https://example.com/a', LicenseText.ENCODED_KEY: text},
+                    {'moduleName': 'b</script>', 'moduleLicense': 'MIT', 'x-spdxId': 'MIT',
+                     LicenseText.ENCODED_KEY: text},
+                    {'moduleName': 'c', 'moduleLicense': 'Custom'},
+                    {'moduleName': 'd'}]}, outfile)
+            generate_report(['--input', input_filename, '--output', output_filename, '--lazy'])
+            with open(output_filename, 'r') as infile:
+                page = infile.read()
+
+        self.assertEqual(page.count('</script>'), 2)
+        match = re.search(r"<script type='application/json' id='licenseData'>(.*?)</script>",
+                          page)
+        data = json.loads(match.group(1))
+        self.assertEqual([module['n'] for module in data['modules']],
+                         ['a', 'b</script>', 'c', 'd'])
+        self.assertEqual(data['modules'][0]['u'], 'https://example.com/a')
+        self.assertEqual([module.get('l') for module in data['modules']], [0, 0, 1, None])
+        self.assertEqual([module.get('t') for module in data['modules']], [0, 0, None, None])
+        self.assertEqual(data['texts'], ['GPL text'])
+        self.assertEqual(data['licenses'][0]['spdx'], 'MIT')
+        self.assertTrue(data['licenses'][0]['seeAlso'])
+        self.assertEqual(data['licenses'][1], {'name': 'Custom'})
+
+
+class IncrementalReportTestCase(unittest.TestCase):
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.input_filename = os.path.join(self._tmpdir.name, 'licenses.json')
+        self.output_filename = os.path.join(self._tmpdir.name, 'licenses.html')
+        self.delta_filename = os.path.join(self._tmpdir.name, 'delta.json')
+
+    def tearDown(self):
+        self._tmpdir.cleanup()
+
+    def _generate(self, lics: list, *args) -> dict:
+        with open(self.input_filename, 'w') as outfile:
+            json.dump({'dependencies': lics}, outfile)
+        generate_report(['--input', self.input_filename, '--output', self.output_filename,
+                         '--incremental', '--delta', self.delta_filename] + list(args))
+        with open(self.delta_filename, 'r') as infile:
+            return json.load(infile)
+
+    def _mtimes(self) -> dict:
+        directory = os.path.join(self._tmpdir.name, 'licenses-modules')
+        mtimes = {'index': os.stat(self.output_filename).st_mtime_ns}
+        if os.path.isdir(directory):
+            for fname in os.listdir(directory):
+                mtimes[fname.split('-')[0]] = os.stat(os.path.join(directory, fname)).st_mtime_ns
+        return mtimes
+
+    def test_unchanged_report_is_skipped(self):
+        lics = [{'moduleName': 'a', 'moduleLicense': 'MIT'}, {'moduleName': 'b'}]
+        delta = self._generate(lics)
+        self.assertEqual(delta['added'], ['a', 'b'])
+        before = self._mtimes()
+        delta = self._generate(lics)
+        self.assertEqual(delta['unchanged'], 2)
+        self.assertEqual(self._mtimes(), before)
+        lics[1]['moduleLicense'] = 'MIT'
+        delta = self._generate(lics)
+        self.assertEqual(delta['changed'], {'b': ['license']})
+        with open(self.output_filename, 'r') as infile:
+            self.assertEqual(infile.read().count('License: MIT'), 2)
+
+    def test_changed_layout_is_rewritten(self):
+        lics = [{'moduleName': 'a', 'moduleLicense': 'MIT'}]
+        self._generate(lics)
+        delta = self._generate(lics, '--lazy')
+        self.assertEqual(delta['added'], ['a'])
+
+    def test_changed_template_is_rewritten(self):
+        lics = [{'moduleName': 'a', 'moduleLicense': 'MIT'},
+                {'moduleName': 'b', 'moduleLicense': 'MIT'}]
+        local_license = os.path.join(self._tmpdir.name, 'LICENSE')
+        with open(local_license, 'w') as outfile:
+            outfile.write("The first license")
+        self._generate(lics, '--split', '--local-license', local_license)
+        before = self._mtimes()
+
+        with open(local_license, 'w') as outfile:
+            outfile.write("The second license")
+        delta = self._generate(lics, '--split', '--local-license', local_license)
+        self.assertEqual(delta['added'], ['a', 'b'])
+        after = self._mtimes()
+        self.assertTrue(all(after[name] != before[name] for name in before))
+        with open(self.output_filename, 'r') as infile:
+            self.assertIn("The second license", infile.read())
+
+        with mock.patch.object(html_report, 'REPORT_FORMAT', html_report.REPORT_FORMAT + 1):
+            delta = self._generate(lics, '--split', '--local-license', local_license)
+        self.assertEqual(delta['added'], ['a', 'b'])
+        self.assertTrue(all(self._mtimes()[name] != after[name] for name in after))
+
+    def test_split_pages(self):
+        lics = [{'moduleName': 'a', 'moduleLicense': 'MIT'},
+                {'moduleName': 'b', 'moduleLicense': 'MIT'},
+                {'moduleName': 'c/d', 'moduleLicense': 'MIT'}]
+        self._generate(lics, '--split')
+        before = self._mtimes()
+        self.assertEqual(sorted(before), ['a', 'b', 'c_d', 'index'])
+        with open(self.output_filename, 'r') as infile:
+            index = infile.read()
+        self.assertEqual(index.count("<a href='licenses-modules/"), 3)
+
+        lics[0]['moduleUrl'] = 'https://example.com/a'
+        self._generate(lics, '--split')
+        after = self._mtimes()
+        fragments = glob.glob(os.path.join(self._tmpdir.name, 'licenses-modules', 'a-*.html'))
+        with open(fragments[0], 'r') as infile:
+            self.assertIn('https://example.com/a', infile.read())
+        self.assertEqual([after[name] for name in ('b', 'c_d', 'index')],
+                         [before[name] for name in ('b', 'c_d', 'index')])
+
+        del lics[1]
+        delta = self._generate(lics, '--split')
+        self.assertEqual(delta['removed'], ['b'])
+        self.assertEqual(sorted(self._mtimes()), ['a', 'c_d', 'index'])
+
+
+if __name__ == '__main__':
+    unittest.main()
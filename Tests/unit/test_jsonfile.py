@@ -0,0 +1,22 @@
+import json
+import tempfile
+import unittest
+
+from kss.license import jsonfile
+
+
+class JsonFileTestCase(unittest.TestCase):
+    def test_read_and_write(self):
+        data = {'dependencies': [{'moduleName': 'b', 'x-usedBy': ['a'], 'x-isOsiApproved': True},
+                                 {'moduleName': 'a', 'moduleVersion': '1.0 é'}],
+                'generated': {'time': 'now'}}
+        with tempfile.TemporaryDirectory() as directory:
+            filename = "%s/out.json" % directory
+            jsonfile.write_file(filename, data)
+            with open(filename, 'r') as infile:
+                self.assertEqual(infile.read(), json.dumps(data, indent=4, sort_keys=True))
+            self.assertEqual(jsonfile.read_file(filename), data)
+        self.assertEqual(jsonfile.loads(jsonfile.dumps(data)), data)
+        self.assertEqual(jsonfile.loads(b'[1, "x"]'), [1, "x"])
+        with self.assertRaises(ValueError):
+            jsonfile.loads("{not json")
@@ -0,0 +1,62 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from kss.license.git_store import GitObjectStore
+from kss.license.kss_prereqs_scanner import KSSPrereqsScanner
+from kss.license.util import Capabilities
+from kss.license.wheelhouse import Wheelhouse, installed_details
+
+
+class KSSPrereqsScannerTestCase(unittest.TestCase):
+    def test_missing_pip_module(self):
+        for backend in ('pip', Capabilities.IN_PROCESS):
+            with mock.patch.object(Capabilities, 'backend', return_value=backend):
+                scanner = KSSPrereqsScanner('proj')
+                self.assertEqual(scanner._get_installed_pip_module_details('not-a-module-here'),
+                                 {})
+                lics = []
+                scanner._add_pip_license_for('not-a-module-here', None, lics)
+                self.assertEqual(lics, [{'moduleName': 'not-a-module-here',
+                                         'moduleLicense': 'Unknown'}])
+
+    def test_pinned_module_not_in_the_wheelhouse(self):
+        with tempfile.TemporaryDirectory() as directory:
+            wheelhouse = Wheelhouse(directory, {'requests': '0.0.1'})
+            scanner = KSSPrereqsScanner('proj', wheelhouse=wheelhouse)
+            with self.assertLogs(level='WARNING'):
+                self.assertEqual(scanner._get_pip_module_details('requests'), {})
+            installed = installed_details('requests')['Version']
+            wheelhouse = Wheelhouse(directory, {'requests': installed})
+            scanner = KSSPrereqsScanner('proj', wheelhouse=wheelhouse)
+            self.assertEqual(scanner._get_pip_module_details('requests')['Name'], 'requests')
+
+    def test_git_mirror(self):
+        with tempfile.TemporaryDirectory() as directory:
+            os.makedirs("%s/proj.git/objects" % directory)
+            os.makedirs("%s/other" % directory)
+            scanner = KSSPrereqsScanner('proj', git_mirror=directory)
+            self.assertEqual(scanner._find_git_mirror('proj'), "%s/proj.git" % directory)
+            self.assertIsNone(scanner._find_git_mirror('other'))
+            self.assertIsNone(scanner._find_git_mirror('missing'))
+            with mock.patch.object(Capabilities, 'has_tool', return_value=False):
+                self.assertIsNone(scanner._find_git_mirror('proj'))
+
+    def test_git_mirror_failure(self):
+        with tempfile.TemporaryDirectory() as directory:
+            os.makedirs("%s/proj.git/objects" % directory)
+            scanner = KSSPrereqsScanner('proj', git_mirror=directory)
+            prereq = {'git': 'https://example.com/proj.git'}
+            with mock.patch.object(GitObjectStore, 'for_repository', side_effect=BrokenPipeError), \
+                 mock.patch.object(scanner, '_find_path_for_project_directory',
+                                   return_value=None) as find_path, \
+                 self.assertLogs(level='WARNING'):
+                entry = scanner._get_entry_from_git_prereq(prereq)
+            find_path.assert_called_once_with('proj')
+            self.assertEqual(entry, {'name': 'proj', 'version': None, 'directory': None,
+                                     'url': 'https://example.com/proj.git'})
+
+
+if __name__ == '__main__':
+    unittest.main()
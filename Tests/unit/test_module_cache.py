@@ -0,0 +1,92 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from kss.license import module_cache
+from kss.license.directory_scanner import DirectoryScanner
+from kss.license.module_cache import ModuleCache
+from kss.license.scanner import Scanner
+from kss.license.util import LicenseText
+
+
+class _ProjectScanner(DirectoryScanner):
+    def __init__(self, projects: list, cache: ModuleCache):
+        super().__init__('proj', module_cache=cache)
+        self._projects = projects
+
+    def should_scan(self) -> bool:
+        return True
+
+    def get_project_list(self) -> list:
+        return self._projects
+
+
+class ModuleCacheTestCase(unittest.TestCase):
+    def tearDown(self):
+        LicenseText.configure()
+
+    def test_put_and_get(self):
+        self.assertIsNone(ModuleCache.key('a', None, 'https://example.com/a'))
+        key = ModuleCache.key('a', '1.0', 'https://example.com/a')
+        other = ModuleCache.key('b', '2.0', 'https://example.com/b')
+        lic = {'moduleName': 'a', 'moduleLicense': 'MIT License', 'x-spdxId': 'MIT',
+               'x-usedBy': ['proj'], LicenseText.ENCODED_KEY: 'TUlUIHRleHQ='}
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ModuleCache(directory)
+            self.assertIsNone(cache.get(key))
+            cache.put(key, lic, requires=['c'])
+            cache.put(other, dict(lic, moduleName='b'))
+            self.assertEqual(len(os.listdir("%s/texts" % cache.directory)), 1)
+
+            LicenseText.configure(compress=True)
+            record = cache.get(key)
+            self.assertEqual(record['requires'], ['c'])
+            self.assertEqual(record['license']['x-spdxId'], 'MIT')
+            self.assertNotIn('x-usedBy', record['license'])
+            self.assertEqual(LicenseText.decode(record['license']), 'MIT text')
+            self.assertIn(LicenseText.COMPRESSED_KEY, record['license'])
+
+            with mock.patch.object(module_cache, '__version__', '99.0.0'):
+                self.assertIsNone(cache.get(key))
+
+    def test_incomplete_texts_are_not_stored(self):
+        key = ModuleCache.key('a', '1.0', 'https://example.com/a')
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ModuleCache(directory)
+            LicenseText.configure(max_size=1)
+            cache.put(key, {'moduleName': 'a', 'moduleLicense': 'MIT License'})
+            self.assertIsNone(cache.get(key))
+
+    def test_only_complete_entries_are_cached(self):
+        with tempfile.TemporaryDirectory() as directory:
+            checkout = os.path.join(directory, 'checkout')
+            os.makedirs(checkout)
+            with open(os.path.join(checkout, 'LICENSE'), 'w') as outfile:
+                outfile.write('MIT text')
+            projects = [
+                {'name': 'found', 'version': '1.0', 'url': 'u1', 'directory': checkout},
+                {'name': 'missing', 'version': '1.0', 'url': 'u2', 'directory': None},
+                {'name': 'slow', 'version': '1.0', 'url': 'u3', 'directory': checkout,
+                 'incomplete': 'timed out'},
+                {'name': 'found', 'version': '1.0', 'url': 'u1', 'directory': checkout}]
+            cache = ModuleCache(os.path.join(directory, 'cache'))
+            scanner = _ProjectScanner(projects, cache)
+            with mock.patch.object(DirectoryScanner.ninka, 'guess_license',
+                                   return_value=('MIT', os.path.join(checkout, 'LICENSE'))), \
+                    mock.patch.object(Scanner, 'resolve_github_details'):
+                licenses = {}
+                scanner._adjust_and_add_new_licenses(scanner.scan(), licenses)
+            self.assertEqual(sorted(licenses), ['found', 'missing', 'slow'])
+            self.assertEqual(cache.get(('found', '1.0', 'u1'))['license']['x-spdxId'], 'MIT')
+            self.assertIsNone(cache.get(('missing', '1.0', 'u2')))
+            self.assertIsNone(cache.get(('slow', '1.0', 'u3')))
+            for lic in licenses.values():
+                self.assertNotIn(DirectoryScanner._CACHE_ENTRY_KEY, lic)
+
+            self.assertFalse(scanner._is_cacheable({'moduleLicense': 'Unknown'}))
+            self.assertTrue(scanner._is_cacheable({'moduleLicense': 'MIT'}))
+
+
+if __name__ == '__main__':
+    unittest.main()
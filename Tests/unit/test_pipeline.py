@@ -0,0 +1,122 @@
+import copy
+import unittest
+
+from kss.license.pipeline import ScanPipeline
+from kss.license.scanner import Scanner
+from kss.license.util import Timeouts
+
+
+class _FakeScanner(Scanner):
+    def __init__(self, modulename: str, items: list):
+        super().__init__(modulename)
+        self._items = items
+
+    def should_scan(self) -> bool:
+        return True
+
+    def scan(self) -> list:
+        lics = []
+        for item in self.discover():
+            lics.extend(self.resolve(item))
+        return lics
+
+    def discover(self) -> list:
+        return list(range(len(self._items)))
+
+    def resolve(self, item) -> list:
+        return copy.deepcopy(self._items[item])
+
+
+class _NamedScanner(_FakeScanner):
+    def __init__(self, modulename: str, items: list):
+        super().__init__(modulename, items)
+        self.resolved = []
+
+    def item_name(self, item) -> str:
+        return self._items[item][-1]['moduleName']
+
+    def resolve(self, item) -> list:
+        self.resolved.append(item)
+        return super().resolve(item)
+
+    def resolve_duplicate(self, item) -> list:
+        lics = copy.deepcopy(self._items[item][:-1])
+        lics.append({'moduleName': self.item_name(item)})
+        return lics
+
+
+def _make_scanners() -> list:
+    return [
+        _FakeScanner('proj', [[{'moduleName': 'ignoreme', 'x-ignored': True}]]),
+        _FakeScanner('proj', [
+            [{'moduleName': 'a', 'moduleLicense': 'MIT'}],
+            [{'moduleName': 'b'}, {'moduleName': 'a', 'x-usedBy': ['b']}],
+            [{'moduleName': 'ignoreme', 'moduleLicense': 'MIT'}],
+        ]),
+        _FakeScanner('proj', [[{'moduleName': 'b', 'moduleLicense': 'Apache-2.0'}]] * 20),
+    ]
+
+
+def _make_named_scanners() -> list:
+    return [
+        _NamedScanner('proj', [[{'moduleName': 'ignoreme', 'x-ignored': True}]]),
+        _NamedScanner('proj', [
+            [{'moduleName': 'a', 'moduleLicense': 'MIT'}],
+            [{'moduleName': 'c', 'x-usedBy': ['b']}, {'moduleName': 'b'}],
+            [{'moduleName': 'ignoreme', 'moduleLicense': 'MIT'}],
+            [{'moduleName': 'd', 'x-usedBy': ['a']}, {'moduleName': 'a', 'moduleLicense': 'GPL'}],
+        ]),
+    ]
+
+
+class ScanPipelineTestCase(unittest.TestCase):
+    def tearDown(self):
+        Scanner._ignored.clear()
+
+    def test_matches_sequential_scan(self):
+        expected = {}
+        for scanner in _make_scanners():
+            scanner.add_licenses(expected)
+        Scanner._ignored.clear()
+
+        licenses = {}
+        ScanPipeline(_make_scanners(), resolvers=3, max_pending=2).run(licenses)
+        self.assertEqual(licenses, expected)
+        self.assertEqual(sorted(licenses), ['a', 'b'])
+        self.assertEqual(licenses['a']['x-spdxId'], 'MIT')
+        self.assertEqual(licenses['a']['x-usedBy'], ['b', 'proj'])
+        self.assertEqual(licenses['b']['moduleLicense'], 'Unknown')
+
+    def test_duplicates_are_not_resolved(self):
+        # Resolving every item, as scan() does, gives the same result.
+        expected = {}
+        for scanner in _make_named_scanners():
+            scanner._adjust_and_add_new_licenses(scanner.scan(), expected)
+        Scanner._ignored.clear()
+
+        for pipeline in (False, True):
+            licenses = {}
+            scanners = _make_named_scanners()
+            if pipeline:
+                ScanPipeline(scanners, resolvers=3, max_pending=2).run(licenses)
+            else:
+                for scanner in scanners:
+                    scanner.add_licenses(licenses)
+            Scanner._ignored.clear()
+            self.assertEqual(licenses, expected)
+            self.assertEqual(sorted(scanners[1].resolved), [0, 1])
+            self.assertEqual(licenses['a']['moduleLicense'], 'MIT License')
+            self.assertEqual(licenses['d']['x-usedBy'], ['a'])
+
+    def test_deadline(self):
+        Timeouts.configure(deadline=0)
+        try:
+            licenses = {}
+            scanners = _make_named_scanners()
+            ScanPipeline(scanners).run(licenses)
+        finally:
+            Timeouts.configure()
+        self.assertEqual(scanners[1].resolved, [])
+        self.assertEqual(sorted(licenses), ['a', 'b', 'ignoreme'])
+        self.assertEqual(licenses['a']['moduleLicense'], 'Unknown')
+        self.assertTrue(licenses['a'][Scanner.INCOMPLETE_KEY])
@@ -0,0 +1,59 @@
+import unittest
+
+from kss.license.policy import LicensePolicy, PolicyViolation
+from kss.license.scanner import Scanner
+
+
+class _ListScanner(Scanner):
+    def __init__(self, lics: list):
+        super().__init__('test')
+        self._lics = lics
+
+    def should_scan(self) -> bool:
+        return True
+
+    def scan(self) -> list:
+        return self._lics
+
+
+class LicensePolicyTestCase(unittest.TestCase):
+    def test_get_violation(self):
+        mit = {'moduleName': 'a', 'x-spdxId': 'MIT', 'x-isOsiApproved': True}
+        gpl = {'moduleName': 'b', 'x-spdxId': 'GPL-3.0', 'x-isOsiApproved': True}
+        other = {'moduleName': 'c', 'x-spdxId': 'Other', 'x-isOsiApproved': False}
+        unknown = {'moduleName': 'd', 'moduleLicense': 'Unknown'}
+
+        policy = LicensePolicy(deny=['GPL-3.0'])
+        self.assertIsNone(policy.get_violation(mit))
+        self.assertIsNotNone(policy.get_violation(gpl))
+        self.assertIsNone(policy.get_violation(unknown))
+
+        policy = LicensePolicy(allow=['MIT'])
+        self.assertIsNone(policy.get_violation(mit))
+        self.assertIsNotNone(policy.get_violation(gpl))
+        self.assertIsNotNone(policy.get_violation(unknown))
+
+        policy = LicensePolicy(require_osi=True)
+        self.assertIsNone(policy.get_violation(gpl))
+        self.assertIsNotNone(policy.get_violation(other))
+
+    def test_scanner_checks_policy(self):
+        lics = [{'moduleName': 'a', 'moduleLicense': 'MIT'},
+                {'moduleName': 'b', 'moduleLicense': 'GPL-3.0'},
+                {'moduleName': 'c', 'moduleLicense': 'GPL-3.0'}]
+        previous = Scanner.set_policy(LicensePolicy(deny=['GPL-3.0'], fail_fast=True))
+        try:
+            licenses = {}
+            with self.assertRaises(PolicyViolation) as context:
+                _ListScanner([dict(lic) for lic in lics]).add_licenses(licenses)
+            self.assertEqual(context.exception.lic['moduleName'], 'b')
+            self.assertEqual(sorted(licenses.keys()), ['a'])
+
+            policy = LicensePolicy(deny=['GPL-3.0'])
+            Scanner.set_policy(policy)
+            licenses = {}
+            _ListScanner([dict(lic) for lic in lics]).add_licenses(licenses)
+            self.assertEqual(len(licenses), 3)
+            self.assertEqual(len(policy.violations), 2)
+        finally:
+            Scanner.set_policy(previous)
@@ -0,0 +1,28 @@
+import pstats
+import subprocess
+import tempfile
+import threading
+import unittest
+
+from kss.license.profiler import Profiler
+
+
+def _run_child():
+    subprocess.run(['sleep', '0.2'], check=True)
+
+
+class ProfilerTestCase(unittest.TestCase):
+    def test_profile(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = "%s/profile" % directory
+            with Profiler(filename):
+                thread = threading.Thread(target=_run_child)
+                thread.start()
+                thread.join()
+            stats = pstats.Stats(filename)
+            self.assertTrue(stats.total_calls > 0)
+            with open("%s.folded" % filename, 'r') as infile:
+                lines = infile.read().splitlines()
+            self.assertTrue(any(line.startswith('MainThread;') for line in lines))
+            self.assertTrue(any('_run_child (test_profiler.py:' in line
+                                and ';[child] sleep ' in line for line in lines))
@@ -0,0 +1,110 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from kss.license import entry_point, recursive
+from kss.license.directory_scanner import DirectoryScanner
+from kss.license.recursive import SubprojectScanner
+from kss.license.scanner import Scanner
+
+
+class _ProjectScanner(DirectoryScanner):
+    def __init__(self, projects: list, subprojects: SubprojectScanner):
+        super().__init__('proj', subprojects=subprojects)
+        self._projects = projects
+
+    def should_scan(self) -> bool:
+        return True
+
+    def get_project_list(self) -> list:
+        return self._projects
+
+
+class SubprojectScannerTestCase(unittest.TestCase):
+    def setUp(self):
+        self._cwd = os.getcwd()
+        self._environ = dict(os.environ)
+        self._tmpdir = tempfile.TemporaryDirectory()
+        os.environ['LICENSE_SCANNER_CACHE_DIRECTORY'] = "%s/cache" % self._tmpdir.name
+        self.directory = "%s/dep" % self._tmpdir.name
+        os.makedirs(self.directory)
+        self._write_manual_licenses('MIT')
+        self.options = entry_point._parse_command_line(['--recursive'])
+
+    def tearDown(self):
+        os.chdir(self._cwd)
+        os.environ.clear()
+        os.environ.update(self._environ)
+        self._tmpdir.cleanup()
+
+    def _write_manual_licenses(self, license_name: str):
+        with open("%s/manual-licenses.json" % self.directory, 'w') as outfile:
+            outfile.write('[{"moduleName": "leaf", "moduleLicense": "%s"}]' % license_name)
+
+    def _memofiles(self) -> list:
+        directory = "%s/cache/subprojects" % self._tmpdir.name
+        return os.listdir(directory) if os.path.isdir(directory) else []
+
+    def test_memoized_results(self):
+        project = {'name': 'dep', 'directory': self.directory}
+        licenses = SubprojectScanner(self.options, parallel=False).get_licenses(project)
+        self.assertEqual([lic['moduleName'] for lic in licenses], ['leaf'])
+        self.assertEqual(len(self._memofiles()), 1)
+
+        with mock.patch.object(recursive, '_scan_subproject') as scan:
+            scanner = SubprojectScanner(self.options, parallel=False)
+            self.assertEqual(scanner.get_licenses(project), licenses)
+            scan.assert_not_called()
+
+        key = SubprojectScanner(self.options)._memo_key(os.path.realpath(self.directory), 'dep')
+        self._write_manual_licenses('BSD')
+        changed = SubprojectScanner(self.options)._memo_key(os.path.realpath(self.directory),
+                                                            'dep')
+        self.assertNotEqual(changed, key)
+        licenses = SubprojectScanner(self.options, parallel=False).get_licenses(project)
+        self.assertEqual(licenses[0]['moduleLicense'], 'BSD')
+        self.assertEqual(len(self._memofiles()), 2)
+
+    def test_memo_key_options(self):
+        directory = os.path.realpath(self.directory)
+        key = SubprojectScanner(self.options)._memo_key(directory, 'dep')
+        for args, same in ((['--jobs=3', '--output=other.json', '--pipeline'], True),
+                           (['--use-gitignore'], False),
+                           (['--compress-license-text'], False)):
+            options = entry_point._parse_command_line(['--recursive'] + args)
+            self.assertEqual(SubprojectScanner(options)._memo_key(directory, 'dep') == key,
+                             same, args)
+
+    def test_no_manifests(self):
+        empty = "%s/empty" % self._tmpdir.name
+        os.makedirs(empty)
+        scanner = SubprojectScanner(self.options, parallel=False)
+        self.assertIsNone(scanner.get_licenses({'name': 'empty', 'directory': empty}))
+        self.assertIsNone(scanner.get_licenses({'name': 'missing', 'directory': None}))
+
+    def test_depends_on_itself(self):
+        ancestors = (os.path.realpath(self.directory),)
+        scanner = SubprojectScanner(self.options, parallel=False, ancestors=ancestors)
+        with self.assertLogs(level='WARNING') as logs:
+            self.assertIsNone(scanner.get_licenses({'name': 'dep', 'directory': self.directory}))
+        self.assertIn("'dep' depends on itself", logs.output[0])
+        self.assertEqual(self._memofiles(), [])
+
+    def test_incomplete_results_are_not_memoized(self):
+        incomplete = [{'moduleName': 'leaf', Scanner.INCOMPLETE_KEY: 'timed out'}]
+        with mock.patch.object(recursive, '_scan_subproject', return_value=incomplete):
+            scanner = SubprojectScanner(self.options, parallel=False)
+            licenses = scanner.get_licenses({'name': 'dep', 'directory': self.directory})
+        self.assertEqual(licenses, incomplete)
+        self.assertEqual(self._memofiles(), [])
+
+    def test_used_by_is_bottom_up(self):
+        projects = [{'name': 'dep', 'version': None, 'url': None, 'directory': self.directory}]
+        scanner = _ProjectScanner(projects, SubprojectScanner(self.options, parallel=False))
+        licenses = {}
+        with mock.patch.object(Scanner, 'resolve_github_details'):
+            scanner.add_licenses(licenses)
+        os.chdir(self._cwd)
+        self.assertEqual(licenses['leaf']['x-usedBy'], ['dep'])
+        self.assertEqual(licenses['dep']['x-usedBy'], ['proj'])
@@ -0,0 +1,47 @@
+import argparse
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from kss.license import registry
+from kss.license.registry import create_scanners, get_plugins
+from kss.license.util import find_names
+
+
+class RegistryTestCase(unittest.TestCase):
+    def test_get_plugins(self):
+        names = [plugin.name for plugin in get_plugins()]
+        self.assertEqual(names[:3], ['manual', 'swift', 'kss'])
+
+    def test_plugins_are_found_once(self):
+        with mock.patch.object(registry, '_plugins', None), \
+             mock.patch.object(registry, '_get_entry_points', return_value=[]) as entries:
+            self.assertEqual(registry.get_plugins(), registry.get_plugins())
+            entries.assert_called_once_with()
+
+    def test_find_names(self):
+        with tempfile.TemporaryDirectory() as directory:
+            os.makedirs("%s/a/b" % directory)
+            os.makedirs("%s/.hidden" % directory)
+            os.makedirs("%s/Tests/sub" % directory)
+            for filename in ('a/b/prereqs.json', '.hidden/Package.resolved',
+                             'Tests/sub/manual-licenses.json'):
+                with open("%s/%s" % (directory, filename), 'w'):
+                    pass
+            names = {'prereqs.json', 'Package.resolved', 'manual-licenses.json'}
+            self.assertEqual(find_names(names, directory, skipprefix="Tests/"), {'prereqs.json'})
+
+    def test_create_scanners(self):
+        options = argparse.Namespace(manual_licenses='manual-licenses.json')
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as directory:
+            try:
+                os.chdir(directory)
+                with open('manual-licenses.json', 'w') as outfile:
+                    outfile.write("[]")
+                scanners = create_scanners('test', options)
+                self.assertEqual([type(scanner).__name__ for scanner in scanners],
+                                 ['ManualScanner'])
+            finally:
+                os.chdir(cwd)
@@ -0,0 +1,50 @@
+import contextlib
+import io
+import json
+import tempfile
+import unittest
+
+from kss.license import entry_point
+from kss.license.shard import merge, parse_shard
+
+
+def _write_partial(filename: str, index: int, items: list):
+    shard = {'index': index, 'count': 2, 'items': 3, 'moduleName': 'top', 'project': 'proj'}
+    with open(filename, 'w') as outfile:
+        json.dump({'shard': shard, 'items': items}, outfile)
+
+
+class ShardTestCase(unittest.TestCase):
+    def test_parse_shard(self):
+        self.assertEqual(parse_shard('2/3'), (2, 3))
+        for value in ('0/3', '4/3', '1', 'a/b'):
+            with self.assertRaises(ValueError):
+                parse_shard(value)
+
+    def test_policy_options_are_rejected(self):
+        self.assertEqual(entry_point._parse_command_line(['--shard=1/2']).shard, (1, 2))
+        for option in ('--allow-license=MIT', '--deny-license=GPL-3.0-only',
+                       '--require-osi-approved', '--policy-only'):
+            with self.assertRaises(SystemExit), contextlib.redirect_stderr(io.StringIO()):
+                entry_point._parse_command_line(['--shard=1/2', option])
+
+    def test_merge(self):
+        with tempfile.TemporaryDirectory() as directory:
+            first = "%s/1.json" % directory
+            second = "%s/2.json" % directory
+            _write_partial(first, 1, [
+                {'sequence': 0, 'licenses': [{'moduleName': 'c', 'x-ignored': True}]},
+                {'sequence': 2, 'licenses': [{'moduleName': 'a', 'moduleLicense': 'Other',
+                                              'x-usedBy': ['b']},
+                                             {'moduleName': 'c', 'moduleLicense': 'MIT'}]}])
+            with self.assertRaises(ValueError):
+                merge([first])
+
+            _write_partial(second, 2, [
+                {'sequence': 1, 'licenses': [{'moduleName': 'a', 'moduleLicense': 'MIT',
+                                              'x-usedBy': ['top']}]}])
+            licenses, project = merge([second, first])
+            self.assertEqual(project, 'proj')
+            self.assertEqual(sorted(licenses.keys()), ['a'])
+            self.assertEqual(licenses['a']['moduleLicense'], 'MIT')
+            self.assertEqual(licenses['a']['x-usedBy'], ['b', 'top'])
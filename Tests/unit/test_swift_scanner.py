@@ -0,0 +1,112 @@
+import json
+import os
+import subprocess
+import tempfile
+import unittest
+
+from kss.license.git_store import GitObjectStore
+from kss.license.swift_scanner import SwiftModuleScanner
+
+
+def _git(directory: str, *args) -> str:
+    return subprocess.run(['git', '-C', directory, '-c', 'user.name=test',
+                           '-c', 'user.email=test@test'] + list(args),
+                          check=True, stdout=subprocess.PIPE,
+                          stderr=subprocess.DEVNULL).stdout.decode('utf-8').strip()
+
+
+def _make_checkout(directory: str, revision: str):
+    os.makedirs(os.path.join(directory, '.git'))
+    with open(os.path.join(directory, '.git', 'HEAD'), 'w') as outfile:
+        outfile.write(revision + '\n')
+
+
+class SwiftModuleScannerTestCase(unittest.TestCase):
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.directory = self._tmpdir.name
+        self.oldenv = dict(os.environ)
+        os.environ['LICENSE_SCANNER_CACHE_DIRECTORY'] = os.path.join(self.directory, 'cache')
+        os.environ['LICENSE_SCANNER_SWIFTPM_CACHE'] = os.path.join(self.directory, 'swiftpm')
+        os.environ['LICENSE_SCANNER_XCODE_DERIVED_DATA'] = os.path.join(self.directory, 'xcode')
+
+    def tearDown(self):
+        GitObjectStore.close_all()
+        os.environ.clear()
+        os.environ.update(self.oldenv)
+        self._tmpdir.cleanup()
+
+    def _write_resolved(self, data: dict) -> str:
+        filename = os.path.join(self.directory, 'project', 'Package.resolved')
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        with open(filename, 'w') as outfile:
+            json.dump(data, outfile)
+        return filename
+
+    def test_read_pins(self):
+        pins = SwiftModuleScanner._read_pins('Tests/Projects/SwiftDependencies/Package.resolved')
+        self.assertEqual([pin['name'] for pin in pins],
+                         ['swift-nio', 'swift-nio-transport-services'])
+        self.assertEqual(pins[0]['version'], '2.13.0')
+        self.assertEqual(pins[0]['revision'], '4409b57d4c0c40d41ac2b320fccf02e4d451e3db')
+
+        for version in (2, 3):
+            filename = self._write_resolved({'version': version, 'pins': [{
+                'identity': 'swift-log', 'kind': 'remoteSourceControl',
+                'location': 'https://github.com/apple/swift-log.git',
+                'state': {'revision': 'a' * 40, 'version': '1.5.3'}}]})
+            pins = SwiftModuleScanner._read_pins(filename)
+            self.assertEqual(pins, [{'name': 'swift-log', 'basename': 'swift-log',
+                                     'url': 'https://github.com/apple/swift-log.git',
+                                     'version': '1.5.3', 'revision': 'a' * 40}])
+
+    def test_resolver_chain(self):
+        source = os.path.join(self.directory, 'source')
+        _git(self.directory, 'init', '-q', source)
+        with open(os.path.join(source, 'LICENSE'), 'w') as outfile:
+            outfile.write('the license')
+        _git(source, 'add', '.')
+        _git(source, 'commit', '-q', '-m', 'initial')
+        revision = _git(source, 'rev-parse', 'HEAD')
+        _git(self.directory, 'clone', '-q', '--bare', source,
+             os.path.join(self.directory, 'swiftpm', 'Beta-1a2b3c4d'))
+        os.makedirs(os.path.join(self.directory, 'xcode', 'Project-abc', 'gamma'))
+
+        filename = self._write_resolved({'version': 2, 'pins': [
+            {'identity': 'alpha', 'location': 'https://example.com/Alpha.git',
+             'state': {'revision': 'a' * 40, 'version': '1.0.0'}},
+            {'identity': 'beta', 'location': 'https://example.com/Beta',
+             'state': {'revision': revision, 'version': '2.0.0'}},
+            {'identity': 'gamma', 'location': 'https://example.com/gamma.git',
+             'state': {'revision': 'c' * 40, 'branch': 'main'}}]})
+        checkouts = os.path.join(os.path.dirname(filename), '.build', 'checkouts')
+        _make_checkout(os.path.join(checkouts, 'Alpha'), 'a' * 40)
+        _make_checkout(os.path.join(checkouts, 'Beta'), 'b' * 40)
+
+        scanner = SwiftModuleScanner('proj')
+        entries = scanner._get_entries_for_xcode_package_dependency_file(filename)
+        self.assertEqual([(entry['name'], entry['version']) for entry in entries],
+                         [('alpha', '1.0.0'), ('beta', '2.0.0'), ('gamma', None)])
+        self.assertEqual(entries[0]['directory'], os.path.join(checkouts, 'Alpha'))
+        with open(os.path.join(entries[1]['directory'], 'LICENSE'), 'r') as infile:
+            self.assertEqual(infile.read(), 'the license')
+        self.assertEqual(entries[2]['directory'],
+                         os.path.join(self.directory, 'xcode', 'Project-abc', 'gamma'))
+
+    def test_find_fails_after_a_match(self):
+        # find exits with status 1 if it could not read some directory, even after a match.
+        match = os.path.join(self.directory, 'xcode', 'Project-abc', 'gamma')
+        os.makedirs(match)
+        bindir = os.path.join(self.directory, 'bin')
+        os.makedirs(bindir)
+        with open(os.path.join(bindir, 'find'), 'w') as outfile:
+            outfile.write("#!/bin/sh\necho 'find: Permission denied' >&2\necho %s\nexit 1\n"
+                          % match)
+        os.chmod(os.path.join(bindir, 'find'), 0o755)
+        os.environ['PATH'] = "%s:%s" % (bindir, os.environ['PATH'])
+        scanner = SwiftModuleScanner('proj')
+        self.assertEqual(scanner._get_project_directory('gamma'), match)
+
+
+if __name__ == '__main__':
+    unittest.main()
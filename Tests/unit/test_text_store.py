@@ -0,0 +1,61 @@
+import os
+import tempfile
+import unittest
+
+from kss.license.text_store import TextStore
+from kss.license.util import LicenseText
+
+
+class TextStoreTestCase(unittest.TestCase):
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.store = TextStore(os.path.join(self._tmpdir.name, 'texts'))
+
+    def tearDown(self):
+        LicenseText.configure()
+        self._tmpdir.cleanup()
+
+    def _write(self, name: str, data: bytes) -> str:
+        filename = os.path.join(self._tmpdir.name, name)
+        with open(filename, 'wb') as outfile:
+            outfile.write(data)
+        return filename
+
+    def test_put_and_get(self):
+        data = b'x' * (3 * 1024 * 1024 + 7)
+        digest = self.store.put_file(self._write('LICENSE', data))
+        self.assertEqual(self.store.put(data), digest)
+        self.assertEqual(self.store.get(digest), data)
+        self.assertEqual(self.store.get(self.store.put(b'')), b'')
+        self.assertEqual(len(os.listdir(self.store.directory)), 2)
+        with self.assertRaises(FileNotFoundError):
+            self.store.get('0' * 64)
+
+    def test_license_text(self):
+        filename = self._write('LICENSE', b'MIT text')
+        expected = {'moduleName': 'a'}
+        LicenseText.add(filename, expected)
+
+        LicenseText.configure(store=self.store)
+        lic = {'moduleName': 'a'}
+        LicenseText.add(filename, lic)
+        self.assertEqual(sorted(lic), ['moduleName', LicenseText.STORED_KEY])
+        self.assertEqual(LicenseText.decode(lic), 'MIT text')
+        self.assertEqual(LicenseText.expand(lic), expected)
+        self.assertIn(LicenseText.STORED_KEY, lic)
+
+        normalized = dict(expected)
+        LicenseText.normalize(normalized)
+        self.assertEqual(normalized, lic)
+
+        LicenseText.configure(compress=True, store=self.store)
+        self.assertEqual(LicenseText.decode(LicenseText.expand(lic)), 'MIT text')
+        self.assertIn(LicenseText.COMPRESSED_KEY, LicenseText.expand(lic))
+
+        LicenseText.configure()
+        with self.assertRaises(ValueError):
+            LicenseText.decode(lic)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,14 @@
-import unittest
+import base64
+import io
 import os
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+import unittest
+import zlib
+from unittest import mock
 
 import kss.license.util as util
 
@@ -56,3 +65,213 @@ class OtherUtilTestCase(unittest.TestCase):
         self.assertEqual(len(all), 2)
         self.assertTrue("dir1/testdir" in all)
         self.assertTrue("dir2/dir21/testdir" in all)
+
+    def test_tree_walk_excludes(self):
+        previous = util.TreeWalk.configure(['dir21', 'dir1/dir11'])
+        try:
+            all = util.find_all('file1.dat', directory='Tests/unit/TestData')
+            self.assertEqual(sorted(all), ["dir1/file1.dat", "dir2/dir22/file1.dat"])
+        finally:
+            util.TreeWalk.configure(*previous)
+
+    def test_tree_walk_gitignore(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for dirname in ('build', 'src/gen', 'src/keep', '.hidden'):
+                os.makedirs("%s/%s" % (directory, dirname))
+                with open("%s/%s/prereqs.json" % (directory, dirname), 'w'):
+                    pass
+            with open("%s/.gitignore" % directory, 'w') as outfile:
+                outfile.write("# comment\nbuild/\n")
+            with open("%s/src/.gitignore" % directory, 'w') as outfile:
+                outfile.write("*\n!keep\n!prereqs.json\n")
+            previous = util.TreeWalk.configure(use_gitignore=True)
+            try:
+                self.assertEqual(util.find_all('prereqs.json', directory=directory),
+                                 ["src/keep/prereqs.json"])
+                self.assertEqual(util.find_all('.hidden', directory=directory, isdir=True),
+                                 [".hidden"])
+            finally:
+                util.TreeWalk.configure(*previous)
+
+    def test_tree_walk_gitignore_patterns(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for dirname in ('build', 'src/build', 'lib/out', 'logs/x', 'deep/x/gen', 'a/b',
+                            'a/x/y/b', 'a/c', 'src/tmp', 'src/sub/tmp'):
+                os.makedirs("%s/%s" % (directory, dirname))
+                with open("%s/%s/prereqs.json" % (directory, dirname), 'w'):
+                    pass
+            with open("%s/out" % directory, 'w'):
+                pass
+            with open("%s/.gitignore" % directory, 'w') as outfile:
+                outfile.write("/build\nout/\nlogs/**\n**/gen\na/**/b\n")
+            with open("%s/src/.gitignore" % directory, 'w') as outfile:
+                outfile.write("/tmp\n")
+            previous = util.TreeWalk.configure(use_gitignore=True)
+            try:
+                self.assertEqual(sorted(util.find_all('prereqs.json', directory=directory)),
+                                 ["a/c/prereqs.json", "src/build/prereqs.json",
+                                  "src/sub/tmp/prereqs.json"])
+                self.assertEqual(util.find_all('out', directory=directory), ["out"])
+            finally:
+                util.TreeWalk.configure(*previous)
+
+
+class LicenseTextTestCase(unittest.TestCase):
+    def tearDown(self):
+        util.LicenseText.configure()
+
+    def test_add_and_decode(self):
+        filename = 'Tests/Projects/KssDependencies/.prereqs/Darwin-x86_64/ksstest/LICENSE'
+        with open(filename, 'r') as infile:
+            text = infile.read()
+
+        lic = {'moduleName': 'ksstest'}
+        util.LicenseText.add(filename, lic)
+        self.assertTrue('x-licenseTextEncoded' in lic)
+        self.assertEqual(util.LicenseText.decode(lic), text)
+
+        util.LicenseText.configure(compress=True)
+        util.LicenseText.normalize(lic)
+        self.assertTrue('x-licenseTextEncoded' not in lic)
+        self.assertTrue('x-licenseTextCompressed' in lic)
+        self.assertEqual(util.LicenseText.decode(lic), text)
+
+        lic = {'moduleName': 'ksstest'}
+        util.LicenseText.add(filename, lic)
+        self.assertEqual(util.LicenseText.decode(lic), text)
+
+        previous = util.LicenseText.configure(max_size=10)
+        self.assertEqual(previous, (True, None, True, None))
+        lic = {'moduleName': 'ksstest'}
+        util.LicenseText.add(filename, lic)
+        self.assertEqual(lic, {'moduleName': 'ksstest'})
+        self.assertTrue(util.LicenseText.decode(lic) is None)
+
+    def test_read_encoded(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = "%s/big.txt" % directory
+            data = bytes(range(256)) * 1000
+            with open(filename, 'wb') as outfile:
+                outfile.write(data)
+            self.assertEqual(util.read_encoded(filename), base64.b64encode(data).decode('utf-8'))
+            self.assertEqual(zlib.decompress(base64.b64decode(util.read_compressed(filename))),
+                             data)
+
+
+class TimeoutsTestCase(unittest.TestCase):
+    def tearDown(self):
+        util.Timeouts.configure()
+
+    def test_run_command(self):
+        self.assertEqual(util.run_command("echo one; echo two"), ['one', 'two'])
+        with self.assertRaises(subprocess.CalledProcessError):
+            util.run_command("exit 3")
+        util.Timeouts.configure(command=0.2)
+        start = time.time()
+        with self.assertRaises(subprocess.TimeoutExpired):
+            util.run_command("sleep 5 | cat")
+        self.assertLess(time.time() - start, 4)
+
+    def test_deadline(self):
+        self.assertEqual(util.Timeouts.limit(10), 10)
+        util.Timeouts.configure(command=10, deadline=time.time() + 5)
+        self.assertFalse(util.Timeouts.expired())
+        self.assertLessEqual(util.Timeouts.limit(util.Timeouts.command), 5)
+        self.assertLessEqual(util.Timeouts.limit(None), 5)
+        util.Timeouts.configure(deadline=time.time() - 1)
+        self.assertTrue(util.Timeouts.expired())
+        self.assertEqual(util.Timeouts.limit(10), 0)
+        with self.assertRaises(subprocess.TimeoutExpired):
+            util.run_command("echo never")
+
+
+class CapabilitiesTestCase(unittest.TestCase):
+    def setUp(self):
+        self.oldpath = os.environ['PATH']
+        util.Capabilities.reset()
+
+    def tearDown(self):
+        os.environ['PATH'] = self.oldpath
+        util.Capabilities.reset()
+
+    def test_probe(self):
+        with tempfile.TemporaryDirectory() as directory:
+            os.environ['PATH'] = directory
+            capabilities = util.Capabilities.probe()
+            self.assertEqual(capabilities['tools'], [])
+            self.assertEqual(capabilities['backends'],
+                             {'pip': util.Capabilities.IN_PROCESS, 'license': None})
+            uname = os.uname()
+            self.assertEqual(util.Capabilities.os_directory(),
+                             "%s-%s" % (uname.sysname, uname.machine))
+            self.assertIs(util.Capabilities.probe(), capabilities)
+
+            licensefile = os.path.join(directory, 'LICENSE')
+            with open(licensefile, 'w') as outfile:
+                outfile.write('license')
+            self.assertEqual(util.Ninka.guess_license_by_file(licensefile), 'Unknown')
+
+            ninka = os.path.join(directory, 'ninka')
+            with open(ninka, 'w') as outfile:
+                outfile.write('#!/bin/sh\necho "$1;spdxMIT;x"\n')
+            os.chmod(ninka, 0o755)
+            util.Capabilities.reset()
+            self.assertTrue(util.Capabilities.has_tool('ninka'))
+            self.assertEqual(util.Ninka.guess_license_by_file(licensefile), 'MIT')
+
+    def test_pip_backend(self):
+        with tempfile.TemporaryDirectory() as directory:
+            python3 = os.path.join(directory, 'bin', 'python3')
+            os.makedirs(os.path.dirname(python3))
+            os.symlink(sys.executable, python3)
+            in_venv = sys.prefix != sys.base_prefix
+            self.assertEqual(util.Capabilities._choose_pip_backend(python3),
+                             'pip' if in_venv else util.Capabilities.IN_PROCESS)
+            with open(os.path.join(directory, 'pyvenv.cfg'), 'w') as outfile:
+                outfile.write("home = %s\n" % os.path.dirname(sys.executable))
+            self.assertEqual(util.Capabilities._choose_pip_backend(python3), 'pip')
+            self.assertEqual(util.Capabilities._choose_pip_backend(sys.executable),
+                             util.Capabilities.IN_PROCESS)
+
+
+class TarballTestCase(unittest.TestCase):
+    def _write_tarball(self, filename: str, members: dict):
+        with tarfile.open(filename, 'w:gz') as tar:
+            for name, data in members.items():
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+
+    def test_extract_license(self):
+        with tempfile.TemporaryDirectory() as directory:
+            os.environ['LICENSE_SCANNER_CACHE_DIRECTORY'] = "%s/cache" % directory
+            try:
+                filename = "%s/someproj-1.0.tar.gz" % directory
+                self._write_tarball(filename, {
+                    'someproj-1.0/src/dep/LICENSE': b'not this one',
+                    'someproj-1.0/LICENSE.txt': b'the license',
+                    'someproj-1.0/README': b'the readme'})
+                licdir = util.Tarball.extract_license(filename)
+                self.assertEqual(sorted(os.listdir(licdir)), ['.searched', 'LICENSE.txt'])
+                with open("%s/LICENSE.txt" % licdir, 'rb') as infile:
+                    self.assertEqual(infile.read(), b'the license')
+                self.assertEqual(util.Tarball.extract_license(filename), licdir)
+
+                # A later process finds the same directory without reading the tarball.
+                util.Tarball._cached = {}
+                with mock.patch.object(util, 'file_digest') as digest:
+                    self.assertEqual(util.Tarball.extract_license(filename), licdir)
+                    digest.assert_not_called()
+
+                filename = "%s/nolicense-1.0.tar.gz" % directory
+                self._write_tarball(filename, {'nolicense-1.0/README': b'the readme'})
+                licdir = util.Tarball.extract_license(filename)
+                self.assertEqual(os.listdir(licdir), ['.searched'])
+
+                # A changed tarball, with the same name, is searched again.
+                self._write_tarball(filename, {'nolicense-1.0/LICENSE': b'a license'})
+                os.utime(filename, ns=(0, 0))
+                self.assertEqual(sorted(os.listdir(util.Tarball.extract_license(filename))),
+                                 ['.searched', 'LICENSE'])
+            finally:
+                del os.environ['LICENSE_SCANNER_CACHE_DIRECTORY']
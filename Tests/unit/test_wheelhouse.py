@@ -0,0 +1,92 @@
+import os
+import tempfile
+import unittest
+import zipfile
+
+import kss.license.wheelhouse as wheelhouse
+
+
+def _write_wheel(directory: str, name: str, version: str, metadata: str, license_text: str = None):
+    distinfo = "%s-%s.dist-info" % (name.replace('-', '_'), version)
+    filename = "%s/%s-%s-py3-none-any.whl" % (directory, name.replace('-', '_'), version)
+    with zipfile.ZipFile(filename, 'w') as wheel:
+        wheel.writestr("%s/METADATA" % distinfo, metadata)
+        if license_text:
+            wheel.writestr("%s/licenses/LICENSE" % distinfo, license_text)
+    return filename
+
+
+class ReadPinsTestCase(unittest.TestCase):
+    def test_requirements(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = "%s/requirements.txt" % directory
+            with open(filename, 'w') as outfile:
+                outfile.write("# a comment\n")
+                outfile.write("-r other.txt\n")
+                outfile.write("Requests==2.28.1 \\\n    --hash=sha256:abc\n")
+                outfile.write("charset_normalizer[unicode]==2.1.1 ; python_version >= '3'\n")
+                outfile.write("idna>=3\n")
+            pins = wheelhouse.read_pins(filename)
+            self.assertEqual(pins, {'requests': '2.28.1', 'charset-normalizer': '2.1.1'})
+
+
+class WheelhouseTestCase(unittest.TestCase):
+    def setUp(self):
+        self.cache = tempfile.TemporaryDirectory()
+        self.oldcache = os.environ.get('LICENSE_SCANNER_CACHE_DIRECTORY', None)
+        os.environ['LICENSE_SCANNER_CACHE_DIRECTORY'] = self.cache.name
+
+    def tearDown(self):
+        if self.oldcache is None:
+            del os.environ['LICENSE_SCANNER_CACHE_DIRECTORY']
+        else:
+            os.environ['LICENSE_SCANNER_CACHE_DIRECTORY'] = self.oldcache
+        self.cache.cleanup()
+
+    def test_get_details(self):
+        with tempfile.TemporaryDirectory() as directory:
+            _write_wheel(directory, 'some-pkg', '1.0',
+                         "Name: some-pkg\nVersion: 1.0\nLicense: MIT\n"
+                         + "Requires-Dist: other>=1.0\n"
+                         + "Requires-Dist: extra-pkg; extra == 'test'\n")
+            _write_wheel(directory, 'some-pkg', '1.10', "Name: some-pkg\nVersion: 1.10\n")
+            _write_wheel(directory, 'other', '2.0', "Name: other\nVersion: 2.0\n", "the text")
+
+            house = wheelhouse.Wheelhouse(directory)
+            details = house.get_details('Some_Pkg')
+            self.assertEqual(details['Version'], '1.10')
+            self.assertTrue('Requires' not in details)
+
+            house = wheelhouse.Wheelhouse(directory, {'some-pkg': '1.0'})
+            house.prefetch(['some-pkg'])
+            details = house.get_details('some-pkg')
+            self.assertEqual(details['Version'], '1.0')
+            self.assertEqual(details['License'], 'MIT')
+            self.assertEqual(details['Requires'], ['other'])
+
+            details = house.get_details('other')
+            licensefile = "%s/other-2.0.dist-info/licenses/LICENSE" % details['Location']
+            self.assertTrue(os.path.isfile(licensefile))
+            self.assertTrue(house.get_details('notthere') is None)
+
+    def test_member_outside_the_wheel(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = _write_wheel(directory, 'evil', '1.0', "Name: evil\nVersion: 1.0\n")
+            with zipfile.ZipFile(filename, 'a') as wheel:
+                wheel.writestr("evil-1.0.dist-info/LICENSE/../../../escaped", "text")
+                wheel.writestr("evil-1.0.dist-info/LICENSE/../../../../%s/LICENSE" % directory,
+                               "text")
+            with self.assertLogs(level='WARNING') as logs:
+                details = wheelhouse.Wheelhouse(directory).get_details('evil')
+            self.assertEqual(len(logs.output), 2)
+            self.assertEqual(details['Version'], '1.0')
+            self.assertFalse(os.path.exists("%s/wheels/escaped" % self.cache.name))
+            self.assertFalse(os.path.exists("%s/LICENSE" % directory))
+
+    def test_installed_details(self):
+        details = wheelhouse.installed_details('requests')
+        self.assertEqual(details['Name'], 'requests')
+        self.assertTrue(os.path.isdir(details['Location']))
+        self.assertIn('idna', details['Requires'])
+        self.assertEqual(details['Requires'], sorted(details['Requires'], key=str.lower))
+        self.assertEqual(wheelhouse.installed_details('not-a-module-that-exists'), {})
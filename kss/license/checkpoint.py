@@ -0,0 +1,151 @@
+"""Support for resuming a scan that was interrupted, and for completing deferred lookups."""
+
+import logging
+import os
+import time
+
+from . import jsonfile
+from .scanner import ModuleClaims, Scanner
+from .util import NotAvailableException
+from . import __version__
+
+
+class Checkpoint:
+    """File holding the progress of a scan, from which the scan can be resumed.
+
+    The progress is the number of work items that have been added, together with the
+    licenses and the ignored modules found so far. It is written at most once every
+    `interval` seconds, and whenever the scan is interrupted.
+    """
+
+    def __init__(self, filename: str, interval: float = 30.0):
+        self.filename = filename
+        self._interval = interval
+        self._written = time.monotonic()
+
+    def read(self) -> dict:
+        """Returns the saved progress, or None if there is none."""
+        if not os.path.isfile(self.filename):
+            return None
+        logging.info("Reading checkpoint '%s'", self.filename)
+        return jsonfile.read_file(self.filename)
+
+    def write(self, progress: dict):
+        """Save the progress, replacing any that was saved before."""
+        logging.debug("Writing checkpoint '%s' at item %d", self.filename, progress['sequence'])
+        tmpfile = "%s.%d.tmp" % (self.filename, os.getpid())
+        with open(tmpfile, 'w') as outfile:
+            outfile.write(jsonfile.dumps(progress))
+        os.replace(tmpfile, self.filename)
+        self._written = time.monotonic()
+
+    def is_due(self) -> bool:
+        """Returns True if the progress should be saved again."""
+        return time.monotonic() - self._written >= self._interval
+
+    def remove(self):
+        """Remove the file, once the scan it describes has been completed."""
+        if os.path.isfile(self.filename):
+            os.remove(self.filename)
+
+
+class CheckpointedScan:
+    """Runs the scanners one after another, saving the progress to a `Checkpoint`.
+
+    The result is the same as calling `add_licenses()` on each scanner in turn, but the
+    progress is saved periodically, and if the scan is interrupted (for example because
+    there are no GitHub API calls left) the progress as of the last complete work item
+    is saved first. If `resume` is set, the scan continues from the saved progress: the
+    discovery is run again, which is cheap and always finds the items in the same
+    order, but the items that were already added are not resolved again.
+    """
+
+    def __init__(self, scanners: list, checkpoint: Checkpoint, resume: bool = False):
+        self._scanners = scanners
+        self._checkpoint = checkpoint
+        self._resume = resume
+
+    def run(self, modulename: str, licenses: dict):
+        """Run all of the scanners, adding their results to licenses."""
+        claims = ModuleClaims(licenses)
+        start = self._restore(modulename, licenses)
+        sequence = 0
+        for scanner in self._scanners:
+            if not scanner.should_scan():
+                continue
+            logging.info("Running the scanner '%s'", type(scanner).__name__)
+            for item in scanner.discover():
+                # The claims must be made for every item, so that they are the same as
+                # when the skipped items were added.
+                duplicate = claims.is_duplicate(scanner, item)
+                if sequence >= start:
+                    self._add_item(scanner, item, duplicate, licenses, modulename, sequence)
+                sequence += 1
+
+    def _restore(self, modulename: str, licenses: dict) -> int:
+        progress = self._checkpoint.read() if self._resume else None
+        if progress is None:
+            if self._resume:
+                logging.info("No checkpoint found, starting from the beginning")
+            return 0
+        if progress.get('version', None) != __version__:
+            raise ValueError("%s was written by a different version" % self._checkpoint.filename)
+        if progress['moduleName'] != modulename or progress['directory'] != os.getcwd():
+            raise ValueError("%s is not a checkpoint of this scan" % self._checkpoint.filename)
+        licenses.update(progress['licenses'])
+        # pylint: disable=protected-access
+        #   Justification: the ignored modules are part of the state of the scan.
+        Scanner._ignored.update(progress['ignored'])
+        logging.info("Resuming after %d items, with %d modules found",
+                     progress['sequence'], len(licenses))
+        return progress['sequence']
+
+    def _add_item(self, scanner: Scanner, item, duplicate: bool, licenses: dict,
+                  modulename: str, sequence: int):
+        try:
+            lics = scanner.resolve_item(item, duplicate)
+            for lic in lics:
+                if scanner.needs_details(lic, licenses):
+                    scanner.resolve_details(lic)
+        except BaseException:
+            # Nothing has been added for this item yet, so it is the next to be resolved.
+            self._save(modulename, sequence, licenses)
+            raise
+        # pylint: disable=protected-access
+        #   Justification: this performs the final step of Scanner.add_licenses().
+        scanner._adjust_and_add_new_licenses(lics, licenses, details_resolved=True)
+        if self._checkpoint.is_due():
+            self._save(modulename, sequence + 1, licenses)
+
+    def _save(self, modulename: str, sequence: int, licenses: dict):
+        # pylint: disable=protected-access
+        #   Justification: the ignored modules are part of the state of the scan.
+        self._checkpoint.write({
+            'version': __version__,
+            'moduleName': modulename,
+            'directory': os.getcwd(),
+            'sequence': sequence,
+            'pending': sorted(name for name, lic in licenses.items()
+                              if lic.get(Scanner.GITHUB_PENDING_KEY, False)),
+            'licenses': licenses,
+            'ignored': sorted(Scanner._ignored)
+        })
+
+
+def resolve_pending(licenses: list) -> int:
+    """Complete the GitHub lookups of the license entries that were marked as pending.
+
+    Returns the number of entries that are still pending, which is only non-zero if the
+    GitHub API calls ran out or GitHub stopped responding. The entries that were completed
+    before then are updated.
+    """
+    pending = [lic for lic in licenses if lic.get(Scanner.GITHUB_PENDING_KEY, False)]
+    logging.info("Looking up %d entries on GitHub", len(pending))
+    for count, lic in enumerate(pending):
+        try:
+            Scanner.resolve_github_details(lic)
+        except (NotAvailableException, TimeoutError) as ex:
+            logging.error("%s", ex)
+            return len(pending) - count
+        logging.info("   Resolved '%s' as '%s'", lic['moduleName'], lic['moduleLicense'])
+    return 0
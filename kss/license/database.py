@@ -0,0 +1,361 @@
+"""Organization wide database of the licenses found by the scanner."""
+
+import argparse
+import base64
+import hashlib
+import logging
+import os
+import sqlite3
+import zlib
+
+from . import jsonfile
+from .util import LicenseText, file_digest
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    generated TEXT
+);
+CREATE TABLE IF NOT EXISTS licenses (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    spdx_id TEXT NOT NULL DEFAULT '',
+    osi_approved INTEGER,
+    UNIQUE (name, spdx_id)
+);
+CREATE TABLE IF NOT EXISTS modules (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    version TEXT NOT NULL DEFAULT '',
+    UNIQUE (name, version)
+);
+CREATE TABLE IF NOT EXISTS texts (
+    id INTEGER PRIMARY KEY,
+    digest TEXT NOT NULL UNIQUE,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS dependencies (
+    project_id INTEGER NOT NULL REFERENCES projects (id) ON DELETE CASCADE,
+    module_id INTEGER NOT NULL REFERENCES modules (id),
+    license_id INTEGER REFERENCES licenses (id),
+    text_id INTEGER REFERENCES texts (id),
+    url TEXT,
+    entry TEXT NOT NULL,
+    PRIMARY KEY (project_id, module_id)
+);
+CREATE TABLE IF NOT EXISTS used_by (
+    project_id INTEGER NOT NULL REFERENCES projects (id) ON DELETE CASCADE,
+    module_id INTEGER NOT NULL REFERENCES modules (id),
+    user TEXT NOT NULL,
+    PRIMARY KEY (project_id, module_id, user)
+);
+CREATE INDEX IF NOT EXISTS projects_name ON projects (name);
+CREATE INDEX IF NOT EXISTS licenses_spdx_id ON licenses (spdx_id);
+CREATE INDEX IF NOT EXISTS dependencies_module ON dependencies (module_id);
+CREATE INDEX IF NOT EXISTS dependencies_license ON dependencies (license_id);
+CREATE INDEX IF NOT EXISTS dependencies_text ON dependencies (text_id);
+CREATE INDEX IF NOT EXISTS used_by_user ON used_by (user);
+CREATE INDEX IF NOT EXISTS used_by_module ON used_by (module_id);
+"""
+
+# The fields that are stored in their own columns, rather than in the entry column.
+_COLUMN_KEYS = ('moduleName', 'moduleVersion', 'moduleLicense', 'moduleUrl', 'x-spdxId',
+                'x-isOsiApproved', 'x-usedBy', LicenseText.ENCODED_KEY, LicenseText.COMPRESSED_KEY)
+
+
+class LicenseDatabase:
+    """SQLite store of the prereqs-licenses.json files of many projects.
+
+    Each project is identified by the path of its licenses file. Ingesting a file whose
+    contents have not changed since it was last ingested does nothing, and ingesting one
+    that has changed replaces the previous entries of that project, removing any
+    modules, licenses and texts that are no longer used. The license texts are stored
+    once, compressed and as the original bytes, no matter how many modules use them.
+    """
+
+    def __init__(self, filename: str):
+        self._connection = sqlite3.connect(filename)
+        self._connection.execute("PRAGMA foreign_keys = ON")
+        self._connection.executescript(_SCHEMA)
+
+    def close(self):
+        """Close the database."""
+        self._connection.close()
+
+    def ingest(self, filename: str, name: str = None) -> bool:
+        """Add the given licenses file to the database.
+
+        Parameters:
+            filename: the licenses file, as written by the scanner
+            name: the project name. If not specified it is read from the generated
+                  metadata of the file, or failing that, from its directory.
+        Returns True if the file was added and False if it was already up to date.
+        """
+        path = os.path.realpath(filename)
+        digest = file_digest(path)
+        row = self._connection.execute("SELECT digest FROM projects WHERE path = ?",
+                                       (path,)).fetchone()
+        if row and row[0] == digest:
+            logging.debug("'%s' is already up to date", filename)
+            return False
+
+        logging.info("Ingesting '%s'", filename)
+        data = jsonfile.read_file(path)
+        if not isinstance(data.get('dependencies', None), list):
+            raise TypeError("%s should contain a dependencies list" % filename)
+        generated = data.get('generated', {})
+        if not name:
+            name = generated.get('project', None) or _default_project_name(path)
+
+        with self._connection:
+            self._connection.execute("DELETE FROM projects WHERE path = ?", (path,))
+            projectid = self._connection.execute(
+                "INSERT INTO projects (path, name, digest, generated) VALUES (?, ?, ?, ?)",
+                (path, name, digest, generated.get('time', None))).lastrowid
+            for lic in data['dependencies']:
+                self._add_dependency(projectid, lic)
+            if row:
+                self._prune()
+        return True
+
+    def get_licenses(self, project: str = None):
+        """Generate the license entries of a project, or of all projects, by module name.
+
+        The entries are in the same form as those of the licenses file. When all projects
+        are included, modules used by more than one of them are combined into one entry.
+        """
+        sql = """SELECT m.name, m.version, l.name, l.spdx_id, l.osi_approved, d.url,
+                        t.data, d.entry, d.project_id, d.module_id
+                 FROM dependencies d
+                 JOIN modules m ON m.id = d.module_id
+                 JOIN projects p ON p.id = d.project_id
+                 LEFT JOIN licenses l ON l.id = d.license_id
+                 LEFT JOIN texts t ON t.id = d.text_id"""
+        params = ()
+        if project:
+            sql += " WHERE p.name = ?"
+            params = (project,)
+        sql += " ORDER BY m.name, m.version, p.path"
+        previous = None
+        for row in self._connection.execute(sql, params):
+            lic = self._make_license(row)
+            if previous and previous['moduleName'] == lic['moduleName'] \
+                    and previous.get('moduleVersion') == lic.get('moduleVersion'):
+                users = set(previous['x-usedBy']).union(lic['x-usedBy'])
+                previous['x-usedBy'] = sorted(users)
+                continue
+            if previous:
+                yield previous
+            previous = lic
+        if previous:
+            yield previous
+
+    def projects_using(self, pattern: str) -> list:
+        """Returns (project, module, license) for the modules whose license matches the pattern.
+
+        The pattern is an SQL LIKE pattern, compared to both the license name and SPDX id.
+        """
+        return self._connection.execute(
+            """SELECT p.name, m.name, l.name FROM licenses l
+               JOIN dependencies d ON d.license_id = l.id
+               JOIN projects p ON p.id = d.project_id
+               JOIN modules m ON m.id = d.module_id
+               WHERE l.name LIKE ? OR l.spdx_id LIKE ?
+               ORDER BY p.name, m.name""", (pattern, pattern)).fetchall()
+
+    def modules(self, project: str = None) -> list:
+        """Returns (module, version, license) for the modules of a project, or all projects."""
+        sql = """SELECT DISTINCT m.name, m.version, IFNULL(l.name, '') FROM dependencies d
+                 JOIN modules m ON m.id = d.module_id
+                 JOIN projects p ON p.id = d.project_id
+                 LEFT JOIN licenses l ON l.id = d.license_id"""
+        params = ()
+        if project:
+            sql += " WHERE p.name = ?"
+            params = (project,)
+        return self._connection.execute(sql + " ORDER BY m.name, m.version", params).fetchall()
+
+    def license_counts(self) -> list:
+        """Returns (license, spdx id, modules, projects) for each license."""
+        return self._connection.execute(
+            """SELECT l.name, l.spdx_id, COUNT(DISTINCT d.module_id),
+                      COUNT(DISTINCT d.project_id)
+               FROM licenses l JOIN dependencies d ON d.license_id = l.id
+               GROUP BY l.id ORDER BY COUNT(DISTINCT d.project_id) DESC, l.name""").fetchall()
+
+    def users_of(self, module: str) -> list:
+        """Returns (project, user) for each use of the given module."""
+        return self._connection.execute(
+            """SELECT DISTINCT p.name, u.user FROM used_by u
+               JOIN modules m ON m.id = u.module_id
+               JOIN projects p ON p.id = u.project_id
+               WHERE m.name = ? ORDER BY p.name, u.user""", (module,)).fetchall()
+
+    def _add_dependency(self, projectid: int, lic: dict):
+        moduleid = self._get_id("modules", name=lic.get('moduleName', ''),
+                                version=lic.get('moduleVersion', '') or '')
+        licenseid = None
+        if lic.get('moduleLicense', None):
+            licenseid = self._get_id("licenses", name=lic['moduleLicense'],
+                                     spdx_id=lic.get('x-spdxId', '') or '')
+            if 'x-isOsiApproved' in lic:
+                self._connection.execute("UPDATE licenses SET osi_approved = ? WHERE id = ?",
+                                         (1 if lic['x-isOsiApproved'] else 0, licenseid))
+        textid = self._add_text(lic)
+        entry = {key: value for key, value in lic.items() if key not in _COLUMN_KEYS}
+        self._connection.execute(
+            """INSERT OR REPLACE INTO dependencies
+               (project_id, module_id, license_id, text_id, url, entry)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            (projectid, moduleid, licenseid, textid, lic.get('moduleUrl', None),
+             jsonfile.dumps(entry)))
+        for user in lic.get('x-usedBy', []):
+            self._connection.execute(
+                "INSERT OR IGNORE INTO used_by (project_id, module_id, user) VALUES (?, ?, ?)",
+                (projectid, moduleid, user))
+
+    def _add_text(self, lic: dict) -> int:
+        # The text is kept as bytes, since license files are not always UTF-8.
+        data = LicenseText.get_data(lic)
+        if data is None:
+            return None
+        digest = hashlib.sha256(data).hexdigest()
+        row = self._connection.execute("SELECT id FROM texts WHERE digest = ?",
+                                       (digest,)).fetchone()
+        if row:
+            return row[0]
+        return self._connection.execute("INSERT INTO texts (digest, data) VALUES (?, ?)",
+                                        (digest, zlib.compress(data, 9))).lastrowid
+
+    def _prune(self):
+        # Removes the rows that were only used by the replaced entries of a project.
+        self._connection.execute(
+            """DELETE FROM texts WHERE NOT EXISTS
+               (SELECT 1 FROM dependencies d WHERE d.text_id = texts.id)""")
+        self._connection.execute(
+            """DELETE FROM licenses WHERE NOT EXISTS
+               (SELECT 1 FROM dependencies d WHERE d.license_id = licenses.id)""")
+        self._connection.execute(
+            """DELETE FROM modules WHERE NOT EXISTS
+               (SELECT 1 FROM dependencies d WHERE d.module_id = modules.id)
+               AND NOT EXISTS (SELECT 1 FROM used_by u WHERE u.module_id = modules.id)""")
+
+    def _get_id(self, table: str, **values) -> int:
+        columns = sorted(values.keys())
+        params = tuple(values[column] for column in columns)
+        where = " AND ".join("%s = ?" % column for column in columns)
+        row = self._connection.execute("SELECT id FROM %s WHERE %s" % (table, where),
+                                       params).fetchone()
+        if row:
+            return row[0]
+        return self._connection.execute(
+            "INSERT INTO %s (%s) VALUES (%s)" % (table, ", ".join(columns),
+                                                 ", ".join("?" * len(columns))),
+            params).lastrowid
+
+    def _make_license(self, row: tuple) -> dict:
+        name, version, licname, spdxid, osiapproved, url, text, entry, projectid, moduleid = row
+        lic = jsonfile.loads(entry)
+        lic['moduleName'] = name
+        if version:
+            lic['moduleVersion'] = version
+        if licname:
+            lic['moduleLicense'] = licname
+        if spdxid:
+            lic['x-spdxId'] = spdxid
+        if osiapproved is not None:
+            lic['x-isOsiApproved'] = bool(osiapproved)
+        if url:
+            lic['moduleUrl'] = url
+        if text:
+            lic[LicenseText.COMPRESSED_KEY] = base64.b64encode(text).decode('utf-8')
+        lic['x-usedBy'] = [user for (user,) in self._connection.execute(
+            "SELECT user FROM used_by WHERE project_id = ? AND module_id = ? ORDER BY user",
+            (projectid, moduleid))]
+        return lic
+
+
+def _default_project_name(path: str) -> str:
+    directory = os.path.dirname(path)
+    if os.path.basename(directory) == 'Dependencies':
+        directory = os.path.dirname(directory)
+    return os.path.basename(directory)
+
+
+def _parse_command_line(args: list):
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--verbose', action='store_true', help='Show debugging information')
+    common.add_argument('--database',
+                        default='licenses.db',
+                        help='The license database (Default is "licenses.db")')
+    parser = argparse.ArgumentParser(prog='license-scanner')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    ingest = commands.add_parser('ingest', parents=[common],
+                                 help='Add licenses files to the database')
+    ingest.add_argument('--name', help='Name of the project (only valid with a single file)')
+    ingest.add_argument('files', nargs='+', metavar='FILENAME',
+                        help='Licenses files, or directories to be searched for '
+                        + 'Dependencies/prereqs-licenses.json files')
+
+    query = commands.add_parser('query', parents=[common], help='Search the database')
+    queries = query.add_subparsers(dest='query', required=True)
+    projects = queries.add_parser('projects', help='Projects using modules with a given license')
+    projects.add_argument('license', help='License name or SPDX id (may contain %% wildcards)')
+    modules = queries.add_parser('modules', help='Modules and their licenses')
+    modules.add_argument('--project', help='Only list the modules of this project')
+    queries.add_parser('licenses', help='Number of modules and projects using each license')
+    usedby = queries.add_parser('used-by', help='Projects and modules that use a given module')
+    usedby.add_argument('module', help='Name of the module')
+    return parser.parse_args(args)
+
+
+def _find_licenses_files(names: list) -> list:
+    filenames = []
+    for name in names:
+        if not os.path.isdir(name):
+            filenames.append(name)
+            continue
+        for dirpath, dirnames, fnames in os.walk(name):
+            dirnames[:] = sorted(dname for dname in dirnames if not dname.startswith('.'))
+            if os.path.basename(dirpath) == 'Dependencies' and 'prereqs-licenses.json' in fnames:
+                filenames.append(os.path.join(dirpath, 'prereqs-licenses.json'))
+    return filenames
+
+
+def _print_rows(rows: list):
+    for row in rows:
+        print("\t".join("" if value is None else str(value) for value in row))
+
+
+def main(args: list = None):
+    """Entry point for the database commands.
+
+    Parameters:
+        args: list of strings specifying the arguments, starting with the command name.
+              If None then sys.argv will be used.
+    """
+    options = _parse_command_line(args)
+    logging.getLogger().setLevel(logging.DEBUG if options.verbose else logging.INFO)
+    database = LicenseDatabase(options.database)
+    try:
+        if options.command == 'ingest':
+            filenames = _find_licenses_files(options.files)
+            if options.name and len(filenames) != 1:
+                raise ValueError("--name may only be used when ingesting a single file")
+            added = sum(1 for filename in filenames if database.ingest(filename, options.name))
+            logging.info("Ingested %d of %d files", added, len(filenames))
+        elif options.query == 'projects':
+            _print_rows(database.projects_using(options.license))
+        elif options.query == 'modules':
+            _print_rows(database.modules(options.project))
+        elif options.query == 'licenses':
+            _print_rows(database.license_counts())
+        elif options.query == 'used-by':
+            _print_rows(database.users_of(options.module))
+    finally:
+        database.close()
@@ -0,0 +1,88 @@
+"""Comparison of two sets of license entries, giving the modules that have changed."""
+
+import hashlib
+import logging
+
+from . import jsonfile
+from .util import LicenseText
+
+
+# Incremented whenever the format of the delta changes.
+DELTA_FORMAT = 1
+
+
+def module_signature(lic: dict) -> dict:
+    """Returns the parts of a license entry that are compared, with the text as a digest."""
+    data = LicenseText.get_data(lic)
+    return {
+        'version': lic.get('moduleVersion', None),
+        'license': lic.get('moduleLicense', None),
+        'spdxId': lic.get('x-spdxId', None),
+        'url': lic.get('moduleUrl', None),
+        'textDigest': None if data is None else hashlib.sha256(data).hexdigest()
+    }
+
+
+def signatures(licenses) -> list:
+    """Returns the signatures of the license entries, by module name.
+
+    The result is a list of [name, [signature, ...]] pairs, in the order in which the
+    modules first appear, since a report may contain more than one version of a module.
+    It only contains JSON types, so that it can be saved and compared against later.
+    """
+    modules = {}
+    for lic in licenses:
+        modules.setdefault(lic.get('moduleName', ''), []).append(module_signature(lic))
+    return [[name, sigs] for name, sigs in modules.items()]
+
+
+def compare(old: list, new: list) -> dict:
+    """Compare two lists of signatures, as returned by `signatures()`.
+
+    Returns the delta, a dictionary containing:
+        added: the names of the modules only in new
+        removed: the names of the modules only in old
+        changed: for each module whose entries differ, the names of the fields that differ
+        unchanged: the number of modules that are the same in both
+        reordered: True if the modules in both are in a different order
+    """
+    old_modules = dict(old)
+    new_modules = dict(new)
+    changed = {}
+    for name, sigs in new_modules.items():
+        old_sigs = old_modules.get(name, None)
+        if old_sigs is None or old_sigs == sigs:
+            continue
+        fields = set()
+        for old_sig, sig in zip(old_sigs, sigs):
+            fields.update(field for field in sig if sig[field] != old_sig.get(field, None))
+        if len(old_sigs) != len(sigs):
+            fields.add('count')
+        changed[name] = sorted(fields)
+    common = [name for name in old_modules if name in new_modules]
+    return {
+        'format': DELTA_FORMAT,
+        'added': [name for name in new_modules if name not in old_modules],
+        'removed': [name for name in old_modules if name not in new_modules],
+        'changed': changed,
+        'unchanged': len(common) - len(changed),
+        'reordered': common != [name for name in new_modules if name in old_modules]
+    }
+
+
+def is_empty(delta: dict) -> bool:
+    """Returns True if the delta contains no changes at all."""
+    return not (delta['added'] or delta['removed'] or delta['changed'] or delta['reordered'])
+
+
+def affected(delta: dict) -> set:
+    """Returns the names of the modules that were added or changed."""
+    return set(delta['added']).union(delta['changed'])
+
+
+def diff_files(old_filename: str, new_filename: str) -> dict:
+    """Compare the dependencies of two licenses files, returning the delta."""
+    logging.info("Comparing '%s' with '%s'", old_filename, new_filename)
+    old = jsonfile.read_file(old_filename).get('dependencies', [])
+    new = jsonfile.read_file(new_filename).get('dependencies', [])
+    return compare(signatures(old), signatures(new))
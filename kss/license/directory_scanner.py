@@ -5,10 +5,10 @@ import logging
 from abc import abstractmethod
 import os
 
-import kss.util.jsonreader as jsonreader
-
+from . import jsonfile
+from .module_cache import ModuleCache
 from .scanner import Scanner
-from .util import read_encoded, Ninka
+from .util import LicenseText, Ninka
 
 
 class DirectoryScanner(Scanner):
@@ -17,22 +17,72 @@ class DirectoryScanner(Scanner):
     This can be subclassed to create a scanner that will search for licenses in an
     existing code based. The subclass will define what directories should be examined
     by overriding the `get_project_list()` method.
+
+    If a `SubprojectScanner` is given, each of the projects will itself be scanned, and
+    the licenses found used in place of its `Dependencies/prereqs-licenses.json` file.
+
+    If a `ModuleCache` is given, the license entries of the projects that have both a
+    version and a URL are read from it when present, and added to it once their details
+    have been resolved. Only entries whose checkout was found, and whose license was
+    identified, are added, since others may be resolved differently elsewhere.
     """
 
     ninka = Ninka()
 
-    def __init__(self, modulename: str):
+    # Marks the entries that resolve_details() is to add to, or has read from, the module
+    # cache. It is removed when the details are resolved, and the entries whose details
+    # are never resolved are those that are merged into another entry or ignored.
+    _CACHE_ENTRY_KEY = '_x-moduleCacheEntry'
+
+    def __init__(self, modulename: str, subprojects=None, module_cache: ModuleCache = None):
         super().__init__(modulename)
         self._entries = None
+        self._subprojects = subprojects
+        self._module_cache = module_cache
+
+    @classmethod
+    def create(cls, modulename: str, options, subprojects=None):
+        return cls(modulename, subprojects=subprojects,
+                   module_cache=ModuleCache.from_options(options))
 
     def scan(self) -> list:
         lics = []
-        entries = self.get_project_list()
-        for prereq in entries:
-            logging.info("   examining '%s'", prereq['name'])
-            lics.extend(self.pre_project_callback(prereq) or [])
-            lics.extend(self._get_existing_prereqs_for_project(prereq) or [])
-            lics.append(self._process_prereq(prereq))
+        for prereq in self.discover():
+            lics.extend(self.resolve(prereq))
+        return lics
+
+    def discover(self) -> list:
+        projects = self.get_project_list()
+        if self._subprojects:
+            self._subprojects.start(projects)
+        return projects
+
+    def resolve(self, prereq) -> list:
+        logging.info("   examining '%s'", prereq['name'])
+        lics = []
+        lics.extend(self.pre_project_callback(prereq) or [])
+        lics.extend(self._get_existing_prereqs_for_project(prereq) or [])
+        lics.append(self._process_prereq(prereq))
+        return lics
+
+    def item_name(self, prereq) -> str:
+        return prereq['name']
+
+    def resolve_incomplete(self, prereq, reason: str) -> list:
+        lic = super().resolve_incomplete(prereq, reason)[0]
+        if prereq.get('version', None):
+            lic['moduleVersion'] = prereq['version']
+        if prereq.get('url', None):
+            lic['moduleUrl'] = prereq['url']
+        return [lic]
+
+    def resolve_duplicate(self, prereq) -> list:
+        # The license of the project itself is not needed, but the licenses of its own
+        # dependencies may differ from those found with the earlier copy.
+        lics = []
+        lics.extend(self.pre_project_callback(prereq) or [])
+        lics.extend(self._get_existing_prereqs_for_project(prereq) or [])
+        lics.append({'moduleName': prereq['name']})
         return lics
 
     @abstractmethod
@@ -62,22 +112,75 @@ class DirectoryScanner(Scanner):
         """
         return None
 
-    @classmethod
-    def _get_existing_prereqs_for_project(cls, project: dict) -> list:
+    def _get_existing_prereqs_for_project(self, project: dict) -> list:
+        if self._subprojects:
+            newlicenses = self._subprojects.get_licenses(project)
+            if newlicenses is not None:
+                logging.info("      also found %s",
+                             sorted([sub['moduleName'] for sub in newlicenses]))
+                return newlicenses
         directory = project.get('directory', None)
         if directory:
             filename = "%s/Dependencies/prereqs-licenses.json" % directory
             if os.path.isfile(filename):
-                newlicenses = jsonreader.from_file(filename)['dependencies']
+                newlicenses = jsonfile.read_file(filename)['dependencies']
+                for lic in newlicenses:
+                    LicenseText.normalize(lic)
                 logging.info("      also found %s",
                              sorted([sub['moduleName'] for sub in newlicenses]))
                 return newlicenses
         return None
 
+    def resolve_details(self, lic: dict):
+        entry = lic.pop(self._CACHE_ENTRY_KEY, None)
+        if entry is None:
+            super().resolve_details(lic)
+            return
+        if entry['cached']:
+            # The details were resolved before the entry was added to the cache.
+            if self._should_add_to_used_by(lic):
+                self.ensure_used_by(self.modulename, lic)
+            return
+        super().resolve_details(lic)
+        if not lic.get(self.GITHUB_PENDING_KEY, False):
+            self._module_cache.put(tuple(entry['key']), lic, **entry['items'])
+
     @classmethod
-    def _process_prereq(cls, prereq: dict) -> dict:
-        details = cls._details_for_prereq(prereq)
-        return cls._license_from_details(details)
+    def _is_cacheable(cls, lic: dict) -> bool:
+        # An entry that timed out, or whose license was not identified (which may be
+        # because ninka is not installed), could be resolved differently by another scan.
+        return not lic.get(cls.INCOMPLETE_KEY, None) and lic.get('moduleLicense', None) \
+            not in (None, 'Unknown')
+
+    def _get_cached_license(self, key: tuple) -> dict:
+        # Returns the record stored for key, with its license entry tracked so that
+        # resolve_details() knows it is complete, or None if it is not in the cache.
+        if key is None:
+            return None
+        record = self._module_cache.get(key)
+        if record:
+            self._track_cache_entry(record['license'], key, True)
+        return record
+
+    def _track_cache_entry(self, lic: dict, key: tuple, cached: bool, **items):
+        # Entries that are not in the cache are added to it by resolve_details().
+        if key is not None:
+            lic[self._CACHE_ENTRY_KEY] = {'key': list(key), 'cached': cached, 'items': items}
+
+    def _process_prereq(self, prereq: dict) -> dict:
+        key = None
+        if self._module_cache:
+            key = ModuleCache.key(prereq['name'], prereq.get('version', None),
+                                  prereq.get('url', None))
+        record = self._get_cached_license(key)
+        if record:
+            return record['license']
+        details = self._details_for_prereq(prereq)
+        lic = self._license_from_details(details)
+        directory = prereq.get('directory', None)
+        if directory is not None and os.path.isdir(directory) and self._is_cacheable(lic):
+            self._track_cache_entry(lic, key, False)
+        return lic
 
     @classmethod
     def _details_for_prereq(cls, entry: dict) -> dict:
@@ -97,6 +200,8 @@ class DirectoryScanner(Scanner):
             lic['moduleUrl'] = details['url']
         licensefilename = details.get('license-filename', None)
         if licensefilename:
-            lic['x-licenseTextEncoded'] = read_encoded(licensefilename)
+            LicenseText.add(licensefilename, lic)
         lic['moduleLicense'] = 'Unknown' if not details['license'] else details['license']
+        if details.get('incomplete', None):
+            lic[cls.INCOMPLETE_KEY] = details['incomplete']
         return lic
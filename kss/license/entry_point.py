@@ -3,19 +3,103 @@
 """Scans a directory to determine the licenses of its dependancies."""
 
 import argparse
+import contextlib
 import datetime
-import json
 import logging
 import os
 import pathlib
 import sys
+import time
 
-from .kss_prereqs_scanner import KSSPrereqsScanner
-from .manual_scanner import ManualScanner
-from .swift_scanner import SwiftModuleScanner
+from . import jsonfile
+from .checkpoint import Checkpoint, CheckpointedScan, resolve_pending
+from .policy import LicensePolicy, PolicyViolation
+from .recursive import SubprojectScanner
+from .registry import create_scanners
+from .scanner import Scanner
+from .util import Capabilities, GitHub, LicenseText, NotAvailableException, Timeouts, TreeWalk
 from . import __version__
 
 
+# pylint: disable=import-outside-toplevel
+#   Justification: the modules only needed by the commands and by the optional features
+#   are imported when they are used, so that a plain scan does not pay for them.
+
+def _database(args: list):
+    from . import database
+    database.main(args)
+
+def _merge(args: list):
+    from .shard import merge
+    parser = argparse.ArgumentParser(prog='license-scanner merge')
+    parser.add_argument('--verbose', action='store_true', help='Show debugging information')
+    parser.add_argument('--output',
+                        default='Dependencies/prereqs-licenses.json',
+                        help='Output file. (Default is "Dependencies/prereqs-licenses.json")')
+    parser.add_argument('files', nargs='+', metavar='FILENAME',
+                        help='The partial results written by each of the --shard scans')
+    options = parser.parse_args(args[1:])
+    logging.getLogger().setLevel(logging.DEBUG if options.verbose else logging.INFO)
+    licenses, project = merge(options.files)
+    _write_licenses(options.output, licenses, _generated_metadata(project))
+
+
+def _resolve_pending(args: list):
+    parser = argparse.ArgumentParser(prog='license-scanner resolve-pending')
+    parser.add_argument('--verbose', action='store_true', help='Show debugging information')
+    parser.add_argument('files', nargs='+', metavar='FILENAME',
+                        help='Licenses files written using --defer-github')
+    options = parser.parse_args(args[1:])
+    logging.getLogger().setLevel(logging.DEBUG if options.verbose else logging.INFO)
+    remaining = 0
+    for filename in options.files:
+        logging.info("Reading licenses from '%s'", filename)
+        data = jsonfile.read_file(filename)
+        if not remaining:
+            remaining = resolve_pending(data['dependencies'])
+        jsonfile.write_file(filename, data)
+    if remaining:
+        logging.error("Entries are still pending, run this again once more GitHub API calls "
+                      + "are available")
+        sys.exit(1)
+
+
+def _diff(args: list):
+    from . import diff
+    parser = argparse.ArgumentParser(prog='license-scanner diff')
+    parser.add_argument('--verbose', action='store_true', help='Show debugging information')
+    parser.add_argument('--output', help='Write the delta to this file instead of the output')
+    parser.add_argument('old', metavar='OLD', help='The previous licenses file')
+    parser.add_argument('new', metavar='NEW', help='The new licenses file')
+    options = parser.parse_args(args[1:])
+    logging.getLogger().setLevel(logging.DEBUG if options.verbose else logging.INFO)
+    delta = diff.diff_files(options.old, options.new)
+    if options.output:
+        jsonfile.write_file(options.output, delta)
+    else:
+        print(jsonfile.dumps(delta))
+    if not diff.is_empty(delta):
+        sys.exit(1)
+
+
+# Commands, given as the first argument, that are run instead of a scan.
+_COMMANDS = {
+    'ingest': _database,
+    'query': _database,
+    'merge': _merge,
+    'diff': _diff,
+    'resolve-pending': _resolve_pending
+}
+
+
+def _shard_argument(value: str) -> tuple:
+    from .shard import parse_shard
+    try:
+        return parse_shard(value)
+    except ValueError as ex:
+        raise argparse.ArgumentTypeError(str(ex))
+
+
 def _parse_command_line(args: list):
     parser = argparse.ArgumentParser()
     parser.add_argument('--verbose', action='store_true', help='Show debugging information')
@@ -35,7 +119,140 @@ def _parse_command_line(args: list):
                         metavar='FILENAME',
                         help='File containing manually generated license entries, within '
                         + 'the scanned directory. Default is "manual-licenses.json")')
-    return parser.parse_args(args)
+    parser.add_argument('--exclude',
+                        action='append',
+                        default=[],
+                        metavar='GLOB',
+                        help='Do not search files or directories matching this pattern. May be '
+                        + 'given more than once.')
+    parser.add_argument('--exclude-file',
+                        default='.license-scanner-exclude',
+                        metavar='FILENAME',
+                        help='File containing additional patterns to exclude, one per line, '
+                        + 'within the scanned directory. (Default is ".license-scanner-exclude")')
+    parser.add_argument('--use-gitignore',
+                        action='store_true',
+                        help='Do not search the files and directories ignored by .gitignore files')
+    parser.add_argument('--wheelhouse',
+                        metavar='DIRECTORY',
+                        help='Resolve pip prerequisites by reading the wheels in this directory '
+                        + '(a wheelhouse or pip wheel cache) instead of the installed modules')
+    parser.add_argument('--pip-lock',
+                        action='append',
+                        default=[],
+                        metavar='FILENAME',
+                        help='Requirements or Pipfile.lock file whose pinned versions select the '
+                        + 'wheels used by --wheelhouse. May be given more than once.')
+    parser.add_argument('--git-mirror',
+                        metavar='DIRECTORY',
+                        help='Resolve git prerequisites by reading the bare repositories in this '
+                        + 'directory instead of checkouts')
+    parser.add_argument('--module-cache',
+                        nargs='?',
+                        const='',
+                        metavar='DIRECTORY',
+                        help='Reuse the license entries of modules, identified by their name, '
+                        + 'version and URL, that were found by earlier scans. The entries are '
+                        + 'stored in DIRECTORY, which may be shared, or in the scanner cache if '
+                        + 'it is not given.')
+    parser.add_argument('--text-store',
+                        nargs='?',
+                        const='',
+                        metavar='DIRECTORY',
+                        help='Keep the license texts in DIRECTORY (or in the scanner cache if it '
+                        + 'is not given) during the scan, rather than in memory, and only read '
+                        + 'them back as the output is written')
+    parser.add_argument('--compress-license-text',
+                        action='store_true',
+                        help='Store the license texts zlib compressed, in x-licenseTextCompressed, '
+                        + 'instead of in x-licenseTextEncoded')
+    parser.add_argument('--max-license-text-size',
+                        type=int,
+                        metavar='BYTES',
+                        help='Do not include license texts that are larger than this')
+    parser.add_argument('--pipeline',
+                        action='store_true',
+                        help='Run the scanners as a concurrent pipeline, overlapping the network '
+                        + 'lookups with the local work')
+    parser.add_argument('--recursive',
+                        action='store_true',
+                        help='Scan the checked out dependencies as sub-projects, instead of '
+                        + 'relying on their Dependencies/prereqs-licenses.json files')
+    parser.add_argument('--jobs',
+                        type=int,
+                        metavar='COUNT',
+                        help='Number of processes used by --recursive (defaults to the number '
+                        + 'of CPUs)')
+    parser.add_argument('--allow-license',
+                        action='append',
+                        default=[],
+                        metavar='SPDXID',
+                        help='Only permit these licenses (comma separated SPDX ids). May be '
+                        + 'given more than once.')
+    parser.add_argument('--deny-license',
+                        action='append',
+                        default=[],
+                        metavar='SPDXID',
+                        help='Do not permit these licenses (comma separated SPDX ids). May be '
+                        + 'given more than once.')
+    parser.add_argument('--require-osi-approved',
+                        action='store_true',
+                        help='Only permit OSI approved licenses')
+    parser.add_argument('--policy-only',
+                        action='store_true',
+                        help='Only check the license policy: stop at the first violation, do '
+                        + 'not read the license texts, and do not write the output file')
+    parser.add_argument('--shard',
+                        type=_shard_argument,
+                        metavar='I/N',
+                        help='Only resolve the I\'th of N parts of the scan, writing a partial '
+                        + 'result to the output file. The partial results are combined using '
+                        + '"license-scanner merge".')
+    parser.add_argument('--checkpoint',
+                        metavar='FILENAME',
+                        help='Periodically save the progress of the scan to FILENAME, and save '
+                        + 'it if the scan is interrupted. The file is removed once the scan is '
+                        + 'complete.')
+    parser.add_argument('--resume',
+                        action='store_true',
+                        help='Continue the scan from the progress saved by --checkpoint, if any')
+    parser.add_argument('--defer-github',
+                        action='store_true',
+                        help='Do not use the GitHub API while scanning. The entries that need it '
+                        + 'are marked with x-githubPending, and may be completed later using '
+                        + '"license-scanner resolve-pending".')
+    parser.add_argument('--command-timeout',
+                        type=float,
+                        metavar='SECONDS',
+                        help='Stop any command, such as ninka or pip, that takes longer than this')
+    parser.add_argument('--network-timeout',
+                        type=float,
+                        default=60.0,
+                        metavar='SECONDS',
+                        help='Give up on any network request that takes longer than this. '
+                        + '(Default is 60)')
+    parser.add_argument('--deadline',
+                        type=float,
+                        metavar='SECONDS',
+                        help='Stop examining modules once the scan has taken this long. The '
+                        + 'modules not yet examined are given the license "Unknown" and marked '
+                        + 'with x-incomplete, and the output is still written.')
+    parser.add_argument('--profile',
+                        metavar='FILENAME',
+                        help='Profile the scan, writing the statistics to FILENAME and the '
+                        + 'sampled stacks to FILENAME.folded')
+    options = parser.parse_args(args)
+    # The deadline is given to the sub-project scans as a time, since they start later.
+    options.deadline_time = time.time() + options.deadline if options.deadline else None
+    if options.resume and not options.checkpoint:
+        parser.error('--resume requires --checkpoint')
+    if options.checkpoint and (options.pipeline or options.shard):
+        parser.error('--checkpoint cannot be used with --pipeline or --shard')
+    if options.shard and (options.allow_license or options.deny_license
+                          or options.require_osi_approved or options.policy_only):
+        # Each shard only sees part of the licenses, and merge does not check them.
+        parser.error('the license policy options cannot be used with --shard')
+    return options
 
 
 def _write_licenses(filename: str, licenses: dict, metadata: dict):
@@ -43,20 +260,52 @@ def _write_licenses(filename: str, licenses: dict, metadata: dict):
     if outputdir:
         pathlib.Path(outputdir).mkdir(parents=True, exist_ok=True)
     data = {
-        'dependencies': sorted(licenses.values(), key=lambda x: x['moduleName']),
+        'dependencies': _ExpandedLicenses(sorted(licenses.values(), key=lambda x: x['moduleName'])),
         'generated': metadata
     }
-    with open(filename, 'w') as outfile:
-        json.dump(data, outfile, indent=4, sort_keys=True)
+    jsonfile.write_file(filename, data)
+
+class _ExpandedLicenses(list):
+    # The entries are expanded one at a time as json.dump() iterates over them, so that
+    # only one of the texts held in the text store is in memory at once.
+    def __iter__(self):
+        return map(LicenseText.expand, super().__iter__())
 
-def _generated_metadata():
+def _make_paths_absolute(options):
+    # The scan takes place in the scanned directory, possibly in another process, so
+    # any paths given relative to the current directory must be made absolute first.
+    if options.wheelhouse:
+        options.wheelhouse = os.path.abspath(options.wheelhouse)
+    options.pip_lock = [os.path.abspath(filename) for filename in options.pip_lock]
+    if options.git_mirror:
+        options.git_mirror = os.path.abspath(options.git_mirror)
+    if options.checkpoint:
+        options.checkpoint = os.path.abspath(options.checkpoint)
+    if options.module_cache:
+        options.module_cache = os.path.abspath(options.module_cache)
+    if options.text_store:
+        options.text_store = os.path.abspath(options.text_store)
+
+def _read_excludes(options) -> list:
+    excludes = list(options.exclude)
+    if os.path.isfile(options.exclude_file):
+        logging.debug("  reading excludes from '%s'", options.exclude_file)
+        with open(options.exclude_file, 'r') as infile:
+            for line in infile.read().splitlines():
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    excludes.append(line)
+    return excludes
+
+def _generated_metadata(project: str = None):
     args = ""
     if len(sys.argv) > 1:
         args = " %s" % ' '.join(sys.argv[1:])
     metadata = {
         'time': datetime.datetime.now().astimezone().isoformat(),
         'process': 'license-scanner%s' % args,
-        'project': os.path.basename(os.getcwd())
+        'project': project or os.path.basename(os.getcwd()),
+        'capabilities': Capabilities.probe()
     }
     return metadata
 
@@ -67,8 +316,16 @@ def scan(args: list = None):
 
     Parameters:
         args: list of strings specifying the arguments. If None then sys.argv will be used.
+              If the first argument is one of the commands (e.g. "ingest" or "query") then
+              that command is run instead of a scan.
     """
 
+    if args is None:
+        args = sys.argv[1:]
+    if args and args[0] in _COMMANDS:
+        _COMMANDS[args[0]](args)
+        return
+
     options = _parse_command_line(args)
     if options.version:
         print(__version__)
@@ -76,6 +333,14 @@ def scan(args: list = None):
 
     logging.getLogger().setLevel(logging.DEBUG if options.verbose else logging.INFO)
 
+    if options.profile:
+        from .profiler import Profiler
+        with Profiler(options.profile):
+            _scan(options)
+    else:
+        _scan(options)
+
+def _scan(options):
     if not os.path.isdir(options.directory):
         raise FileNotFoundError(options.directory)
 
@@ -85,25 +350,141 @@ def scan(args: list = None):
         directory = cwd
     modulename = options.name or os.path.basename(directory)
     outputfile = options.output
-    manualentries = options.manual_licenses
+    _make_paths_absolute(options)
 
     logging.info("Scanning for licenses in '%s'", directory)
     logging.debug("  identifying module as '%s'", modulename)
     logging.debug("  will write output to '%s'", outputfile)
-    logging.debug("  will look for manual entries in '%s'", manualentries)
+    logging.debug("  will look for manual entries in '%s'", options.manual_licenses)
+
+    if options.shard:
+        _scan_shard(directory, modulename, options)
+        return
 
+    policy = LicensePolicy.from_options(options)
+    subprojects = SubprojectScanner(options) if options.recursive else None
+    checkpoint = Checkpoint(options.checkpoint) if options.checkpoint else None
     try:
-        os.chdir(directory)
+        licenses = scan_directory(directory, modulename, options, subprojects, policy,
+                                  checkpoint)
+    except PolicyViolation as ex:
+        logging.error("License policy violation: %s", ex)
+        sys.exit(1)
+    except NotAvailableException as ex:
+        logging.error("%s", ex)
+        if checkpoint:
+            logging.error("The progress has been saved, use --resume to continue the scan")
+        else:
+            logging.error("Use --checkpoint to be able to resume the scan, or --defer-github "
+                          + "to complete it without the GitHub lookups")
+        sys.exit(1)
+    finally:
+        if subprojects:
+            subprojects.shutdown()
+    incomplete = sorted(name for name, lic in licenses.items()
+                        if lic.get(Scanner.INCOMPLETE_KEY, None))
+    if incomplete:
+        logging.warning("%d modules could not be examined in time: %s",
+                        len(incomplete), incomplete)
+    if not options.policy_only:
+        try:
+            os.chdir(directory)
+            with _license_text(options):
+                _write_licenses(outputfile, licenses, _generated_metadata())
+        finally:
+            os.chdir(cwd)
+    if checkpoint:
+        checkpoint.remove()
+    if policy and policy.violations:
+        for violation in policy.violations:
+            logging.error("License policy violation: %s", violation)
+        sys.exit(1)
+
+def scan_directory(directory: str, modulename: str, options,
+                   subprojects: SubprojectScanner = None, policy: LicensePolicy = None,
+                   checkpoint: Checkpoint = None) -> dict:
+    """Scan the given directory and return the licenses that were found.
+
+    Parameters:
+        directory: the directory to be scanned
+        modulename: the name used for the directory in the x-usedBy fields
+        options: the parsed command line options
+        subprojects: if given, will be used to scan the dependencies as sub-projects
+        policy: if given, each license found is checked against it
+        checkpoint: if given, the progress is saved to it (and with --resume, restored
+                    from it)
+    Raises:
+        PolicyViolation if the policy is violated and is set to fail fast
+    """
+    with _scanning(directory, options, policy):
         licenses = {}
-        scanners = [ManualScanner(modulename, manualentries),
-                    SwiftModuleScanner(modulename),
-                    KSSPrereqsScanner(modulename)
-                    ]
-        for scanner in scanners:
-            scanner.add_licenses(licenses)
-        _write_licenses(outputfile, licenses, _generated_metadata())
+        scanners = create_scanners(modulename, options, subprojects)
+        if checkpoint:
+            CheckpointedScan(scanners, checkpoint, options.resume).run(modulename, licenses)
+        elif options.pipeline:
+            from .pipeline import ScanPipeline
+            ScanPipeline(scanners).run(licenses)
+        else:
+            for scanner in scanners:
+                scanner.add_licenses(licenses)
+        return licenses
+
+def _scan_shard(directory: str, modulename: str, options):
+    from .shard import ShardedScan
+    index, count = options.shard
+    logging.info("Scanning shard %d of %d", index, count)
+    subprojects = SubprojectScanner(options, parallel=False) if options.recursive else None
+    with _scanning(directory, options):
+        scanners = create_scanners(modulename, options, subprojects)
+        partial = ShardedScan(scanners, index, count).run(modulename,
+                                                          os.path.basename(directory))
+        for item in partial['items']:
+            # The partial results may be merged elsewhere, where the text store is not available.
+            item['licenses'] = [LicenseText.expand(lic) for lic in item['licenses']]
+        outputdir = os.path.dirname(options.output)
+        if outputdir:
+            pathlib.Path(outputdir).mkdir(parents=True, exist_ok=True)
+        jsonfile.write_file(options.output, partial)
+
+@contextlib.contextmanager
+def _scanning(directory: str, options, policy: LicensePolicy = None):
+    # Sets up the shared scanner state for a scan of the given directory, restoring
+    # the previous state afterwards.
+    cwd = os.getcwd()
+    ignored = Scanner.reset_ignored()
+    previous_policy = Scanner.set_policy(policy)
+    previous_walk = TreeWalk.configure()
+    previous_deferred = GitHub.set_deferred(options.defer_github)
+    previous_timeouts = Timeouts.configure(options.command_timeout, options.network_timeout,
+                                           options.deadline_time)
+    try:
+        os.chdir(directory)
+        TreeWalk.configure(_read_excludes(options), options.use_gitignore)
+        with _license_text(options):
+            yield
     finally:
+        Scanner.reset_ignored(ignored)
+        Scanner.set_policy(previous_policy)
+        TreeWalk.configure(*previous_walk)
+        GitHub.set_deferred(previous_deferred)
+        Timeouts.configure(*previous_timeouts)
         os.chdir(cwd)
 
+@contextlib.contextmanager
+def _license_text(options):
+    # Configures the license texts, restoring the previous configuration afterwards. The
+    # output must also be written within this, as that is when stored texts are expanded.
+    store = None
+    if options.text_store is not None:
+        from .text_store import TextStore
+        store = TextStore.from_options(options)
+    previous = LicenseText.configure(options.compress_license_text,
+                                     options.max_license_text_size,
+                                     enabled=not options.policy_only, store=store)
+    try:
+        yield
+    finally:
+        LicenseText.configure(*previous)
+
 if __name__ == '__main__':
     scan()
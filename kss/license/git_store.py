@@ -0,0 +1,120 @@
+"""Access to the objects of a git repository without requiring a checkout."""
+
+import atexit
+import logging
+import os
+import subprocess
+import threading
+
+from .util import cache_directory
+
+
+class GitObjectStore:
+    """Reads the objects of a git repository, typically a bare mirror, directly.
+
+    A single long lived `git cat-file --batch` process is used for each repository,
+    so looking up any number of objects only costs one subprocess. Use
+    `for_repository()` to obtain the shared instance for a given repository.
+    """
+
+    _stores = {}
+    _stores_lock = threading.Lock()
+
+    def __init__(self, gitdir: str):
+        self._gitdir = gitdir
+        self._lock = threading.Lock()
+        logging.debug("Starting git cat-file for '%s'", gitdir)
+        # pylint: disable=consider-using-with
+        #   Justification: the process is kept running until close() is called.
+        self._process = subprocess.Popen(['git', '--git-dir=%s' % gitdir, 'cat-file', '--batch'],
+                                         stdin=subprocess.PIPE,
+                                         stdout=subprocess.PIPE,
+                                         stderr=subprocess.DEVNULL)
+
+    @classmethod
+    def is_repository(cls, gitdir: str) -> bool:
+        """Returns True if the directory looks like a git directory, such as a bare mirror."""
+        return os.path.isfile("%s/HEAD" % gitdir) or os.path.isdir("%s/objects" % gitdir)
+
+    @classmethod
+    def for_repository(cls, gitdir: str):
+        """Returns the shared object store for the given repository."""
+        gitdir = os.path.abspath(gitdir)
+        with cls._stores_lock:
+            if gitdir not in cls._stores:
+                cls._stores[gitdir] = GitObjectStore(gitdir)
+            return cls._stores[gitdir]
+
+    @classmethod
+    def close_all(cls):
+        """Stops the processes of all the shared object stores."""
+        with cls._stores_lock:
+            for store in cls._stores.values():
+                store.close()
+            cls._stores = {}
+
+    def close(self):
+        """Stops the git process."""
+        with self._lock:
+            try:
+                self._process.stdin.close()
+            except BrokenPipeError:
+                # The process has already exited.
+                pass
+            self._process.wait()
+            self._process.stdout.close()
+
+    def read_object(self, name: str) -> tuple:
+        """Read the named object, which may be any git revision expression.
+
+        Returns a tuple of the object id, its type, and its contents or None if the
+        object does not exist.
+        """
+        with self._lock:
+            self._process.stdin.write(name.encode('utf-8') + b'\n')
+            self._process.stdin.flush()
+            header = self._process.stdout.readline().decode('utf-8').split()
+            if len(header) != 3:
+                return None
+            data = self._process.stdout.read(int(header[2]))
+            self._process.stdout.read(1)
+            return (header[0], header[1], data)
+
+    def extract_license(self, revision: str = 'HEAD') -> tuple:
+        """Find the license file in the top level of the given revision.
+
+        The license file is copied into the scanner cache. Returns a tuple of the
+        commit id and the cache directory, which is suitable for passing to
+        `Ninka.guess_license()`, or (None, None) if the revision does not exist.
+        """
+        commit = self.read_object('%s^{commit}' % revision)
+        if commit is None:
+            logging.warning("Could not find '%s' in '%s'", revision, self._gitdir)
+            return (None, None)
+        commitid = commit[0]
+        directory = cache_directory('git', commitid)
+        if not os.path.isfile("%s/.searched" % directory):
+            tree = self.read_object('%s^{tree}' % commitid)
+            for mode, name, objectid in self._parse_tree(tree[2], len(tree[0]) // 2):
+                if mode in ('100644', '100755') and name.upper().startswith('LICENSE'):
+                    logging.debug("Found '%s' in '%s' at %s", name, self._gitdir, commitid)
+                    with open("%s/%s" % (directory, name), 'wb') as outfile:
+                        outfile.write(self.read_object(objectid)[2])
+                    break
+            with open("%s/.searched" % directory, 'w'):
+                pass
+        return (commitid, directory)
+
+    @classmethod
+    def _parse_tree(cls, data: bytes, idsize: int):
+        pos = 0
+        while pos < len(data):
+            space = data.index(b' ', pos)
+            nul = data.index(b'\0', space)
+            yield (data[pos:space].decode('utf-8'),
+                   data[space+1:nul].decode('utf-8', 'replace'),
+                   data[nul+1:nul+1+idsize].hex())
+            pos = nul + 1 + idsize
+
+
+atexit.register(GitObjectStore.close_all)
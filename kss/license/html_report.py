@@ -3,19 +3,34 @@
 """Takes a licenses JSON file and writes out an HTML report."""
 
 import argparse
-import base64
+import hashlib
 import html
+import json
 import logging
+import os
 import pkgutil
+import re
 
-import kss.util.jsonreader as jsonreader
+from . import diff, jsonfile
+from .database import LicenseDatabase
+from .profiler import Profiler
+from .util import LicenseText, SPDX
+from . import __version__
 
-from .util import SPDX
+
+# Incremented whenever the format of the saved report state changes.
+STATE_FORMAT = 2
+
+# Incremented whenever the markup written for the report changes.
+REPORT_FORMAT = 1
+
+# The resources that are included in the report.
+_RESOURCES = ('resources/_styles.css', 'resources/_scripts.js', 'resources/_lazy_scripts.js')
 
 
 def _read_licenses(filename: str) -> list:
     logging.info("Reading licenses from '%s'", filename)
-    data = jsonreader.from_file(filename)
+    data = jsonfile.read_file(filename)
     if "dependencies" not in data:
         raise TypeError("%s should contain a dependencies item" % filename)
     licenses = data['dependencies']
@@ -23,6 +38,14 @@ def _read_licenses(filename: str) -> list:
         raise TypeError("%s: dependencies should contain a JSON list" % filename)
     return licenses
 
+def _read_licenses_from_database(filename: str, project: str):
+    logging.info("Reading licenses from the database '%s'", filename)
+    database = LicenseDatabase(filename)
+    try:
+        yield from database.get_licenses(project)
+    finally:
+        database.close()
+
 def _write_licenses(licenses: dict, local_license_filename: str, filename: str):
     spdx = SPDX()
     logging.info("Writing HTML to '%s'", filename)
@@ -49,6 +72,160 @@ def _write_licenses(licenses: dict, local_license_filename: str, filename: str):
         outfile.write("</body>\n")
         outfile.write("</html>\n")
 
+def _write_lazy_licenses(licenses: list, local_license_filename: str, filename: str):
+    logging.info("Writing HTML to '%s'", filename)
+    data = json.dumps(_make_data_island(licenses), sort_keys=True, separators=(',', ':'))
+    with open(filename, 'w') as outfile:
+        outfile.write("<!DOCTYPE html>\n")
+        outfile.write("<!-- Auto-generated by kss.license.html_report. Do not edit manually. -->\n")
+        outfile.write("<html>\n")
+        outfile.write("<head>\n")
+        outfile.write("<meta charset='utf-8'>\n")
+        outfile.write("<style>\n")
+        outfile.write(pkgutil.get_data(__name__, 'resources/_styles.css').decode('utf-8'))
+        outfile.write("</style>\n")
+        outfile.write("</head>\n")
+        outfile.write("<body>\n")
+        _write_local_license(local_license_filename, outfile)
+        outfile.write("<p>This project makes use of resources from the following third parties.\n")
+        outfile.write("Their use is subject to the licenses described here.</p>\n")
+        outfile.write("<div id='searchBar'>\n")
+        outfile.write("  <input id='searchText' type='search' placeholder='Search modules'>\n")
+        outfile.write("  <select id='licenseFilter'>"
+                      + "<option value=''>All licenses</option></select>\n")
+        outfile.write("</div>\n")
+        outfile.write("<ul id='topUL'></ul>\n")
+        outfile.write("<script type='application/json' id='licenseData'>")
+        # A "</" within the data would end the script element early.
+        outfile.write(data.replace("</", "<\\/"))
+        outfile.write("</script>\n")
+        outfile.write("<script>\n")
+        outfile.write(pkgutil.get_data(__name__, 'resources/_lazy_scripts.js').decode('utf-8'))
+        outfile.write("</script>\n")
+        outfile.write("</body>\n")
+        outfile.write("</html>\n")
+
+def _write_split_licenses(licenses: list, local_license_filename: str, filename: str,
+                          delta: dict = None):
+    # The index links to a page per module, hence when a delta is given only the pages
+    # of the modules it affects are written, and the index only if the modules changed.
+    spdx = SPDX()
+    directory = _fragment_directory(filename)
+    os.makedirs(directory, exist_ok=True)
+    modules = {}
+    for lic in licenses:
+        modules.setdefault(lic.get('moduleName', ''), []).append(lic)
+    if delta is None:
+        wanted = set(_fragment_filename(name) for name in modules)
+        removed = [fname for fname in os.listdir(directory)
+                   if fname.endswith('.html') and fname not in wanted]
+    else:
+        removed = [_fragment_filename(name) for name in delta['removed']]
+    for fname in removed:
+        fragment = os.path.join(directory, fname)
+        if os.path.isfile(fragment):
+            logging.info("Removing '%s'", fragment)
+            os.remove(fragment)
+    affected = None if delta is None else diff.affected(delta)
+    for name, lics in modules.items():
+        if affected is None or name in affected:
+            fragment = os.path.join(directory, _fragment_filename(name))
+            _write_fragment(name, lics, spdx, fragment, os.path.basename(filename))
+    if delta is not None and not (delta['added'] or delta['removed'] or delta['reordered']):
+        return
+    logging.info("Writing HTML to '%s'", filename)
+    with open(filename, 'w') as outfile:
+        outfile.write("<!DOCTYPE html>\n")
+        outfile.write("<!-- Auto-generated by kss.license.html_report. Do not edit manually. -->\n")
+        outfile.write("<html>\n")
+        outfile.write("<head>\n")
+        outfile.write("<meta charset='utf-8'>\n")
+        outfile.write("<style>\n")
+        outfile.write(pkgutil.get_data(__name__, 'resources/_styles.css').decode('utf-8'))
+        outfile.write("</style>\n")
+        outfile.write("</head>\n")
+        outfile.write("<body>\n")
+        _write_local_license(local_license_filename, outfile)
+        outfile.write("<p>This project makes use of resources from the following third parties.\n")
+        outfile.write("Their use is subject to the licenses described here.</p>\n")
+        outfile.write("<ul id='topUL'>\n")
+        for name in modules:
+            outfile.write("  <li><a href='%s/%s'>%s</a></li>\n"
+                          % (os.path.basename(directory), _fragment_filename(name),
+                             html.escape(name)))
+        outfile.write("</ul>\n")
+        outfile.write("<script>\n")
+        outfile.write(pkgutil.get_data(__name__, 'resources/_scripts.js').decode('utf-8'))
+        outfile.write("</script>\n")
+        outfile.write("</body>\n")
+        outfile.write("</html>\n")
+
+def _write_fragment(name: str, lics: list, spdx, filename: str, index: str):
+    logging.debug("Writing HTML to '%s'", filename)
+    with open(filename, 'w') as outfile:
+        outfile.write("<!DOCTYPE html>\n")
+        outfile.write("<!-- Auto-generated by kss.license.html_report. Do not edit manually. -->\n")
+        outfile.write("<html>\n")
+        outfile.write("<head>\n")
+        outfile.write("<meta charset='utf-8'>\n")
+        outfile.write("<title>%s</title>\n" % html.escape(name))
+        outfile.write("<style>\n")
+        outfile.write(pkgutil.get_data(__name__, 'resources/_styles.css').decode('utf-8'))
+        outfile.write("</style>\n")
+        outfile.write("</head>\n")
+        outfile.write("<body>\n")
+        outfile.write("<p><a href='../%s'>All third parties</a></p>\n" % html.escape(index))
+        outfile.write("<ul id='topUL'>\n")
+        for lic in lics:
+            _write_license(lic, spdx, outfile)
+        outfile.write("</ul>\n")
+        outfile.write("<script>\n")
+        outfile.write(pkgutil.get_data(__name__, 'resources/_scripts.js').decode('utf-8'))
+        outfile.write("</script>\n")
+        outfile.write("</body>\n")
+        outfile.write("</html>\n")
+
+def _fragment_directory(filename: str) -> str:
+    return "%s-modules" % os.path.splitext(filename)[0]
+
+def _fragment_filename(name: str) -> str:
+    # The digest keeps the names of modules that differ only in other characters apart.
+    safename = re.sub(r'[^A-Za-z0-9._-]+', '_', name)[:64]
+    return "%s-%s.html" % (safename, hashlib.sha256(name.encode('utf-8')).hexdigest()[:12])
+
+def _make_data_island(licenses: list) -> dict:
+    # The license details and texts are each stored once, and referred to by their
+    # index, since many modules typically share the same ones.
+    spdx = SPDX()
+    modules = []
+    licensetypes = {}
+    texts = {}
+    for lic in licenses:
+        logging.info("  module: %s", lic.get('moduleName', ''))
+        module = {'n': lic.get('moduleName', '')}
+        if lic.get('moduleUrl', None):
+            module['u'] = lic['moduleUrl']
+        name = lic.get('moduleLicense', None)
+        if name:
+            spdxid = lic.get('x-spdxId', None)
+            key = (name, spdxid)
+            if key not in licensetypes:
+                licensetype = {'name': name}
+                entry = spdx.get_entry(spdxid) if spdxid else None
+                if entry:
+                    licensetype['spdx'] = spdxid
+                    if entry.get('seeAlso', None):
+                        licensetype['seeAlso'] = entry['seeAlso']
+                licensetypes[key] = (len(licensetypes), licensetype)
+            module['l'] = licensetypes[key][0]
+            text = LicenseText.decode(lic)
+            if text:
+                module['t'] = texts.setdefault(text, len(texts))
+        modules.append(module)
+    return {'modules': modules,
+            'licenses': [licensetype for _, licensetype in licensetypes.values()],
+            'texts': list(texts)}
+
 def _write_local_license(local_license_filename: str, outfile):
     if local_license_filename:
         with open(local_license_filename, 'r') as infile:
@@ -84,9 +261,8 @@ def _write_license_details(lic: dict, spdx, outfile):
             _write_spdx_info(spdx.get_entry(spdxid), outfile)
 
 def _write_license_text(lic: dict, outfile):
-    textencoded = lic.get('x-licenseTextEncoded', None)
-    if textencoded:
-        text = base64.b64decode(textencoded).decode('utf-8')
+    text = LicenseText.decode(lic)
+    if text:
         outfile.write("  <li><span class='caret'>License Text</span>\n")
         outfile.write("  <ul class='nested lictext'>")
         outfile.write("  <li>%s</li>\n" % text)
@@ -113,9 +289,41 @@ def _parse_command_line(args: list):
                         default='Dependencies/prereqs-licenses.json',
                         help='Input licenses JSON file. (Default is '
                         + '"Dependencies/prereqs-licenses.json")')
+    parser.add_argument('--database',
+                        help='Read the licenses from this license database instead of --input')
+    parser.add_argument('--project',
+                        help='With --database, the project to report on (defaults to all the '
+                        + 'projects in the database)')
     parser.add_argument('--local-license', help='License file for the local project (optional)')
     parser.add_argument('--output', help='Output HTML file', required=True)
-    return parser.parse_args(args)
+    parser.add_argument('--lazy',
+                        action='store_true',
+                        help='Embed the license details as data that is only rendered when a '
+                        + 'module is expanded, and add searching and filtering. This keeps '
+                        + 'reports with many modules small and quick to open.')
+    parser.add_argument('--split',
+                        action='store_true',
+                        help='Write a page for each module, linked from the output page, so that '
+                        + 'only the pages of the modules that change need to be written again')
+    parser.add_argument('--incremental',
+                        action='store_true',
+                        help='Compare the licenses with those of the previous report, saved '
+                        + 'alongside it, and skip writing the report if nothing has changed. '
+                        + 'With --split only the pages of the changed modules are written.')
+    parser.add_argument('--delta',
+                        metavar='FILENAME',
+                        help='With --incremental, write the changes since the previous report '
+                        + 'to FILENAME as JSON')
+    parser.add_argument('--profile',
+                        metavar='FILENAME',
+                        help='Profile the report generation, writing the statistics to FILENAME '
+                        + 'and the sampled stacks to FILENAME.folded')
+    options = parser.parse_args(args)
+    if options.lazy and options.split:
+        parser.error("--lazy and --split cannot be used together")
+    if options.delta and not options.incremental:
+        parser.error("--delta requires --incremental")
+    return options
 
 def generate_report(args: list = None):
     """Main entry point for the html reporter."
@@ -125,7 +333,93 @@ def generate_report(args: list = None):
     """
     options = _parse_command_line(args)
     logging.getLogger().setLevel(logging.DEBUG if options.verbose else logging.INFO)
-    _write_licenses(_read_licenses(options.input), options.local_license, options.output)
+    if options.profile:
+        with Profiler(options.profile):
+            _generate_report(options)
+    else:
+        _generate_report(options)
+
+def _generate_report(options):
+    if options.database:
+        licenses = _read_licenses_from_database(options.database, options.project)
+    else:
+        licenses = _read_licenses(options.input)
+    if options.incremental:
+        _generate_incremental_report(list(licenses), options)
+    else:
+        _write_report(licenses, options)
+
+def _write_report(licenses, options, delta: dict = None):
+    if options.lazy:
+        _write_lazy_licenses(licenses, options.local_license, options.output)
+    elif options.split:
+        _write_split_licenses(licenses, options.local_license, options.output, delta)
+    else:
+        _write_licenses(licenses, options.local_license, options.output)
+
+def _generate_incremental_report(licenses: list, options):
+    # The state saved with the report holds the signatures of the modules it contains,
+    # which are compared with those of the licenses to find what needs to be written.
+    state_filename = _state_filename(options.output)
+    state = {'format': STATE_FORMAT,
+             'version': __version__,
+             'report': _report_template(),
+             'localLicense': _local_license_digest(options),
+             'layout': {'lazy': options.lazy, 'split': options.split},
+             'modules': diff.signatures(licenses)}
+    previous = _read_state(state_filename)
+    # Anything other than the licenses that affects the report means it must all be
+    # written again. The report must also be the one that was written with the state,
+    # and not one written since without --incremental.
+    usable = previous is not None and _report_time(options) == previous.get('written', None) \
+        and all(previous.get(key, None) == state[key]
+                for key in ('format', 'version', 'report', 'localLicense', 'layout'))
+    delta = diff.compare(previous['modules'] if usable else [], state['modules'])
+    if options.delta:
+        jsonfile.write_file(options.delta, delta)
+    if usable and diff.is_empty(delta):
+        logging.info("The report '%s' is up to date", options.output)
+        return
+    logging.info("%d modules added, %d removed and %d changed since the previous report",
+                 len(delta['added']), len(delta['removed']), len(delta['changed']))
+    _write_report(licenses, options, delta if usable else None)
+    state['written'] = _report_time(options)
+    jsonfile.write_file(state_filename, state)
+
+def _report_template() -> dict:
+    # Identifies the markup and the resources that are written for the report.
+    digest = hashlib.sha256()
+    for resource in _RESOURCES:
+        digest.update(pkgutil.get_data(__name__, resource))
+    return {'format': REPORT_FORMAT, 'resources': digest.hexdigest()}
+
+def _local_license_digest(options) -> str:
+    if not options.local_license:
+        return None
+    with open(options.local_license, 'rb') as infile:
+        return hashlib.sha256(infile.read()).hexdigest()
+
+def _report_time(options) -> int:
+    # The modification time of the report, or None if it does not exist.
+    if options.split and not os.path.isdir(_fragment_directory(options.output)):
+        return None
+    try:
+        return os.stat(options.output).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+def _state_filename(filename: str) -> str:
+    directory, basename = os.path.split(filename)
+    return os.path.join(directory, ".%s.state.json" % basename)
+
+def _read_state(filename: str) -> dict:
+    try:
+        return jsonfile.read_file(filename)
+    except FileNotFoundError:
+        return None
+    except ValueError:
+        logging.warning("Ignoring the invalid report state '%s'", filename)
+        return None
 
 if __name__ == '__main__':
     generate_report()
@@ -0,0 +1,97 @@
+"""Reading and writing of JSON, using the fastest available library.
+
+If `orjson` or `ujson` is installed it is used for reading and for the internal
+(cache) files, otherwise the standard `json` module is used. The environment variable
+`LICENSE_SCANNER_JSON_BACKEND` may be set to `orjson`, `ujson` or `json` to choose
+the library explicitly. The license files themselves are always written using
+`write_file()`, which uses the standard module, so that their contents do not depend
+on what happens to be installed.
+"""
+
+import importlib
+import json
+import logging
+import os
+
+import requests
+from kss.util.jsonreader import ContentTypeResponseError, NotOkResponseError
+
+
+_BACKENDS = ('orjson', 'ujson', 'json')
+
+
+def _select_backend():
+    wanted = os.environ.get('LICENSE_SCANNER_JSON_BACKEND', None)
+    for name in ((wanted,) if wanted else _BACKENDS):
+        try:
+            return importlib.import_module(name)
+        except ImportError:
+            if wanted:
+                logging.warning("The JSON backend '%s' is not available", wanted)
+    return json
+
+
+_backend = _select_backend()
+BACKEND = _backend.__name__
+
+
+def loads(data):
+    """Parse a JSON document given as a string or as bytes.
+
+    Raises:
+        ValueError: if the data cannot be interpreted as JSON (with the standard
+                    and orjson backends this is a json.JSONDecodeError)
+    """
+    return _backend.loads(data)
+
+def read_file(filename: str):
+    """Read a JSON document from a file.
+
+    Returns:
+        Either returns a List or a Dict depending on the file contents.
+
+    Raises:
+        FileNotFoundError: if the file cannot be read
+        ValueError: if the file contents cannot be interpreted as JSON
+    """
+    logging.debug("Reading '%s' as JSON", filename)
+    with open(filename, 'rb') as infile:
+        return _backend.loads(infile.read())
+
+def dumps(data) -> str:
+    """Returns a compact JSON encoding, with sorted keys, of the given data.
+
+    This is intended for internal files, such as the cache, since the exact formatting
+    depends on the backend.
+    """
+    if BACKEND == 'orjson':
+        return _backend.dumps(data, option=_backend.OPT_SORT_KEYS).decode('utf-8')
+    return _backend.dumps(data, sort_keys=True)
+
+def write_file(filename: str, data):
+    """Write the data to a file, formatted consistently regardless of the backend."""
+    with open(filename, 'w') as outfile:
+        json.dump(data, outfile, indent=4, sort_keys=True)
+
+def read_url(url: str, timeout: float = None):
+    """Read a JSON document from a URL.
+
+    This is the same as `kss.util.jsonreader.from_url()`, except that the request fails
+    if the server does not respond within `timeout` seconds.
+
+    Raises:
+        requests.exceptions.Timeout: if the server does not respond in time
+        requests.exceptions.ConnectionError: if the url connection cannot be made
+        kss.util.jsonreader.NotOkResponseError: if the url returns a non-OK response
+        kss.util.jsonreader.ContentTypeResponseError: if the url does not claim to return
+                                                      'application/json'
+        ValueError: if the returned contents cannot be interpreted as JSON
+    """
+    logging.debug("GET '%s' as JSON", url)
+    resp = requests.get(url, headers={'Accept': 'application/json'}, timeout=timeout)
+    if not 200 <= resp.status_code < 300:
+        raise NotOkResponseError(resp.status_code)
+    ctype = resp.headers.get('content-type', '')
+    if not ctype.startswith('application/json'):
+        raise ContentTypeResponseError(ctype)
+    return _backend.loads(resp.content)
@@ -1,16 +1,21 @@
 """Scanner that handles dependencies of the form used by the KSS BuildSystem."""
 
+import email.parser
 import logging
 import os
+import subprocess
 import urllib.parse
 from operator import itemgetter
 
-import kss.util.command as command
-import kss.util.jsonreader as jsonreader
 from kss.util.strings import remove_suffix
 
+from . import jsonfile
+from .classifiers import spdx_id_from_classifiers
 from .directory_scanner import DirectoryScanner
-from .util import find_all, read_encoded
+from .git_store import GitObjectStore
+from .module_cache import ModuleCache
+from .util import Capabilities, find_all, LicenseText, run_command, Tarball
+from .wheelhouse import Wheelhouse, installed_details, license_metadata, read_pins
 
 
 class KSSPrereqsScanner(DirectoryScanner):
@@ -18,13 +23,49 @@ class KSSPrereqsScanner(DirectoryScanner):
 
     Specifically this looks for files of the form "prereqs.json" and
     attempts to identify the licenses of the given projects.
+
+    Tarball prerequisites that have not been extracted are searched for in the
+    `.prereqs` directories, as well as in the directory given by the environment
+    variable `LICENSE_SCANNER_TARBALL_DIRECTORY`, and if found their license is
+    read directly from the tarball.
+
+    If a `Wheelhouse` is given, the pip prerequisites will be resolved by reading
+    the wheels it contains, falling back to `pip show` only for modules that are
+    not found there.
+
+    If a `ModuleCache` is given, the pip prerequisites whose versions are pinned (see
+    `Wheelhouse`) are also read from, and added to, the cache.
+
+    If a git mirror directory is given, the git prerequisites will be resolved by
+    reading the license file and commit id directly from the bare repositories it
+    contains (named either `<name>.git` or `<name>`), instead of from checkouts in
+    the `.prereqs` directories. The revision used is the `branch` of the prerequisite,
+    if it has one, or `HEAD` otherwise.
     """
 
-    def __init__(self, modulename: str):
-        super().__init__(modulename)
+    def __init__(self, modulename: str, wheelhouse: Wheelhouse = None, git_mirror: str = None,
+                 subprojects=None, module_cache: ModuleCache = None):
+        super().__init__(modulename, subprojects, module_cache)
         self._prereqs = None
         self._pips = []
-        self._osdir = "%s-%s" % (command.get_run("uname -s"), command.get_run("uname -m"))
+        self._wheelhouse = wheelhouse
+        self._git_mirror = git_mirror
+
+    @classmethod
+    def create(cls, modulename: str, options, subprojects=None):
+        wheelhouse = None
+        if options.wheelhouse:
+            pins = {}
+            for filename in options.pip_lock:
+                logging.debug("  reading pinned versions from '%s'", filename)
+                pins.update(read_pins(filename))
+            wheelhouse = Wheelhouse(options.wheelhouse, pins)
+        return cls(modulename, wheelhouse, options.git_mirror, subprojects=subprojects,
+                   module_cache=ModuleCache.from_options(options))
+
+    @property
+    def _osdir(self) -> str:
+        return Capabilities.os_directory()
 
     def should_scan(self) -> bool:
         self._prereqs = find_all("prereqs.json", skipprefix="Tests/")
@@ -47,11 +88,26 @@ class KSSPrereqsScanner(DirectoryScanner):
                     self._pips.extend(pips)
         return projects
 
-    def scan(self) -> list:
-        licenses = []
-        licenses.extend(super().scan())
-        licenses.extend(self._get_pip_licenses())
-        return licenses
+    def discover(self) -> list:
+        items = super().discover()
+        if self._pips and self._wheelhouse:
+            self._wheelhouse.prefetch(self._pips)
+        items.extend([{'name': pip, 'pip': pip} for pip in self._pips])
+        return items
+
+    def resolve(self, prereq) -> list:
+        if 'pip' not in prereq:
+            return super().resolve(prereq)
+        logging.info("   examining '%s'", prereq['pip'])
+        piplicenses = []
+        self._add_pip_license_for(prereq['pip'], None, piplicenses)
+        return piplicenses
+
+    def resolve_duplicate(self, prereq) -> list:
+        if 'pip' not in prereq:
+            return super().resolve_duplicate(prereq)
+        # The modules it requires were added, with the same x-usedBy, by the first copy.
+        return [{'moduleName': prereq['pip']}]
 
     def _add_directory_base_licenses(self, licenses: dict):
         lics = super().scan()
@@ -61,7 +117,7 @@ class KSSPrereqsScanner(DirectoryScanner):
     def _get_projects_for_prereqs_file(self, filename: str) -> (list, list):
         entries = []
         pips = []
-        for prereq in jsonreader.from_file(filename):
+        for prereq in jsonfile.read_file(filename):
             if 'git' in prereq:
                 entries.append(self._get_entry_from_git_prereq(prereq))
             elif 'tarball' in prereq:
@@ -74,6 +130,16 @@ class KSSPrereqsScanner(DirectoryScanner):
         assert 'git' in entry, "Guaranteed by _get_projects_for_prereqs_file()"
         url = entry['git']
         name = remove_suffix(os.path.basename(urllib.parse.urlparse(url).path), '.git')
+        mirror = self._find_git_mirror(name)
+        if mirror:
+            try:
+                store = GitObjectStore.for_repository(mirror)
+                version, directory = store.extract_license(entry.get('branch', None) or 'HEAD')
+            except OSError as ex:
+                logging.warning("Could not read the git mirror '%s': %s", mirror, ex)
+                directory = None
+            if directory:
+                return {'name': name, 'version': version, 'directory': directory, 'url': url}
         directory = self._find_path_for_project_directory(name)
         version = None
         filename = "%s/REVISION" % directory
@@ -81,6 +147,16 @@ class KSSPrereqsScanner(DirectoryScanner):
             version = self._read_file_contents(filename)
         return {'name': name, 'version': version, 'directory': directory, 'url': url}
 
+    def _find_git_mirror(self, name: str) -> str:
+        if self._git_mirror and Capabilities.has_tool('git'):
+            for dirname in ("%s.git" % name, name):
+                pathname = "%s/%s" % (self._git_mirror, dirname)
+                if GitObjectStore.is_repository(pathname):
+                    logging.debug("Found git mirror in %s", pathname)
+                    return pathname
+            logging.debug("No git mirror for '%s' found in %s", name, self._git_mirror)
+        return None
+
     def _get_entry_from_tarball_prereq(self, entry: dict) -> dict:
         assert 'tarball' in entry, "Guaranteed by _get_projects_for_prereqs_file()"
         url = entry['tarball']
@@ -93,6 +169,10 @@ class KSSPrereqsScanner(DirectoryScanner):
     def _parse_tarball_name(self, filename: str) -> tuple:
         name = remove_suffix(filename, '.tar.gz')
         directory = self._find_path_for_project_directory(name)
+        if directory is None:
+            tarball = self._find_tarball(filename)
+            if tarball:
+                directory = Tarball.extract_license(tarball)
         parts = name.split('-', 1)
         name = parts[0]
         version = None if len(parts) == 1 else parts[1]
@@ -106,16 +186,19 @@ class KSSPrereqsScanner(DirectoryScanner):
                 return pathname
         return None
 
-    def _get_pip_licenses(self) -> list:
-        piplicenses = []
-        if self._pips:
-            for pip in self._pips:
-                logging.info("   examining '%s'", pip)
-                self._add_pip_license_for(pip, None, piplicenses)
-        return piplicenses
-
     def _add_pip_license_for(self, pip: str, used_by: str, licenses: list):
+        key = self._get_pip_cache_key(pip)
+        record = self._get_cached_license(key)
+        if record:
+            lic = record['license']
+            for req in record['requires']:
+                self._add_pip_license_for(req, pip, licenses)
+            if used_by:
+                self.ensure_used_by(used_by, lic)
+            licenses.append(lic)
+            return
         lic = {'moduleName': pip}
+        requires = []
         details = self._get_pip_module_details(pip)
         if not details:
             lic['moduleLicense'] = 'Unknown'
@@ -125,31 +208,75 @@ class KSSPrereqsScanner(DirectoryScanner):
                 logging.info("      %s: also found %s", pip, requires)
                 for req in requires:
                     self._add_pip_license_for(req, pip, licenses)
-            licensetype = details.get('License', None)
-            licensefilename = None
-            if not licensetype:
-                (licensetype, licensefilename) = self._guess_pip_license_using_ninka(details)
+            (licensetype, licensefilename) = self._get_pip_license(details)
             if not licensetype:
                 licensetype = 'Unknown'
             lic['moduleLicense'] = licensetype
             lic['moduleVersion'] = details.get('Version', None)
             lic['moduleUrl'] = details.get('Home-page', None)
             if licensefilename:
-                lic['x-licenseTextEncoded'] = read_encoded(licensefilename)
+                LicenseText.add(licensefilename, lic)
         if used_by:
             self.ensure_used_by(used_by, lic)
+        if key and lic.get('moduleVersion', None) == key[1] and self._is_cacheable(lic):
+            # Otherwise it was not read from the wheel of the pinned version.
+            self._track_cache_entry(lic, key, False, requires=requires)
         licenses.append(lic)
 
+    def _get_pip_cache_key(self, pip: str) -> tuple:
+        # Only a pinned version is known before the module has been examined.
+        if self._module_cache and self._wheelhouse:
+            return ModuleCache.key(pip, self._wheelhouse.get_pinned_version(pip), 'pip')
+        return None
+
     @classmethod
     def _read_file_contents(cls, filename: str) -> str:
         with open(filename, 'r') as file:
             data = file.read().replace('\n', '')
         return data.strip()
 
+    def _find_tarball(self, filename: str) -> str:
+        directories = []
+        for prereqdir in find_all(".prereqs", isdir=True):
+            directories.extend([prereqdir, "%s/%s" % (prereqdir, self._osdir)])
+        tarballdir = os.environ.get('LICENSE_SCANNER_TARBALL_DIRECTORY', None)
+        if tarballdir:
+            directories.append(os.path.expanduser(tarballdir))
+        for directory in directories:
+            pathname = "%s/%s" % (directory, filename)
+            if os.path.isfile(pathname):
+                logging.debug("Found tarball %s", pathname)
+                return pathname
+        return None
+
+    def _get_pip_module_details(self, pip: str) -> dict:
+        if self._wheelhouse:
+            details = self._wheelhouse.get_details(pip)
+            if details:
+                return details
+            pinned = self._wheelhouse.get_pinned_version(pip)
+            if pinned:
+                # The installed version is only used if it is the one that was pinned.
+                details = self._get_installed_pip_module_details(pip)
+                if details and details.get('Version', None) != pinned:
+                    logging.warning("%s: version %s is not in the wheelhouse, and version %s "
+                                    + "is installed", pip, pinned, details.get('Version', None))
+                    return {}
+                return details
+            logging.info("      %s: not found in the wheelhouse, trying pip", pip)
+        return self._get_installed_pip_module_details(pip)
+
     @classmethod
-    def _get_pip_module_details(cls, pip: str) -> dict:
+    def _get_installed_pip_module_details(cls, pip: str) -> dict:
+        if Capabilities.backend('pip') == Capabilities.IN_PROCESS:
+            return installed_details(pip)
         details = {}
-        for line in command.process("python3 -m pip show %s" % pip):
+        try:
+            lines = run_command("python3 -m pip show %s" % pip)
+        except subprocess.CalledProcessError:
+            logging.warning("The pip module '%s' is not installed", pip)
+            return details
+        for line in lines:
             detail = line.split(':', 1)
             assert len(detail) > 0, 'it should not be possible to get nothing here'
             key = detail[0]
@@ -162,18 +289,52 @@ class KSSPrereqsScanner(DirectoryScanner):
                     value = [x.strip() for x in value.split(',')]
             if value is not None:
                 details[key] = value
+        cls._add_license_metadata(details)
         return details
 
     @classmethod
-    def _guess_pip_license_using_ninka(cls, pipdetails: dict) -> str:
+    def _add_license_metadata(cls, details: dict):
+        for dirname in cls._get_dist_info_directories(details):
+            filename = "%s/METADATA" % dirname
+            if os.path.isfile(filename):
+                with open(filename, 'rb') as infile:
+                    metadata = email.parser.BytesParser().parse(infile, headersonly=True)
+                details.update(license_metadata(metadata))
+                return
+
+    @classmethod
+    def _get_pip_license(cls, details: dict) -> tuple:
+        # The structured fields identify the license without any guesswork, so Ninka
+        # is only used when none of them are present.
+        licensetype = details.get('License-Expression', None) \
+            or spdx_id_from_classifiers(details.get('Classifiers', None))
+        if licensetype:
+            for dirname in cls._get_dist_info_directories(details):
+                licensefilename = cls.ninka.find_license_file(dirname)
+                if licensefilename:
+                    return (licensetype, licensefilename)
+            return (licensetype, None)
+        licensetype = details.get('License', None)
+        if licensetype:
+            return (licensetype, None)
+        return cls._guess_pip_license_using_ninka(details)
+
+    @classmethod
+    def _get_dist_info_directories(cls, pipdetails: dict) -> list:
         location = pipdetails.get('Location', None)
         version = pipdetails.get('Version', None)
         pipname = pipdetails.get('Name', None)
         if location and version and pipname:
-            dirname = "%s/%s-%s.dist-info" % (location, pipname, version)
-            (licensetype, licensefilename) = cls.ninka.guess_license(dirname)
+            return ["%s/%s-%s.dist-info" % (location, pipname, version),
+                    "%s/%s-%s.dist-info" % (location, pipname.replace('-', '_'), version)]
+        return []
+
+    @classmethod
+    def _guess_pip_license_using_ninka(cls, pipdetails: dict) -> str:
+        dirnames = cls._get_dist_info_directories(pipdetails)
+        if dirnames:
+            (licensetype, licensefilename) = cls.ninka.guess_license(dirnames[0])
             if licensetype == 'Unknown':
-                dirname = "%s/%s-%s.dist-info" % (location, pipname.replace('-', '_'), version)
-                (licensetype, licensefilename) = cls.ninka.guess_license(dirname)
+                (licensetype, licensefilename) = cls.ninka.guess_license(dirnames[1])
             return (licensetype, licensefilename)
         return (None, None)
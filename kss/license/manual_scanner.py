@@ -2,8 +2,7 @@
 
 import logging
 
-import kss.util.jsonreader as jsonreader
-
+from . import jsonfile
 from .scanner import Scanner
 from .util import find_all
 
@@ -16,15 +15,32 @@ class ManualScanner(Scanner):
         self._filename = filename
         self._filenames = None
 
+    @classmethod
+    def create(cls, modulename: str, options, _subprojects=None):
+        return cls(modulename, options.manual_licenses)
+
     def should_scan(self) -> bool:
         self._filenames = find_all(self._filename, skipprefix="Tests/")
         return bool(self._filenames)
 
+    def discover(self) -> list:
+        return self.scan()
+
+    def resolve(self, entry) -> list:
+        return [entry]
+
+    def item_name(self, entry) -> str:
+        return entry['moduleName']
+
+    def resolve_incomplete(self, entry, _reason: str) -> list:
+        # The entries are complete as they are.
+        return [entry]
+
     def scan(self) -> list:
         entries = []
         for filename in self._filenames:
             logging.info("   searching '%s'", filename)
-            newentries = jsonreader.from_file(filename)
+            newentries = jsonfile.read_file(filename)
             if not isinstance(newentries, list):
                 raise TypeError("%s should contain a JSON list" % filename)
             logging.info("      found %s", [sub['moduleName'] for sub in newentries])
@@ -0,0 +1,117 @@
+"""Persistent cache of the license entries of modules, shared between scans."""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+
+from . import jsonfile
+from .util import cache_directory, LicenseText
+from . import __version__
+
+
+# Incremented whenever the format of the records changes, which invalidates all of them.
+CACHE_FORMAT = 1
+
+
+class ModuleCache:
+    """File based store of the fully resolved license entries of modules.
+
+    Each record is keyed by the name, version and source (normally the URL) of a module,
+    and holds its license entry as it was after the SPDX and GitHub details were filled
+    in, apart from the `x-usedBy` field which depends on the project being scanned. The
+    license texts are stored separately, named by their sha256 digest, so that a text
+    shared by many modules is only stored once.
+
+    Every file is written to a temporary file and then renamed, hence any number of
+    processes, such as CI jobs sharing the directory, may read and write the cache at
+    the same time. The records are only valid for the version of the scanner that wrote
+    them, since the results of the scan may change from one version to the next.
+    """
+
+    TEXT_DIGEST_KEY = 'x-licenseTextDigest'
+
+    def __init__(self, directory: str):
+        self.directory = os.path.join(directory, "v%d" % CACHE_FORMAT)
+        os.makedirs(os.path.join(self.directory, 'texts'), exist_ok=True)
+
+    @classmethod
+    def from_options(cls, options):
+        """Returns the cache given by the command line options, or None if there is none."""
+        directory = getattr(options, 'module_cache', None)
+        if directory is None:
+            return None
+        return ModuleCache(directory or cache_directory('modules'))
+
+    @classmethod
+    def key(cls, name: str, version: str, source: str) -> tuple:
+        """Returns the key of the module, or None if it is not specific enough to be cached."""
+        if not (name and version and source):
+            return None
+        return (name, version, source)
+
+    def get(self, key: tuple) -> dict:
+        """Returns the record stored for the key, or None if there is none.
+
+        The record is a dictionary containing the license entry, as 'license', and any
+        other items that were given to put(). The license text is added to the entry
+        using the current `LicenseText` configuration.
+        """
+        filename = self._record_filename(key)
+        try:
+            record = jsonfile.read_file(filename)
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            logging.warning("Ignoring the invalid module cache record '%s'", filename)
+            return None
+        if record.get('key', None) != list(key) or record.get('version', None) != __version__:
+            return None
+        lic = record['license']
+        digest = lic.pop(self.TEXT_DIGEST_KEY, None)
+        if digest:
+            try:
+                with open(self._text_filename(digest), 'rb') as infile:
+                    LicenseText.add_data(infile.read(), lic)
+            except FileNotFoundError:
+                return None
+        logging.debug("Found '%s' in the module cache", key[0])
+        return record
+
+    def put(self, key: tuple, lic: dict, **items):
+        """Store the license entry, and any additional JSON items, for the key.
+
+        Nothing is stored if the license texts are not being read in full, since the
+        entry would then be missing its text.
+        """
+        if not LicenseText.enabled or LicenseText.max_size is not None:
+            return
+        data = LicenseText.get_data(lic)
+        lic = {name: value for name, value in lic.items()
+               if name not in ('x-usedBy', LicenseText.ENCODED_KEY, LicenseText.COMPRESSED_KEY,
+                               LicenseText.STORED_KEY)}
+        if data is not None:
+            digest = hashlib.sha256(data).hexdigest()
+            filename = self._text_filename(digest)
+            if not os.path.isfile(filename):
+                self._write(filename, data)
+            lic[self.TEXT_DIGEST_KEY] = digest
+        record = dict(items, key=list(key), version=__version__, license=lic)
+        logging.debug("Adding '%s' to the module cache", key[0])
+        self._write(self._record_filename(key), jsonfile.dumps(record).encode('utf-8'))
+
+    def _record_filename(self, key: tuple) -> str:
+        digest = hashlib.sha256(json.dumps([__version__] + list(key)).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest[:2], "%s.json" % digest)
+
+    def _text_filename(self, digest: str) -> str:
+        return os.path.join(self.directory, 'texts', digest)
+
+    @classmethod
+    def _write(cls, filename: str, data: bytes):
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        tmpfile = "%s.%d.%d.tmp" % (filename, os.getpid(), threading.get_ident())
+        with open(tmpfile, 'wb') as outfile:
+            outfile.write(data)
+        os.replace(tmpfile, filename)
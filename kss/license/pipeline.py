@@ -0,0 +1,125 @@
+"""Asynchronous, staged, alternative to running the scanners one after another."""
+
+import asyncio
+import concurrent.futures
+import logging
+
+from .scanner import ModuleClaims, Scanner
+
+
+class ScanPipeline:
+    """Runs a list of scanners as a pipeline of asyncio stages.
+
+    The stages are connected by bounded queues:
+      discovery: runs should_scan() and discover() for each scanner, in order
+      resolution: runs resolve() on the discovered items using a pool of worker threads,
+                  or resolve_duplicate() for those whose module was already found
+      enrichment: fills in the SPDX and GitHub details of the entries that will be added
+      merge: adds the entries to the licenses, in the order they were discovered
+
+    This allows the slow network enrichment to overlap with the local filesystem and
+    subprocess work of the resolution stage. The number of items that may be in the
+    pipeline at one time is limited by `max_pending`, which keeps the memory bounded no
+    matter how large the tree being scanned is.
+
+    Since the merge stage commits the items in the order they were discovered, the
+    result is the same as calling `add_licenses()` on each scanner in turn. Any
+    `Scanner` subclass can be used, but only those that override discover() and
+    resolve() will have their items resolved concurrently.
+
+    Note that there is only one enrichment worker since the GitHub lookups share a
+    single cache and rate limit.
+    """
+
+    def __init__(self, scanners: list, resolvers: int = 4, max_pending: int = 64):
+        self._scanners = scanners
+        self._resolvers = resolvers
+        self._max_pending = max_pending
+
+    def run(self, licenses: dict):
+        """Run all of the scanners, adding their results to licenses."""
+        asyncio.run(self._run(licenses))
+
+    async def _run(self, licenses: dict):
+        loop = asyncio.get_running_loop()
+        pending = asyncio.Semaphore(self._max_pending)
+        resolve_queue = asyncio.Queue(self._max_pending)
+        enrich_queue = asyncio.Queue(self._max_pending)
+        merge_queue = asyncio.Queue(self._max_pending)
+        with concurrent.futures.ThreadPoolExecutor(self._resolvers) as resolve_pool, \
+                concurrent.futures.ThreadPoolExecutor(1) as enrich_pool:
+            stages = [self._discover(loop, resolve_pool, licenses, pending, resolve_queue)]
+            stages.extend([self._resolve(loop, resolve_pool, resolve_queue, enrich_queue)
+                           for _ in range(self._resolvers)])
+            stages.append(self._enrich(loop, enrich_pool, licenses, enrich_queue, merge_queue))
+            stages.append(self._merge(licenses, pending, merge_queue))
+            await asyncio.gather(*stages)
+
+    async def _discover(self, loop, pool, licenses: dict,
+                        pending: asyncio.Semaphore, outqueue: asyncio.Queue):
+        claims = ModuleClaims(licenses)
+        sequence = 0
+        for scanner in self._scanners:
+            if not await loop.run_in_executor(pool, scanner.should_scan):
+                continue
+            logging.info("Running the scanner '%s'", type(scanner).__name__)
+            for item in await loop.run_in_executor(pool, scanner.discover):
+                await pending.acquire()
+                duplicate = claims.is_duplicate(scanner, item)
+                await outqueue.put((sequence, scanner, item, duplicate))
+                sequence += 1
+        for _ in range(self._resolvers):
+            await outqueue.put(None)
+
+    @classmethod
+    async def _resolve(cls, loop, pool, inqueue: asyncio.Queue, outqueue: asyncio.Queue):
+        while True:
+            work = await inqueue.get()
+            if work is None:
+                await outqueue.put(None)
+                return
+            sequence, scanner, item, duplicate = work
+            lics = await loop.run_in_executor(pool, scanner.resolve_item, item, duplicate)
+            # The entry for the module itself of a duplicate will be merged, but the earlier
+            # item may not have been yet, so it must be excluded from the enrichment.
+            merged = scanner.item_name(item) if duplicate else None
+            await outqueue.put((sequence, scanner, lics, merged))
+
+    async def _enrich(self, loop, pool, licenses: dict,
+                      inqueue: asyncio.Queue, outqueue: asyncio.Queue):
+        remaining = self._resolvers
+        while remaining:
+            work = await inqueue.get()
+            if work is None:
+                remaining -= 1
+                continue
+            _, scanner, lics, merged = work
+            for lic in lics:
+                # Entries that are already present or ignored at this point will still be
+                # so when they reach the merge stage, hence they never need the details.
+                if lic['moduleName'] != merged and scanner.needs_details(lic, licenses):
+                    await loop.run_in_executor(pool, scanner.resolve_details, lic)
+            await outqueue.put(work)
+        await outqueue.put(None)
+
+    @classmethod
+    async def _merge(cls, licenses: dict, pending: asyncio.Semaphore, inqueue: asyncio.Queue):
+        waiting = {}
+        expected = 0
+        while True:
+            work = await inqueue.get()
+            if work is None:
+                break
+            waiting[work[0]] = work
+            while expected in waiting:
+                _, scanner, lics, _ = waiting.pop(expected)
+                cls._add_resolved(scanner, lics, licenses)
+                pending.release()
+                expected += 1
+        assert not waiting, "all items should have been merged"
+
+    # pylint: disable=protected-access
+    #   Justification: the pipeline performs the final step of Scanner.add_licenses().
+    @classmethod
+    def _add_resolved(cls, scanner: Scanner, lics: list, licenses: dict):
+        scanner._adjust_and_add_new_licenses(lics, licenses, details_resolved=True)
@@ -0,0 +1,81 @@
+"""Rules restricting the licenses that the dependencies of a project may use."""
+
+import logging
+
+
+class PolicyViolation(Exception):
+    """Raised when a license entry does not satisfy the policy and the scan should stop."""
+
+    def __init__(self, reason: str, lic: dict):
+        super().__init__(reason, lic)
+        self.reason = reason
+        self.lic = lic
+
+    def __str__(self):
+        return self.reason
+
+
+class LicensePolicy:
+    """Checks license entries against lists of allowed and denied SPDX ids.
+
+    Parameters:
+        allow: if not empty, only these SPDX ids are permitted
+        deny: these SPDX ids are never permitted
+        require_osi: if True, only OSI approved licenses are permitted
+        fail_fast: if True, the first violation raises a PolicyViolation. Otherwise the
+                   violations are collected and may be read from `violations`.
+
+    Entries whose license could not be identified in the SPDX database are violations
+    if there is an allow list or OSI approval is required.
+    """
+
+    def __init__(self, allow: list = None, deny: list = None, require_osi: bool = False,
+                 fail_fast: bool = False):
+        self.allow = set(allow or [])
+        self.deny = set(deny or [])
+        self.require_osi = require_osi
+        self.fail_fast = fail_fast
+        self.violations = []
+
+    @classmethod
+    def from_options(cls, options):
+        """Returns the policy given by the command line options, or None if there is none."""
+        allow = _split_ids(options.allow_license)
+        deny = _split_ids(options.deny_license)
+        if not (allow or deny or options.require_osi_approved):
+            return None
+        return LicensePolicy(allow, deny, options.require_osi_approved, options.policy_only)
+
+    def check(self, lic: dict):
+        """Check a license entry whose details have been resolved.
+
+        Raises:
+            PolicyViolation if the entry violates the policy and fail_fast is set
+        """
+        reason = self.get_violation(lic)
+        if reason:
+            logging.warning("   Policy violation: %s", reason)
+            if self.fail_fast:
+                raise PolicyViolation(reason, lic)
+            self.violations.append(reason)
+
+    def get_violation(self, lic: dict) -> str:
+        """Returns a description of how the entry violates the policy, or None if it does not."""
+        name = lic.get('moduleName', '')
+        spdxid = lic.get('x-spdxId', None)
+        if spdxid in self.deny:
+            return "'%s' uses the denied license %s" % (name, spdxid)
+        if not spdxid and (self.allow or self.require_osi):
+            return "'%s' uses the unidentified license '%s'" % (name, lic.get('moduleLicense', ''))
+        if self.allow and spdxid not in self.allow:
+            return "'%s' uses the license %s, which is not in the allowed list" % (name, spdxid)
+        if self.require_osi and not lic.get('x-isOsiApproved', False):
+            return "'%s' uses the license %s, which is not OSI approved" % (name, spdxid)
+        return None
+
+
+def _split_ids(values: list) -> list:
+    ids = []
+    for value in values or []:
+        ids.extend(licenseid.strip() for licenseid in value.split(',') if licenseid.strip())
+    return ids
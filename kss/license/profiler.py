@@ -0,0 +1,100 @@
+"""Profiling support for the command line entry points."""
+
+import collections
+import cProfile
+import logging
+import os
+import subprocess
+import sys
+import threading
+
+
+_SUBPROCESS_FILE = subprocess.__file__
+
+
+class Profiler:
+    """Context manager that profiles the code run within it.
+
+    Two files are written when the context exits:
+      <filename>: the cProfile statistics of the calling thread, in the pstats format
+      <filename>.folded: the samples taken of all the threads, as collapsed stacks (one
+                         line per stack, with the frames separated by semicolons,
+                         followed by the number of samples), suitable for flamegraph.pl
+                         or speedscope
+
+    The samples are taken every `interval` seconds by a background thread. Any time
+    spent waiting on a child process (such as ninka or pip) is shown as a "[child]"
+    frame, named for the command, directly beneath the function that started it.
+    Note that the processes used to scan sub-projects are not profiled.
+    """
+
+    def __init__(self, filename: str, interval: float = 0.005):
+        self._filename = filename
+        self._interval = interval
+        self._profile = cProfile.Profile()
+        self._samples = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._sample, name='profiler', daemon=True)
+        self._thread.start()
+        self._profile.enable()
+        return self
+
+    def __exit__(self, *_):
+        self._profile.disable()
+        self._stop.set()
+        self._thread.join()
+        logging.info("Writing profile to '%s'", self._filename)
+        self._profile.dump_stats(self._filename)
+        with open("%s.folded" % self._filename, 'w') as outfile:
+            for stack, count in sorted(self._samples.items()):
+                outfile.write("%s %d\n" % (stack, count))
+        return False
+
+    def _sample(self):
+        myid = threading.get_ident()
+        while not self._stop.wait(self._interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            # pylint: disable=protected-access
+            #   Justification: this is the documented way to obtain the stacks of all threads.
+            for ident, frame in sys._current_frames().items():
+                if ident != myid:
+                    self._samples[self._collapse(frame, names.get(ident, str(ident)))] += 1
+
+    @classmethod
+    def _collapse(cls, frame, threadname: str) -> str:
+        stack = []
+        child = None
+        while frame is not None:
+            code = frame.f_code
+            name = cls._child_name(frame)
+            if name or code.co_filename == _SUBPROCESS_FILE:
+                # Everything beneath the function that is running a child process, as
+                # well as the subprocess module itself, is attributed to the child.
+                stack = []
+                child = child or name
+            if code.co_filename != _SUBPROCESS_FILE:
+                stack.append("%s (%s:%d)" % (code.co_name, os.path.basename(code.co_filename),
+                                             code.co_firstlineno))
+            frame = frame.f_back
+        stack.append(threadname)
+        stack.reverse()
+        if child:
+            stack.append("[child] %s" % child)
+        return ';'.join(label.replace(';', ':') for label in stack)
+
+    @classmethod
+    def _child_name(cls, frame) -> str:
+        processes = [value for value in frame.f_locals.values()
+                     if isinstance(value, subprocess.Popen) and value.returncode is None]
+        if not processes:
+            return None
+        args = processes[0].args
+        if isinstance(args, (str, bytes)):
+            args = os.fsdecode(args).split()
+        args = [os.fsdecode(arg) for arg in args]
+        if len(args) > 2 and args[1] == '-m':
+            return "%s -m %s" % (os.path.basename(args[0]), args[2])
+        return os.path.basename(args[0]) if args else None
@@ -0,0 +1,162 @@
+"""Support for recursively scanning the sub-projects of a project."""
+
+import concurrent.futures
+import hashlib
+import json
+import logging
+import os
+import threading
+
+from . import jsonfile
+from .registry import get_markers
+from .scanner import Scanner
+from .util import cache_directory, file_digest, find_all, Timeouts
+from . import __version__
+
+
+# The options that affect the results of scanning a sub-project, hence are part of the
+# memo key. Any new option that changes what a scan finds must be added here.
+_RESULT_OPTIONS = ('manual_licenses', 'exclude', 'exclude_file', 'use_gitignore', 'wheelhouse',
+                   'pip_lock', 'git_mirror', 'text_store', 'compress_license_text',
+                   'max_license_text_size', 'policy_only', 'recursive', 'defer_github')
+
+
+def _scan_subproject(directory: str, name: str, options, ancestors: tuple) -> list:
+    # pylint: disable=import-outside-toplevel,cyclic-import
+    #   Justification: the entry point depends on this module.
+    from .entry_point import scan_directory
+    subprojects = SubprojectScanner(options, parallel=False, ancestors=ancestors)
+    return list(scan_directory(directory, name, options, subprojects).values())
+
+
+class SubprojectScanner:
+    """Scans the sub-projects (i.e. the checked out dependencies) of a project.
+
+    Rather than relying on each dependency having a `Dependencies/prereqs-licenses.json`
+    file, each dependency directory that contains something for the scanners to examine is
+    itself scanned, as if the scanner had been run in that directory with the dependency
+    name as the module name. The scans are started as soon as the dependencies have been
+    discovered and are run concurrently in a pool of processes. Within each of those
+    processes, the dependencies of the dependencies are scanned one at a time, so the
+    results are built from the bottom up.
+
+    The results are memoized in the scanner cache, keyed by the path of the sub-project
+    and the hash of its manifest files, so a sub-project is only scanned again if its
+    dependencies have changed.
+    """
+
+    def __init__(self, options, parallel: bool = True, ancestors: tuple = ()):
+        self._options = options
+        self._ancestors = ancestors
+        self._parallel = parallel
+        self._executor = None
+        # get_licenses() may be called from several threads (see kss.license.pipeline).
+        self._lock = threading.Lock()
+        self._futures = {}
+
+    def shutdown(self):
+        """Release the process pool."""
+        with self._lock:
+            executor = self._executor
+            self._executor = None
+        if executor:
+            executor.shutdown()
+
+    def start(self, projects: list):
+        """Start scanning the given projects (in the form returned by get_project_list())."""
+        if self._parallel:
+            for project in projects:
+                self._submit(project)
+
+    def get_licenses(self, project: dict) -> list:
+        """Return the licenses found by scanning the given project.
+
+        Returns None if the project does not contain anything to be scanned.
+        """
+        future = self._submit(project)
+        return None if future is None else future.result(Timeouts.limit(None))
+
+    def _submit(self, project: dict):
+        directory = project.get('directory', None)
+        if not directory or not os.path.isdir(directory):
+            return None
+        directory = os.path.realpath(directory)
+        with self._lock:
+            if directory in self._futures:
+                return self._futures[directory]
+            future = self._start_scan(directory, project['name'])
+            self._futures[directory] = future
+        if future is not None and not self._parallel and not future.done():
+            # The scan is run in this thread, outside the lock, and any other thread
+            # wanting the same sub-project waits for its result.
+            ancestors = self._ancestors + (directory,)
+            try:
+                future.set_result(_scan_subproject(directory, project['name'], self._options,
+                                                   ancestors))
+            except BaseException as ex:
+                future.set_exception(ex)
+        return future
+
+    def _start_scan(self, directory: str, name: str):
+        # Returns the future result of the scan. When not running in parallel the scan
+        # has not been run yet, and it is left to _submit() to complete the future.
+        if directory in self._ancestors:
+            logging.warning("      '%s' depends on itself", name)
+            return None
+        key = self._memo_key(directory, name)
+        if key is None:
+            return None
+        memofile = "%s/%s.json" % (cache_directory('subprojects'), key)
+        if os.path.isfile(memofile):
+            logging.info("      using the previous scan of '%s'", name)
+            future = concurrent.futures.Future()
+            with open(memofile, 'r') as infile:
+                future.set_result(jsonfile.loads(infile.read()))
+            return future
+        if self._parallel:
+            if self._executor is None:
+                # Created on first use, so that no processes are forked for projects
+                # without sub-projects, nor after the pipeline threads have started.
+                self._executor = concurrent.futures.ProcessPoolExecutor(self._options.jobs)
+            logging.info("      scanning '%s' as a sub-project", name)
+            future = self._executor.submit(_scan_subproject, directory, name, self._options,
+                                           self._ancestors + (directory,))
+        else:
+            future = concurrent.futures.Future()
+        future.add_done_callback(lambda f: self._memoize(memofile, f))
+        return future
+
+    def _memoize(self, memofile: str, future):
+        if future.exception() is None and self._is_complete(future.result()):
+            tmpfile = "%s.%d.tmp" % (memofile, os.getpid())
+            with open(tmpfile, 'w') as outfile:
+                outfile.write(jsonfile.dumps(future.result()))
+            os.replace(tmpfile, memofile)
+
+    def _is_complete(self, licenses: list) -> bool:
+        # Results affected by the timeouts would not be the same if scanned again.
+        for lic in licenses:
+            if lic.get(Scanner.INCOMPLETE_KEY, None):
+                return False
+            if lic.get(Scanner.GITHUB_PENDING_KEY, False) and not self._options.defer_github:
+                return False
+        return True
+
+    def _memo_key(self, directory: str, name: str) -> str:
+        manifests = []
+        for filename in sorted(get_markers(self._options)):
+            manifests.extend(find_all(filename, directory=directory, skipprefix="Tests/"))
+        if not manifests:
+            return None
+        if os.path.isfile("%s/%s" % (directory, self._options.exclude_file)):
+            manifests.append(self._options.exclude_file)
+        options = {key: getattr(self._options, key, None) for key in _RESULT_OPTIONS}
+        data = {
+            'directory': directory,
+            'name': name,
+            'manifests': [[filename, file_digest("%s/%s" % (directory, filename))]
+                          for filename in sorted(manifests)],
+            'options': options,
+            'version': __version__
+        }
+        return hashlib.sha256(json.dumps(data, sort_keys=True).encode('utf-8')).hexdigest()
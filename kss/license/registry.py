@@ -0,0 +1,123 @@
+"""Registry of the available scanners."""
+
+import importlib
+import logging
+
+from .util import find_names
+
+try:
+    from importlib.metadata import entry_points
+except ImportError:
+    # Python 3.7 does not have importlib.metadata, in which case only the built in
+    # scanners are available.
+    entry_points = None
+
+
+ENTRY_POINT_GROUP = 'kss.license.scanners'
+
+# The plugins, once found. Searching the entry points reads the metadata of every
+# installed distribution, and the plugins are needed for every (sub-project) scan.
+_plugins = None
+
+
+class ScannerPlugin:
+    """Describes a scanner without needing to import it.
+
+    Parameters:
+        name: a unique name identifying the scanner
+        scanner: the scanner class, in the form 'package.module:ClassName'
+        markers: the file names whose presence, anywhere in the scanned directory
+                 tree, means that the scanner should be run. This may also be a
+                 function that takes the command line options and returns the names.
+        order: scanners are run in increasing order. The built in scanners use the
+               values 10 through 30 and plugins default to 100.
+
+    Additional scanners may be added by declaring an entry point, in the group
+    'kss.license.scanners', that refers to a ScannerPlugin. Only the module containing
+    that object will be imported when the scanner starts. The module containing the
+    scanner itself is not imported unless one of its marker files is found.
+    """
+
+    def __init__(self, name: str, scanner: str, markers, order: int = 100):
+        self.name = name
+        self.scanner = scanner
+        self.markers = markers
+        self.order = order
+
+    def get_markers(self, options) -> set:
+        """Returns the set of marker file names."""
+        return set(self.markers(options) if callable(self.markers) else self.markers)
+
+    def create(self, modulename: str, options, subprojects=None):
+        """Import the scanner class and construct a scanner using its create() method."""
+        modulename_, classname = self.scanner.split(':')
+        cls = getattr(importlib.import_module(modulename_), classname)
+        return cls.create(modulename, options, subprojects)
+
+
+BUILT_IN_PLUGINS = [
+    ScannerPlugin('manual', 'kss.license.manual_scanner:ManualScanner',
+                  lambda options: [options.manual_licenses], 10),
+    ScannerPlugin('swift', 'kss.license.swift_scanner:SwiftModuleScanner',
+                  ['Package.resolved'], 20),
+    ScannerPlugin('kss', 'kss.license.kss_prereqs_scanner:KSSPrereqsScanner',
+                  ['prereqs.json'], 30),
+]
+
+
+def get_plugins() -> list:
+    """Returns all the known plugins, in the order in which they should be run.
+
+    The entry points are only searched the first time this is called in each process.
+    """
+    # pylint: disable=global-statement
+    #   Justification: the plugins are found once per process.
+    global _plugins
+    if _plugins is None:
+        _plugins = _find_plugins()
+    return list(_plugins)
+
+
+def _find_plugins() -> list:
+    plugins = {plugin.name: plugin for plugin in BUILT_IN_PLUGINS}
+    for entry in _get_entry_points():
+        try:
+            plugin = entry.load()
+        # pylint: disable=broad-except
+        #   Justification: a broken plugin should not prevent the other scanners from running.
+        except Exception as ex:
+            logging.warning("Could not load the scanner plugin '%s': %s", entry.name, ex)
+            continue
+        logging.debug("Found the scanner plugin '%s'", plugin.name)
+        plugins[plugin.name] = plugin
+    return sorted(plugins.values(), key=lambda plugin: plugin.order)
+
+
+def get_markers(options, plugins: list = None) -> set:
+    """Returns the marker file names of all the plugins."""
+    markers = set()
+    for plugin in plugins or get_plugins():
+        markers.update(plugin.get_markers(options))
+    return markers
+
+
+def create_scanners(modulename: str, options, subprojects=None) -> list:
+    """Construct the scanners whose markers are found in the current directory tree."""
+    plugins = get_plugins()
+    found = find_names(get_markers(options, plugins), skipprefix="Tests/")
+    scanners = []
+    for plugin in plugins:
+        if plugin.get_markers(options) & found:
+            scanners.append(plugin.create(modulename, options, subprojects))
+        else:
+            logging.debug("Skipping the scanner '%s'", plugin.name)
+    return scanners
+
+
+def _get_entry_points() -> list:
+    if entry_points is None:
+        return []
+    entries = entry_points()
+    if hasattr(entries, 'select'):
+        return list(entries.select(group=ENTRY_POINT_GROUP))
+    return list(entries.get(ENTRY_POINT_GROUP, []))
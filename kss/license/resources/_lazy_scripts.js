@@ -0,0 +1,110 @@
+var data = JSON.parse(document.getElementById("licenseData").textContent);
+var topList = document.getElementById("topUL");
+var searchText = document.getElementById("searchText");
+var licenseFilter = document.getElementById("licenseFilter");
+
+function addItem(list, text, className) {
+    var item = document.createElement("li");
+    if (className) {
+        item.className = className;
+    }
+    if (text) {
+        item.appendChild(document.createTextNode(text));
+    }
+    list.appendChild(item);
+    return item;
+}
+
+function addLink(item, url) {
+    var link = document.createElement("a");
+    link.href = url;
+    link.appendChild(document.createTextNode(url));
+    item.appendChild(link);
+}
+
+function addCaret(item, text, nestedClass) {
+    var caret = document.createElement("span");
+    caret.className = "caret";
+    caret.appendChild(document.createTextNode(text));
+    item.appendChild(caret);
+    var nested = document.createElement("ul");
+    nested.className = nestedClass;
+    item.appendChild(nested);
+    return caret;
+}
+
+function renderDetails(module, list) {
+    if (module.u) {
+        addLink(addItem(list, "Project URL: "), module.u);
+    }
+    if (module.l === undefined) {
+        return;
+    }
+    var license = data.licenses[module.l];
+    addItem(list, "License: " + license.name);
+    if (module.t !== undefined) {
+        var textItem = addItem(list);
+        var caret = addCaret(textItem, "License Text", "nested lictext");
+        caret.addEventListener("click", function() {
+            var nested = this.parentElement.querySelector(".nested");
+            if (!nested.firstChild) {
+                addItem(nested, data.texts[module.t]);
+            }
+            nested.classList.toggle("active");
+            this.classList.toggle("caret-down");
+        });
+    }
+    if (license.seeAlso && license.seeAlso.length) {
+        var seeAlso = addItem(list, "See Also:");
+        var links = document.createElement("ul");
+        links.className = "licdetails";
+        seeAlso.appendChild(links);
+        license.seeAlso.forEach(function(url) {
+            addLink(addItem(links), url);
+        });
+    }
+}
+
+function renderModule(module) {
+    var item = addItem(topList);
+    var caret = addCaret(item, module.n, "nested boxed");
+    caret.addEventListener("click", function() {
+        var nested = this.parentElement.querySelector(".nested");
+        if (!nested.firstChild) {
+            renderDetails(module, nested);
+        }
+        nested.classList.toggle("active");
+        this.classList.toggle("caret-down");
+    });
+    module.item = item;
+}
+
+function applyFilter() {
+    var text = searchText.value.toLowerCase();
+    var license = licenseFilter.value;
+    data.modules.forEach(function(module) {
+        var visible = module.n.toLowerCase().indexOf(text) >= 0
+            && (license === "" || String(module.l) === license);
+        module.item.style.display = visible ? "" : "none";
+    });
+}
+
+// The only carets present initially are those of the local license.
+var toggler = document.getElementsByClassName("caret");
+for (var i = 0; i < toggler.length; i++) {
+    toggler[i].addEventListener("click", function() {
+                                this.parentElement.querySelector(".nested").classList.toggle("active");
+                                this.classList.toggle("caret-down");
+                                });
+}
+
+data.licenses.forEach(function(license, index) {
+    var option = document.createElement("option");
+    option.value = String(index);
+    option.appendChild(document.createTextNode(
+        license.spdx ? license.name + " (" + license.spdx + ")" : license.name));
+    licenseFilter.appendChild(option);
+});
+data.modules.forEach(renderModule);
+searchText.addEventListener("input", applyFilter);
+licenseFilter.addEventListener("change", applyFilter);
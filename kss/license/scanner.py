@@ -1,11 +1,13 @@
 """API for the scanning architecture."""
 
 import bisect
+import concurrent.futures
 import logging
+import subprocess
 
 from abc import ABC, abstractmethod
 
-from .util import GitHub, SPDX
+from .util import GitHub, SPDX, Timeouts
 
 
 class Scanner(ABC):
@@ -14,10 +16,23 @@ class Scanner(ABC):
     _spdx = SPDX()
     _github = GitHub()
     _ignored = set()
+    _policy = None
+
+    GITHUB_PENDING_KEY = 'x-githubPending'
+    INCOMPLETE_KEY = 'x-incomplete'
 
     def __init__(self, modulename: str):
         self.modulename = modulename
 
+    @classmethod
+    def create(cls, modulename: str, _options, _subprojects=None):
+        """Construct a scanner from the command line options.
+
+        This is used by `kss.license.registry` to construct the scanners. Subclasses
+        whose constructors need more than the module name must override this.
+        """
+        return cls(modulename)
+
     @abstractmethod
     def should_scan(self) -> bool:
         """Subclasses must override this to return True if this scanner is suitable for
@@ -35,12 +50,111 @@ class Scanner(ABC):
         """
         raise NotImplementedError()
 
+    def discover(self) -> list:
+        """Returns the list of work items that make up the scan.
+
+        Subclasses may override this, together with resolve(), in order to split the
+        scan into a cheap discovery phase and a potentially expensive resolution phase.
+        This allows the work items to be resolved independently of each other (see
+        `kss.license.pipeline`). The default implementation returns a single item that
+        causes resolve() to call scan(). You may assume that should_scan() has been
+        called and has returned True.
+        """
+        return [None]
+
+    def resolve(self, _item) -> list:
+        """Returns the list of license entries for one of the items returned by discover().
+
+        This may be called concurrently, from different threads, for different items.
+        """
+        return self.scan()
+
+    # pylint: disable=no-self-use
+    #   Justification: self is required as part of the API.
+    def item_name(self, _item) -> str:
+        """Returns the name of the module that resolve() will add for an item.
+
+        Subclasses that override discover() should override this if the name is known
+        without resolving the item, which allows items for modules that have already
+        been found to be handled by resolve_duplicate() instead (see `ModuleClaims`).
+        The default implementation returns None, meaning that the name is not known.
+        """
+        return None
+
+    def resolve_duplicate(self, item) -> list:
+        """Returns the list of license entries for an item whose module was already found.
+
+        This is called in place of resolve() for such items. The entry for the module
+        itself will only be merged into the existing one, which uses nothing but its
+        'moduleName' and 'x-usedBy', so subclasses may override this to skip the
+        expensive work of identifying its license. Any other entries that resolve()
+        would return must still be included. The default implementation calls resolve().
+        """
+        return self.resolve(item)
+
+    def resolve_incomplete(self, item, reason: str) -> list:
+        """Returns the list of license entries for an item that could not be resolved.
+
+        This is called in place of resolve() once the deadline (see `Timeouts`) has
+        passed, or if resolve() ran out of time. The default implementation returns an
+        'Unknown' entry, with the reason in INCOMPLETE_KEY, if the item_name() is known
+        and nothing otherwise. Subclasses may override this to include more details.
+        """
+        name = self.item_name(item)
+        if name is None:
+            return []
+        return [{'moduleName': name, 'moduleLicense': 'Unknown', self.INCOMPLETE_KEY: reason}]
+
+    def resolve_item(self, item, duplicate: bool = False) -> list:
+        """Returns the list of license entries for an item, within the time allowed.
+
+        This calls resolve(), or resolve_duplicate() if the item is a duplicate (see
+        `ModuleClaims`), unless the deadline has passed or that runs out of time, in
+        which case resolve_incomplete() is used instead.
+        """
+        if Timeouts.expired():
+            return self.resolve_incomplete(item, 'the deadline passed before it was examined')
+        try:
+            if duplicate:
+                return self.resolve_duplicate(item)
+            return self.resolve(item)
+        except (subprocess.TimeoutExpired, TimeoutError, concurrent.futures.TimeoutError) as ex:
+            logging.warning("   %s", ex)
+            if Timeouts.expired():
+                return self.resolve_incomplete(item, 'the deadline passed while it was examined')
+            return self.resolve_incomplete(item, str(ex) or 'it could not be examined in time')
+
     def add_licenses(self, licenses: dict):
-        """Calls should_scan() and scan() and adds the results to licenses."""
+        """Calls should_scan(), discover() and resolve() and adds the results to licenses."""
         if self.should_scan():
             logging.info("Running the scanner '%s'", type(self).__name__)
-            new_licenses = self.scan()
-            self._adjust_and_add_new_licenses(new_licenses, licenses)
+            claims = ModuleClaims(licenses)
+            for item in self.discover():
+                new_licenses = self.resolve_item(item, claims.is_duplicate(self, item))
+                self._adjust_and_add_new_licenses(new_licenses, licenses)
+
+    @classmethod
+    def reset_ignored(cls, ignored: set = None) -> set:
+        """Replace the set of ignored modules, returning the previous set.
+
+        The ignored modules are shared by all the scanners, so this should be called
+        before each scan of a project, and the previous set restored afterwards.
+        """
+        previous = Scanner._ignored
+        Scanner._ignored = set() if ignored is None else ignored
+        return previous
+
+    @classmethod
+    def set_policy(cls, policy=None):
+        """Replace the license policy, returning the previous one.
+
+        If set, each license entry is checked against the policy (a
+        `kss.license.policy.LicensePolicy`) as soon as it has been resolved, which may
+        raise a `PolicyViolation` and end the scan early.
+        """
+        previous = Scanner._policy
+        Scanner._policy = policy
+        return previous
 
     @classmethod
     def ensure_used_by(cls, usedby: str, lic: dict):
@@ -59,7 +173,56 @@ class Scanner(ABC):
         else:
             lic['x-usedBy'] = [usedby]
 
-    def _adjust_and_add_new_licenses(self, new_licenses: dict, licenses: dict):
+    def needs_details(self, lic: dict, licenses: dict) -> bool:
+        """Returns True if lic would be added, rather than merged or ignored, by this scanner."""
+        key = lic['moduleName']
+        return not (key in self._ignored or lic.get('x-ignored', False) or key in licenses)
+
+    def resolve_details(self, lic: dict):
+        """Fill in the SPDX details of a license entry, using GitHub if necessary.
+
+        This is called for each license entry that will be added to the results. It is
+        normally called while the license is being added, but may be called earlier
+        (see `kss.license.pipeline`). If the GitHub lookups are deferred (see
+        `GitHub.set_deferred()`), or cannot be made in time, an entry that needs one is
+        instead marked with GITHUB_PENDING_KEY, to be completed later by
+        `resolve_github_details()`.
+        """
+        if self._should_add_to_used_by(lic):
+            self.ensure_used_by(self.modulename, lic)
+        if 'moduleLicense' not in lic:
+            lic['moduleLicense'] = 'Unknown'
+        entry = self._spdx.search(lic.get('moduleLicense', None))
+        if entry:
+            self._set_spdx_info_into_license(entry, lic)
+        elif self._github.is_deferred(lic.get('moduleUrl', None)):
+            lic[self.GITHUB_PENDING_KEY] = True
+        else:
+            try:
+                self.resolve_github_details(lic)
+            except TimeoutError as ex:
+                logging.warning("   %s, leaving '%s' for later", ex, lic['moduleName'])
+                lic[self.GITHUB_PENDING_KEY] = True
+
+    @classmethod
+    def resolve_github_details(cls, lic: dict):
+        """Fill in the SPDX details of a license entry from its GitHub project, if possible.
+
+        This also removes any GITHUB_PENDING_KEY marker from the entry.
+
+        Raises:
+            NotAvailableException if the GitHub API cannot be called at this time
+            TimeoutError if GitHub does not respond in time
+        """
+        licenseid = cls._github.lookup(lic.get('moduleUrl', None))
+        if licenseid:
+            entry = cls._spdx.get_entry(licenseid)
+            if entry:
+                cls._set_spdx_info_into_license(entry, lic)
+        lic.pop(cls.GITHUB_PENDING_KEY, None)
+
+    def _adjust_and_add_new_licenses(self, new_licenses: dict, licenses: dict,
+                                     details_resolved: bool = False):
         for lic in new_licenses:
             key = lic['moduleName']
             if key in self._ignored:
@@ -69,33 +232,26 @@ class Scanner(ABC):
                     self._ignored.add(key)
                     logging.info("   Ignoring '%s' by request", lic['moduleName'])
                 else:
-                    self._merge_or_add_license(lic, licenses)
+                    self._merge_or_add_license(lic, licenses, details_resolved)
 
-    def _merge_or_add_license(self, lic: dict, licenses: dict):
+    def _merge_or_add_license(self, lic: dict, licenses: dict,
+                              details_resolved: bool = False):
         key = lic['moduleName']
         if key in licenses:
             self._merge_license(lic, licenses[key])
             logging.info("   Entry '%s' already exists", lic['moduleName'])
         else:
-            self._resolve_details_and_add_license(lic, licenses)
+            self._resolve_details_and_add_license(lic, licenses, details_resolved)
             logging.info("   Added '%s' as '%s'",
                          lic['moduleName'],
                          lic['moduleLicense'])
 
-    def _resolve_details_and_add_license(self, lic: dict, licenses: dict):
-        if self._should_add_to_used_by(lic):
-            self.ensure_used_by(self.modulename, lic)
-        if 'moduleLicense' not in lic:
-            lic['moduleLicense'] = 'Unknown'
-        entry = self._spdx.search(lic.get('moduleLicense', None))
-        if entry:
-            self._set_spdx_info_into_license(entry, lic)
-        else:
-            licenseid = self._github.lookup(lic.get('moduleUrl', None))
-            if licenseid:
-                entry = self._spdx.get_entry(licenseid)
-                if entry:
-                    self._set_spdx_info_into_license(entry, lic)
+    def _resolve_details_and_add_license(self, lic: dict, licenses: dict,
+                                         details_resolved: bool = False):
+        if not details_resolved:
+            self.resolve_details(lic)
+        if self._policy:
+            self._policy.check(lic)
         licenses[lic['moduleName']] = lic
 
     def _merge_license(self, source: dict, dest: dict):
@@ -115,3 +271,32 @@ class Scanner(ABC):
     @classmethod
     def _should_add_to_used_by(cls, lic: dict) -> bool:
         return 'x-usedBy' not in lic
+
+
+class ModuleClaims:
+    """Identifies the discovered items whose module has already been found.
+
+    An item is a duplicate if its module is already in the licenses or is ignored when
+    the scan starts, or if an earlier item of the scan is for the same module. By the
+    time a duplicate is added, the module will therefore have been added or ignored,
+    and the entry for it will only be merged or dropped. Only the items for which the
+    scanner returns an `item_name()` are considered.
+
+    The items must be passed to is_duplicate() in the order they will be added.
+    """
+
+    def __init__(self, licenses: dict):
+        # pylint: disable=protected-access
+        #   Justification: the ignored modules are shared by all the scanners.
+        self._claimed = set(licenses) | Scanner._ignored
+
+    def is_duplicate(self, scanner: Scanner, item) -> bool:
+        """Returns True if the module of the item has already been claimed."""
+        name = scanner.item_name(item)
+        if name is None:
+            return False
+        if name in self._claimed:
+            logging.info("   '%s' was already found, skipping its resolution", name)
+            return True
+        self._claimed.add(name)
+        return False
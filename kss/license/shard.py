@@ -0,0 +1,135 @@
+"""Support for splitting a scan across several processes or machines."""
+
+import logging
+
+from . import jsonfile
+from .scanner import ModuleClaims, Scanner
+
+
+def parse_shard(value: str) -> tuple:
+    """Parse a shard specification of the form "I/N", returning (I, N).
+
+    Raises:
+        ValueError: if the specification is not valid (I must be from 1 to N)
+    """
+    try:
+        index, count = [int(part) for part in value.split('/')]
+    except ValueError as ex:
+        raise ValueError("'%s' should be of the form I/N" % value) from ex
+    if count < 1 or index < 1 or index > count:
+        raise ValueError("'%s' should have 1 <= I <= N" % value)
+    return (index, count)
+
+
+class ShardedScan:
+    """Runs one shard of a scan.
+
+    Every shard runs the (cheap) discovery of all the scanners, and so agrees on the
+    complete list of work items and their order. Each shard then resolves every N'th
+    item, starting from the I'th, and fills in the SPDX and GitHub details of the
+    entries found. The result is the list of the resolved items, each tagged with its
+    position in the complete list, which can be written as a partial result.
+
+    The partial results of all the shards are combined by `merge()`, which adds the
+    items in their original order, exactly as a single scan would have done.
+    """
+
+    def __init__(self, scanners: list, index: int, count: int):
+        self._scanners = scanners
+        self._index = index
+        self._count = count
+
+    def run(self, modulename: str, project: str) -> dict:
+        """Run the shard, returning the partial result."""
+        items = []
+        seen = set()
+        claims = ModuleClaims({})
+        sequence = 0
+        for scanner in self._scanners:
+            if not scanner.should_scan():
+                continue
+            logging.info("Running the scanner '%s'", type(scanner).__name__)
+            for item in scanner.discover():
+                # Every shard sees all of the items, so they all agree on the duplicates.
+                duplicate = claims.is_duplicate(scanner, item)
+                if sequence % self._count == self._index - 1:
+                    lics = scanner.resolve_item(item, duplicate)
+                    if duplicate:
+                        # The module itself is resolved with an earlier item.
+                        seen.add(scanner.item_name(item))
+                    for lic in lics:
+                        # Entries seen earlier in this shard will be merged, and ignored
+                        # entries dropped, so neither needs the details.
+                        if lic['moduleName'] not in seen and not lic.get('x-ignored', False):
+                            scanner.resolve_details(lic)
+                        seen.add(lic['moduleName'])
+                    items.append({'sequence': sequence, 'licenses': lics})
+                sequence += 1
+        logging.info("Resolved %d of the %d items", len(items), sequence)
+        return {
+            'shard': {
+                'index': self._index,
+                'count': self._count,
+                'items': sequence,
+                'moduleName': modulename,
+                'project': project
+            },
+            'items': items
+        }
+
+
+class _MergeScanner(Scanner):
+    def should_scan(self) -> bool:
+        return False
+
+    def scan(self) -> list:
+        return []
+
+
+def merge(filenames: list) -> tuple:
+    """Combine the partial results written by the shards of a scan.
+
+    Returns a tuple of the licenses and the name of the project that was scanned.
+
+    Raises:
+        ValueError: if the files are not the complete set of shards from one scan
+    """
+    shards = {}
+    items = []
+    for filename in filenames:
+        logging.info("Reading partial result '%s'", filename)
+        data = jsonfile.read_file(filename)
+        shard = data.get('shard', None)
+        if not shard:
+            raise ValueError("%s is not a partial result" % filename)
+        if shard['index'] in shards:
+            raise ValueError("%s: shard %d was given more than once" % (filename, shard['index']))
+        shards[shard['index']] = shard
+        items.extend(data['items'])
+
+    first = next(iter(shards.values()), None)
+    if first is None:
+        raise ValueError("no partial results were given")
+    for shard in shards.values():
+        for key in ('count', 'items', 'moduleName', 'project'):
+            if shard[key] != first[key]:
+                raise ValueError("the partial results are not from the same scan (%s)" % key)
+    missing = sorted(set(range(1, first['count'] + 1)) - set(shards))
+    if missing:
+        raise ValueError("missing the partial results of shards %s" % missing)
+    items.sort(key=lambda item: item['sequence'])
+    if [item['sequence'] for item in items] != list(range(first['items'])):
+        raise ValueError("the partial results do not contain all of the items")
+
+    previous = Scanner.reset_ignored()
+    try:
+        scanner = _MergeScanner(first['moduleName'])
+        licenses = {}
+        for item in items:
+            # pylint: disable=protected-access
+            #   Justification: the merge performs the final step of Scanner.add_licenses().
+            scanner._adjust_and_add_new_licenses(item['licenses'], licenses,
+                                                 details_resolved=True)
+        return (licenses, first['project'])
+    finally:
+        Scanner.reset_ignored(previous)
@@ -2,39 +2,63 @@
 
 import logging
 import os
+import re
+import subprocess
+import urllib.parse
 from operator import itemgetter
 
-import kss.util.command as command
-import kss.util.jsonreader as jsonreader
+from kss.util.strings import remove_suffix
 
+from . import jsonfile
 from .directory_scanner import DirectoryScanner
-from .util import find_all
+from .git_store import GitObjectStore
+from .module_cache import ModuleCache
+from .util import Capabilities, find_all, run_command
 
 
 class SwiftModuleScanner(DirectoryScanner):
     """Scanner that searches for Swift modules
 
-    Specifically this searches for `Package.resolved` files and examines the modules
-    listed in them.
+    Specifically this searches for `Package.resolved` files (in any of the version 1, 2
+    or 3 formats) and examines the modules listed in them. Each pin is resolved to the
+    exact revision it names by trying, in turn:
+      1. the checkout made by SwiftPM in the `.build/checkouts` directory next to the
+         `Package.resolved` file, provided it is at the pinned revision
+      2. the repository in SwiftPM's shared repository cache, from which the license
+         file of the pinned revision is read directly
+      3. a search of the Xcode DerivedData directory
 
-    Note that this scanner will look for the checked out modules in the directory
+    The shared repository cache is looked for in
+        `~/Library/Caches/org.swift.swiftpm/repositories` and
+        `~/.cache/org.swift.swiftpm/repositories`
+    This can be changed by setting the environment variable
+        `LICENSE_SCANNER_SWIFTPM_CACHE`
+
+    The DerivedData directory is
         `~/Library/Developer/Xcode/DerivedData`
     This directory can be changed by setting the environment variable
         `LICENSE_SCANNER_XCODE_DERIVED_DATA`
     but that should be rare other than for testing purposes.
 
-    Also note that if there are multiple copies of a module checked out (which is likely
-    if the developer has multiple Xcode projects that use the library), then the first
-    match will be used for licensing purposes. This seems reasonable as it would be
-    rare for the license to change often. If this is considered risky, it can be
-    mitigated by cleaning out the DerivedData cache before building your project.
+    Also note that if there are multiple copies of a module checked out in DerivedData
+    (which is likely if the developer has multiple Xcode projects that use the library),
+    then the first match will be used for licensing purposes. This seems reasonable as
+    it would be rare for the license to change often, and it is only used when neither
+    of the exact copies is available.
     """
 
-    def __init__(self, modulename: str):
-        super().__init__(modulename)
+    def __init__(self, modulename: str, subprojects=None, module_cache: ModuleCache = None):
+        super().__init__(modulename, subprojects, module_cache)
         self._files = None
         self._xcode_derived_data_directory = os.environ.get('LICENSE_SCANNER_XCODE_DERIVED_DATA',
                                                             '~/Library/Developer/Xcode/DerivedData')
+        swiftpm_cache = os.environ.get('LICENSE_SCANNER_SWIFTPM_CACHE', None)
+        if swiftpm_cache:
+            self._swiftpm_cache_directories = [swiftpm_cache]
+        else:
+            self._swiftpm_cache_directories = ['~/Library/Caches/org.swift.swiftpm/repositories',
+                                               '~/.cache/org.swift.swiftpm/repositories']
+        self._swiftpm_repositories = None
 
     def should_scan(self) -> bool:
         self._files = self._get_xcode_package_dependency_files()
@@ -58,21 +82,119 @@ class SwiftModuleScanner(DirectoryScanner):
 
     def _get_entries_for_xcode_package_dependency_file(self, filename: str) -> list:
         entries = []
-        for pin in jsonreader.from_file(filename)['object']['pins']:
-            name = pin['package']
+        checkouts = os.path.join(os.path.dirname(filename), '.build', 'checkouts')
+        for pin in self._read_pins(filename):
             entry = {
-                'name': name,
-                'version': pin['state'].get('version', None),
-                'directory': self._get_project_directory(name),
-                'url': pin.get('repositoryURL', None)
+                'name': pin['name'],
+                'version': pin['version'],
+                'url': pin['url']
             }
+            try:
+                entry['directory'] = self._resolve_pin(pin, checkouts)
+            except subprocess.TimeoutExpired as ex:
+                logging.warning("%s", ex)
+                entry['directory'] = None
+                entry['incomplete'] = str(ex)
             entries.append(entry)
         return entries
 
+    @classmethod
+    def _read_pins(cls, filename: str) -> list:
+        # Version 1 has the pins inside "object", and names them by "package". Versions 2
+        # and 3 have them at the top level, and name them by their "identity".
+        data = jsonfile.read_file(filename)
+        pins = []
+        if 'object' in data:
+            for pin in data['object']['pins']:
+                pins.append(cls._make_pin(pin['package'], pin.get('repositoryURL', None),
+                                          pin['state']))
+        else:
+            for pin in data.get('pins', []):
+                pins.append(cls._make_pin(pin['identity'], pin.get('location', None),
+                                          pin['state']))
+        return pins
+
+    @classmethod
+    def _make_pin(cls, name: str, url: str, state: dict) -> dict:
+        # SwiftPM names the checkouts, and the cached repositories, after the last
+        # component of the URL.
+        basename = name
+        if url:
+            path = urllib.parse.urlparse(url).path.rstrip('/')
+            basename = remove_suffix(os.path.basename(path), '.git') or name
+        return {'name': name, 'url': url, 'basename': basename,
+                'version': state.get('version', None), 'revision': state.get('revision', None)}
+
+    def _resolve_pin(self, pin: dict, checkouts: str) -> str:
+        for resolver in (self._find_build_checkout, self._find_swiftpm_cache_repository):
+            directory = resolver(pin, checkouts)
+            if directory:
+                return directory
+        return self._get_project_directory(pin['name'])
+
+    def _find_build_checkout(self, pin: dict, checkouts: str) -> str:
+        for name in dict.fromkeys((pin['basename'], pin['name'])):
+            directory = os.path.join(checkouts, name)
+            if not os.path.isdir(directory):
+                continue
+            revision = self._read_checkout_revision(directory)
+            if revision and pin['revision'] and revision != pin['revision']:
+                logging.warning("Ignoring '%s', which is at %s rather than %s",
+                                directory, revision, pin['revision'])
+                continue
+            logging.debug("Found '%s' in %s", pin['name'], directory)
+            return directory
+        return None
+
+    @classmethod
+    def _read_checkout_revision(cls, directory: str) -> str:
+        # SwiftPM leaves its checkouts with a detached HEAD, at the pinned revision.
+        gitdir = os.path.join(directory, '.git')
+        if os.path.isfile(gitdir):
+            with open(gitdir, 'r') as infile:
+                line = infile.read().strip()
+            if not line.startswith('gitdir:'):
+                return None
+            gitdir = os.path.join(directory, line[len('gitdir:'):].strip())
+        try:
+            with open(os.path.join(gitdir, 'HEAD'), 'r') as infile:
+                head = infile.read().strip()
+        except OSError:
+            return None
+        return head if re.fullmatch(r'[0-9a-f]{40,64}', head) else None
+
+    def _find_swiftpm_cache_repository(self, pin: dict, _checkouts: str) -> str:
+        # The repositories are named "<basename>-<hash of the URL>". Since the hash is an
+        # implementation detail of SwiftPM, any repository with the right name is accepted
+        # as long as it contains the pinned revision.
+        if not pin['revision'] or not Capabilities.has_tool('git'):
+            return None
+        prefix = pin['basename'] + '-'
+        for name, pathname in self._get_swiftpm_repositories():
+            if name.startswith(prefix) and re.fullmatch(r'[0-9a-fA-F]+', name[len(prefix):]):
+                store = GitObjectStore.for_repository(pathname)
+                _, directory = store.extract_license(pin['revision'])
+                if directory:
+                    logging.debug("Found '%s' in %s", pin['name'], pathname)
+                    return directory
+        return None
+
+    def _get_swiftpm_repositories(self) -> list:
+        if self._swiftpm_repositories is None:
+            self._swiftpm_repositories = []
+            for cachedir in self._swiftpm_cache_directories:
+                cachedir = os.path.expanduser(cachedir)
+                if os.path.isdir(cachedir):
+                    for name in sorted(os.listdir(cachedir)):
+                        self._swiftpm_repositories.append((name, os.path.join(cachedir, name)))
+        return self._swiftpm_repositories
+
     def _get_project_directory(self, name: str) -> str:
         deriveddata = os.path.expanduser(self._xcode_derived_data_directory)
         if os.path.isdir(deriveddata):
-            for line in command.process("find %s -type d -name %s" % (deriveddata, name)):
+            # find fails if any directory cannot be read, even once it has found a match.
+            for line in run_command("find %s -type d -name %s -print -quit"
+                                    % (deriveddata, name), check=False):
                 if os.path.isdir(line):
                     return line
         logging.warning("Could not find '%s' inside '%s'", name, deriveddata)
@@ -0,0 +1,88 @@
+"""On disk store of license texts, used to keep them out of memory during a scan."""
+
+import hashlib
+import io
+import mmap
+import os
+import threading
+
+from .util import cache_directory
+
+
+class TextStore:
+    """Content addressed store of license texts.
+
+    Each text is stored once, in a file named by its sha256 digest, hence the license
+    entries only need to hold the digest. The texts are read back using memory mapping,
+    so that they are paged in from the file as they are encoded rather than being copied
+    into memory first. Every file is written to a temporary file and then renamed, so
+    the store may be shared by any number of processes, such as those scanning
+    sub-projects, and by later scans.
+    """
+
+    _CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_options(cls, options):
+        """Returns the store given by the command line options, or None if there is none."""
+        directory = getattr(options, 'text_store', None)
+        if directory is None:
+            return None
+        return TextStore(directory or cache_directory('texts'))
+
+    def put_file(self, filename: str) -> str:
+        """Add the contents of the file, without reading it all at once, returning its digest."""
+        tmpfile = self._tmp_filename()
+        digest = hashlib.sha256()
+        with open(filename, 'rb') as infile, open(tmpfile, 'wb') as outfile:
+            for chunk in iter(lambda: infile.read(self._CHUNK_SIZE), b''):
+                digest.update(chunk)
+                outfile.write(chunk)
+        return self._commit(tmpfile, digest.hexdigest())
+
+    def put(self, data: bytes) -> str:
+        """Add the data, returning its digest."""
+        digest = hashlib.sha256(data).hexdigest()
+        if os.path.isfile(self._filename(digest)):
+            return digest
+        tmpfile = self._tmp_filename()
+        with open(tmpfile, 'wb') as outfile:
+            outfile.write(data)
+        return self._commit(tmpfile, digest)
+
+    def open(self, digest: str):
+        """Returns a read only, file like, memory map of the text with the given digest.
+
+        Raises:
+            FileNotFoundError: if the store does not contain the text
+        """
+        with open(self._filename(digest), 'rb') as infile:
+            if os.fstat(infile.fileno()).st_size == 0:
+                # Empty files cannot be mapped.
+                return io.BytesIO()
+            return mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def get(self, digest: str) -> bytes:
+        """Returns the text with the given digest.
+
+        Raises:
+            FileNotFoundError: if the store does not contain the text
+        """
+        with self.open(digest) as mapped:
+            return mapped.read()
+
+    def _commit(self, tmpfile: str, digest: str) -> str:
+        filename = self._filename(digest)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        os.replace(tmpfile, filename)
+        return digest
+
+    def _filename(self, digest: str) -> str:
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def _tmp_filename(self) -> str:
+        return os.path.join(self.directory, "%d.%d.tmp" % (os.getpid(), threading.get_ident()))
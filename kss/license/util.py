@@ -1,34 +1,38 @@
 """Misc. utils used by the license package."""
 
 import base64
-import json
+import fnmatch
+import hashlib
 import logging
 import os
 import pkgutil
+import platform
+import re
+import shlex
+import shutil
+import signal
+import subprocess
+import sys
+import tarfile
+import time
 import urllib.parse
+import zlib
 
-import kss.util.command as command
-import kss.util.jsonreader as jsonreader
+import requests
 from kss.util.strings import remove_prefix, remove_suffix
 
+from . import jsonfile
+
 
 def find_all(name: str, directory: str = ".", isdir: bool = False, skipprefix: str = None) -> list:
     """File tree walk search.
 
     This method starts at the given directory and performs a deep search for instances
     of the given file or directory. It returns a list of all the matches, relative to
-    the starting directory.
+    the starting directory. The directories skipped are described in `TreeWalk`.
     """
     matches = []
-    for dirpath, dnames, fnames in os.walk(directory):
-        if dirpath == directory:
-            dirpath = ""
-        dirpath = remove_prefix(dirpath, directory + "/")
-        if dirpath.startswith("."):
-            continue
-        if skipprefix and dirpath.startswith(skipprefix):
-            continue
-
+    for dirpath, dnames, fnames in TreeWalk.walk(directory, skipprefix):
         names = dnames if isdir else fnames
         if name in names:
             fullname = name if dirpath == "" else "%s/%s" % (dirpath, name)
@@ -36,16 +40,373 @@ def find_all(name: str, directory: str = ".", isdir: bool = False, skipprefix: s
     return matches
 
 
+def find_names(names: set, directory: str = ".", skipprefix: str = None) -> set:
+    """Return the subset of the given file names that exist within the directory tree.
+
+    The same directories are skipped as by `find_all()`, but a single walk is used no
+    matter how many names are being searched for, and it stops as soon as all of them
+    have been found.
+    """
+    found = set()
+    for _, _, fnames in TreeWalk.walk(directory, skipprefix):
+        found.update(names.intersection(fnames))
+        if found == names:
+            break
+    return found
+
+
+class TreeWalk:
+    """Walks a directory tree, without descending into the directories we never examine.
+
+    The following are not descended into, although their names are still reported as
+    sub-directories of their parent (so that, for example, `.prereqs` can be found):
+      - hidden directories (those whose names start with ".")
+      - the directories matched by a `.gitignore` file, if `use_gitignore` is set
+      - the directory given by the skip prefix (e.g. "Tests/")
+
+    In addition anything matching one of the `excludes` glob patterns is neither
+    descended into nor reported. A pattern containing a "/" is matched against the
+    path relative to the top of the walk, otherwise it is matched against the name.
+
+    The entries of each directory are visited in order of their names, so that the
+    results do not depend on the file system.
+    """
+
+    excludes = []
+    use_gitignore = False
+
+    @classmethod
+    def configure(cls, excludes: list = None, use_gitignore: bool = False) -> tuple:
+        """Set the options used by all subsequent walks, returning the previous options."""
+        previous = (cls.excludes, cls.use_gitignore)
+        cls.excludes = list(excludes or [])
+        cls.use_gitignore = use_gitignore
+        return previous
+
+    @classmethod
+    def walk(cls, directory: str = ".", skipprefix: str = None):
+        """Generate (dirpath, dirnames, filenames) for each directory, like `os.walk()`.
+
+        The dirpath is relative to the given directory, with "" for the directory itself.
+        """
+        pending = [("", [])]
+        while pending:
+            dirpath, rules = pending.pop()
+            fullpath = "%s/%s" % (directory, dirpath) if dirpath else directory
+            if cls.use_gitignore:
+                rules = rules + _read_gitignore(fullpath, dirpath)
+            dnames = []
+            fnames = []
+            subdirs = []
+            try:
+                with os.scandir(fullpath) as entries:
+                    for entry in sorted(entries, key=lambda entry: entry.name):
+                        relpath = "%s/%s" % (dirpath, entry.name) if dirpath else entry.name
+                        isdir = entry.is_dir()
+                        if cls._is_excluded(entry.name, relpath):
+                            continue
+                        if not isdir:
+                            if not _is_ignored(rules, relpath, False):
+                                fnames.append(entry.name)
+                            continue
+                        dnames.append(entry.name)
+                        if entry.name.startswith(".") or entry.is_symlink():
+                            continue
+                        if skipprefix and (relpath + "/").startswith(skipprefix):
+                            continue
+                        if not _is_ignored(rules, relpath, True):
+                            subdirs.append(relpath)
+            except OSError as ex:
+                logging.debug("Could not read '%s': %s", fullpath, ex)
+                continue
+            yield (dirpath, dnames, fnames)
+            pending.extend((subdir, rules) for subdir in reversed(subdirs))
+
+    @classmethod
+    def _is_excluded(cls, name: str, relpath: str) -> bool:
+        for pattern in cls.excludes:
+            if fnmatch.fnmatchcase(relpath if '/' in pattern else name, pattern.strip('/')):
+                return True
+        return False
+
+
+def _read_gitignore(fullpath: str, dirpath: str) -> list:
+    rules = []
+    try:
+        with open("%s/.gitignore" % fullpath, 'r') as infile:
+            lines = infile.read().splitlines()
+    except OSError:
+        return rules
+    for line in lines:
+        line = line.rstrip()
+        if not line or line.startswith('#'):
+            continue
+        negate = line.startswith('!')
+        if negate:
+            line = line[1:]
+        # A trailing "/" only matches directories, while a "/" anywhere else anchors the
+        # pattern to the directory containing the .gitignore file.
+        dironly = line.endswith('/')
+        line = line.rstrip('/')
+        anchored = '/' in line
+        line = line.lstrip('/')
+        if not line:
+            continue
+        regex = _gitignore_regex(line if anchored else "**/" + line)
+        rules.append((dirpath, regex, negate, dironly))
+    return rules
+
+
+def _gitignore_regex(pattern: str):
+    # Unlike fnmatch, the wildcards do not match "/", other than "**" as a whole
+    # path component: a leading "**/" matches in any directory, "/**/" matches zero
+    # or more directories and a trailing "/**" matches everything inside.
+    parts = []
+    pos = 0
+    while pos < len(pattern):
+        if pattern.startswith('**/', pos) and (pos == 0 or pattern[pos - 1] == '/'):
+            parts.append('(?:.*/)?')
+            pos += 3
+        elif pattern.startswith('/**', pos) and pos + 3 == len(pattern):
+            parts.append('/.*')
+            pos += 3
+        elif pattern[pos] == '*':
+            parts.append('[^/]*')
+            pos += 1
+        elif pattern[pos] == '?':
+            parts.append('[^/]')
+            pos += 1
+        elif pattern[pos] == '[' and pattern.find(']', pos + 2) > 0:
+            end = pattern.find(']', pos + 2)
+            chars = pattern[pos + 1:end].replace('\\', '\\\\')
+            parts.append('[%s]' % ('^' + chars[1:] if chars.startswith('!') else chars))
+            pos = end + 1
+        elif pattern[pos] == '\\' and pos + 1 < len(pattern):
+            parts.append(re.escape(pattern[pos + 1]))
+            pos += 2
+        else:
+            parts.append(re.escape(pattern[pos]))
+            pos += 1
+    return re.compile(''.join(parts))
+
+
+def _is_ignored(rules: list, relpath: str, isdir: bool) -> bool:
+    ignored = False
+    for base, regex, negate, dironly in rules:
+        if dironly and not isdir:
+            continue
+        if base:
+            if not relpath.startswith(base + "/"):
+                continue
+            path = relpath[len(base) + 1:]
+        else:
+            path = relpath
+        if regex.fullmatch(path):
+            ignored = not negate
+    return ignored
+
+
+def cache_directory(*parts) -> str:
+    """Return, creating it if necessary, a directory within the scanner cache.
+
+    The cache is placed in `$XDG_CACHE_HOME/kss-license-scanner` (which defaults to
+    `~/.cache/kss-license-scanner`). This can be changed by setting the environment
+    variable `LICENSE_SCANNER_CACHE_DIRECTORY`.
+    """
+    root = os.environ.get('LICENSE_SCANNER_CACHE_DIRECTORY', None)
+    if not root:
+        root = os.path.join(os.environ.get('XDG_CACHE_HOME', '~/.cache'), 'kss-license-scanner')
+    directory = os.path.join(os.path.expanduser(root), *parts)
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
 def read_encoded(filename: str) -> str:
     """Read a file and return the base64 encoding of its contents."""
     with open(filename, 'rb') as infile:
-        return base64.b64encode(infile.read()).decode('utf-8')
+        return _encode_stream(infile, None)
+
+
+def read_compressed(filename: str) -> str:
+    """Read a file and return the base64 encoding of its zlib compressed contents."""
+    with open(filename, 'rb') as infile:
+        return _encode_stream(infile, zlib.compressobj(9))
+
+
+def _encode_stream(infile, compressor) -> str:
+    # The file is processed in chunks so that it never has to be in memory all at once.
+    # Base64 encodes 3 bytes at a time, hence any remainder is carried to the next chunk.
+    encoded = []
+    remainder = b''
+    done = False
+    while not done:
+        data = infile.read(65536)
+        done = not data
+        if compressor:
+            data = compressor.flush() if done else compressor.compress(data)
+        data = remainder + data
+        usable = len(data) - (len(data) % 3)
+        encoded.append(base64.b64encode(data[:usable]).decode('utf-8'))
+        remainder = data[usable:]
+    encoded.append(base64.b64encode(remainder).decode('utf-8'))
+    return ''.join(encoded)
 
 
 class NotAvailableException(Exception):
     """Specifies that a resource is not available, but may be in the future."""
 
 
+class Timeouts:
+    """Limits on the time taken by the external operations of a scan.
+
+    `command` and `network` are the number of seconds that a subprocess, or a network
+    request, may take, or None if there is no limit. If a deadline is set (as a
+    `time.time()` value, so that it can be shared with other processes) no operation
+    may run beyond it, and once it has passed `expired()` returns True and no new
+    operations are started.
+    """
+
+    command = None
+    network = None
+    deadline = None
+
+    @classmethod
+    def configure(cls, command: float = None, network: float = None,
+                  deadline: float = None) -> tuple:
+        """Set the limits, returning the previous (command, network, deadline) values."""
+        previous = (cls.command, cls.network, cls.deadline)
+        cls.command = command
+        cls.network = network
+        cls.deadline = deadline
+        return previous
+
+    @classmethod
+    def expired(cls) -> bool:
+        """Returns True if the deadline has passed."""
+        return cls.deadline is not None and time.time() >= cls.deadline
+
+    @classmethod
+    def limit(cls, timeout: float) -> float:
+        """Returns the time that an operation, itself limited to timeout, may take."""
+        if cls.deadline is None:
+            return timeout
+        remaining = max(cls.deadline - time.time(), 0.0)
+        return remaining if timeout is None else min(timeout, remaining)
+
+
+def run_command(cmd: str, check: bool = True) -> list:
+    """Run a shell command and return the lines of its standard output.
+
+    The command, and anything it starts, is killed if it takes longer than allowed by
+    `Timeouts.command` and the deadline. If `check` is False, the output is returned
+    even if the command fails.
+
+    Raises:
+        subprocess.CalledProcessError: if the command fails, and check is True
+        subprocess.TimeoutExpired: if the command does not finish in time, or the
+                                   deadline has already passed
+    """
+    timeout = Timeouts.limit(Timeouts.command)
+    if timeout is not None and timeout <= 0:
+        raise subprocess.TimeoutExpired(cmd, 0)
+    logging.debug("Running command: %s", cmd)
+    with subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE,
+                          start_new_session=True) as process:
+        try:
+            output, _ = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+            process.communicate()
+            raise
+    if check and process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, cmd)
+    return output.decode('utf-8').splitlines()
+
+
+class Capabilities:
+    """The platform, and the tools and backends available to the scanner.
+
+    These are probed once per process, without starting any subprocesses: the platform
+    is identified using the `platform` module and the tools are found by searching the
+    PATH. For each job that has more than one backend, the fastest one available is
+    chosen, in particular the pip module details are read in-process whenever the
+    `python3` on the PATH is the interpreter running the scanner, in the same (virtual)
+    environment.
+    """
+
+    IN_PROCESS = 'in-process'
+    TOOLS = ('find', 'git', 'ninka', 'python3')
+
+    _probed = None
+
+    @classmethod
+    def probe(cls) -> dict:
+        """Returns the capabilities, probing for them the first time it is called."""
+        if cls._probed is None:
+            tools = {name: shutil.which(name) for name in cls.TOOLS}
+            cls._probed = {
+                'platform': "%s-%s" % (platform.system(), platform.machine()),
+                'python': platform.python_version(),
+                'tools': sorted(name for name, path in tools.items() if path),
+                'backends': {
+                    'pip': cls._choose_pip_backend(tools['python3']),
+                    'license': 'ninka' if tools['ninka'] else None
+                }
+            }
+            logging.debug("Capabilities: %s", cls._probed)
+        return cls._probed
+
+    @classmethod
+    def reset(cls):
+        """Discard the capabilities, so that they are probed again (e.g. after PATH changes)."""
+        cls._probed = None
+
+    @classmethod
+    def os_directory(cls) -> str:
+        """Returns the platform in the form "<system>-<machine>", as `uname -s`-`uname -m`."""
+        return cls.probe()['platform']
+
+    @classmethod
+    def has_tool(cls, name: str) -> bool:
+        """Returns True if the tool, which must be one of TOOLS, is on the PATH."""
+        return name in cls.probe()['tools']
+
+    @classmethod
+    def backend(cls, job: str) -> str:
+        """Returns the backend chosen for the job ('pip' or 'license'), or None if there is none."""
+        return cls.probe()['backends'][job]
+
+    @classmethod
+    def _choose_pip_backend(cls, python3: str) -> str:
+        # Python 3.7 does not have importlib.metadata. Otherwise if there is no python3
+        # on the PATH the running interpreter is the only one.
+        if sys.version_info < (3, 8):
+            return 'pip'
+        if not python3:
+            return cls.IN_PROCESS
+        try:
+            if not os.path.samefile(python3, sys.executable):
+                return 'pip'
+        except OSError:
+            return 'pip'
+        # The interpreters of virtual environments (including those of pipx) are links
+        # to the base interpreter, so it must also be using the same site-packages.
+        prefix = cls._virtual_environment(python3) or sys.base_prefix
+        if os.path.realpath(prefix) == os.path.realpath(sys.prefix):
+            return cls.IN_PROCESS
+        return 'pip'
+
+    @classmethod
+    def _virtual_environment(cls, python: str) -> str:
+        # As Python itself does, a virtual environment is recognized by the pyvenv.cfg
+        # file next to the interpreter or in its parent directory.
+        bindir = os.path.dirname(os.path.abspath(python))
+        for directory in (bindir, os.path.dirname(bindir)):
+            if os.path.isfile(os.path.join(directory, 'pyvenv.cfg')):
+                return directory
+        return None
+
+
 class Ninka:
     """Utility class used to guess a license given a directory."""
 
@@ -71,24 +432,257 @@ class Ninka:
         """
         if not os.path.isfile(filename):
             raise FileNotFoundError(filename)
-        licensetype = command.get_run("ninka %s | cut -d ';' -f2" % filename)
+        if not Capabilities.backend('license'):
+            logging.debug("ninka is not available to identify %s", filename)
+            return 'Unknown'
+        # Each line of output is "<filename>;<license>;...", of which we want the license.
+        try:
+            lines = run_command("ninka %s" % shlex.quote(filename))
+        except subprocess.CalledProcessError as ex:
+            logging.warning("ninka failed to identify %s: %s", filename, ex)
+            return 'Unknown'
+        licensetype = '\n'.join(line.split(';')[1] if ';' in line else line
+                                for line in lines).strip()
         licensetype = remove_prefix(licensetype, 'spdx')
         logging.debug("Ninka identified license as '%s' based on %s",
                       licensetype,
                       filename)
         return licensetype
 
+    @classmethod
+    def find_license_file(cls, dirname: str) -> str:
+        """Returns the file that guess_license() would examine, or None if there is none."""
+        return cls._get_license_filename(dirname)
 
     @classmethod
     def _get_license_filename(cls, dirname: str):
+        # Newer Python packages (PEP 639) place their license files in a "licenses"
+        # subdirectory, so we descend into a directory if no license file is found.
         try:
-            for entry in os.listdir(dirname):
-                if entry.upper().startswith('LICENSE'):
-                    return "%s/%s" % (dirname, entry)
+            entries = sorted(os.listdir(dirname))
         except FileNotFoundError:
+            return None
+        for entry in entries:
+            if entry.upper().startswith('LICENSE') and os.path.isfile("%s/%s" % (dirname, entry)):
+                return "%s/%s" % (dirname, entry)
+        for entry in entries:
+            if entry.upper().startswith('LICENSE') and os.path.isdir("%s/%s" % (dirname, entry)):
+                filename = cls._get_license_filename("%s/%s" % (dirname, entry))
+                if filename:
+                    return filename
+        return None
+
+
+def file_digest(filename: str) -> str:
+    """Return the sha256 digest of the contents of the given file."""
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as infile:
+        for chunk in iter(lambda: infile.read(1048576), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Tarball:
+    """Utility class used to find a license file in a tarball without extracting it.
+
+    The members of the tarball are streamed until a license file is found in either its
+    top level directory or the directory directly below that (which is where most
+    tarballs place their sources). Only that file is copied into the scanner cache,
+    keyed by the sha256 of the tarball, so each tarball is only searched once. The
+    digest is itself remembered by the path, size and modification time of the
+    tarball, so that an unchanged tarball is not even read to find it in the cache.
+    """
+
+    _cached = {}
+
+    @classmethod
+    def extract_license(cls, filename: str) -> str:
+        """Returns a directory containing the tarball's license file, if it has one.
+
+        The returned directory is suitable for passing to `Ninka.guess_license()`.
+        """
+        stat = os.stat(filename)
+        key = (os.path.realpath(filename), stat.st_size, stat.st_mtime_ns)
+        if key not in cls._cached:
+            cls._cached[key] = cls._get_directory(filename, key)
+        return cls._cached[key]
+
+    @classmethod
+    def _get_directory(cls, filename: str, key: tuple) -> str:
+        index = os.path.join(cache_directory('tarballs', 'index'),
+                             hashlib.sha256(repr(key).encode('utf-8')).hexdigest())
+        try:
+            with open(index, 'r') as infile:
+                directory = cache_directory('tarballs', infile.read().strip())
+            if os.path.isfile("%s/.searched" % directory):
+                return directory
+        except OSError:
             pass
+        digest = file_digest(filename)
+        directory = cache_directory('tarballs', digest)
+        if not os.path.isfile("%s/.searched" % directory):
+            cls._search(filename, directory)
+            with open("%s/.searched" % directory, 'w'):
+                pass
+        tmpfile = "%s.%d.tmp" % (index, os.getpid())
+        with open(tmpfile, 'w') as outfile:
+            outfile.write(digest)
+        os.replace(tmpfile, index)
+        return directory
+
+    @classmethod
+    def _search(cls, filename: str, directory: str):
+        logging.debug("Searching '%s' for a license file", filename)
+        try:
+            with tarfile.open(filename, 'r|*') as tar:
+                for member in tar:
+                    parts = member.name.strip('/').split('/')
+                    if member.isfile() and len(parts) <= 2 \
+                            and parts[-1].upper().startswith('LICENSE'):
+                        logging.debug("Found '%s' in '%s'", member.name, filename)
+                        with tar.extractfile(member) as infile, \
+                                open("%s/%s" % (directory, parts[-1]), 'wb') as outfile:
+                            outfile.write(infile.read())
+                        return
+        except tarfile.TarError as ex:
+            logging.warning("Could not read '%s': %s", filename, ex)
+
+
+class LicenseText:
+    """Utility class used to embed the license texts into the license entries.
+
+    By default the text is stored, base64 encoded, in the `x-licenseTextEncoded` field.
+    If compression is configured, it is instead zlib compressed before being base64
+    encoded, and stored in the `x-licenseTextCompressed` field. In either case texts
+    larger than the configured maximum size (in bytes, before encoding) are not embedded,
+    and if the texts are not enabled at all they are not even read.
+
+    If a `TextStore` is configured, the texts are instead kept in the store during the
+    scan, and only their digest is stored in the `x-licenseTextStored` field. Such entries
+    must be passed through expand() before they are written out.
+    """
+
+    ENCODED_KEY = 'x-licenseTextEncoded'
+    COMPRESSED_KEY = 'x-licenseTextCompressed'
+    STORED_KEY = 'x-licenseTextStored'
+
+    compress = False
+    max_size = None
+    enabled = True
+    store = None
+
+    @classmethod
+    def configure(cls, compress: bool = False, max_size: int = None, enabled: bool = True,
+                  store=None) -> tuple:
+        """Set the encoding used by all subsequent calls to add(), returning the previous one."""
+        previous = (cls.compress, cls.max_size, cls.enabled, cls.store)
+        cls.compress = compress
+        cls.max_size = max_size
+        cls.enabled = enabled
+        cls.store = store
+        return previous
+
+    @classmethod
+    def add(cls, filename: str, lic: dict):
+        """Read the license text from filename and store it in lic."""
+        if not cls.enabled:
+            return
+        size = os.path.getsize(filename)
+        if cls.max_size is not None and size > cls.max_size:
+            logging.warning("Not including the text of %s (%d bytes) in '%s'",
+                            filename, size, lic.get('moduleName', ''))
+            return
+        if cls.store:
+            lic[cls.STORED_KEY] = cls.store.put_file(filename)
+        elif cls.compress:
+            lic[cls.COMPRESSED_KEY] = read_compressed(filename)
+        else:
+            lic[cls.ENCODED_KEY] = read_encoded(filename)
+
+    @classmethod
+    def decode(cls, lic: dict) -> str:
+        """Return the license text of lic, in either encoding, or None if there is none."""
+        data = cls._decode_bytes(lic)
+        return None if data is None else data.decode('utf-8')
+
+    @classmethod
+    def normalize(cls, lic: dict):
+        """Convert the license text of an existing entry to the configured encoding."""
+        keys = (cls.ENCODED_KEY, cls.COMPRESSED_KEY, cls.STORED_KEY)
+        if not cls.enabled:
+            for key in keys:
+                lic.pop(key, None)
+            return
+        wanted = cls.ENCODED_KEY
+        if cls.store:
+            wanted = cls.STORED_KEY
+        elif cls.compress:
+            wanted = cls.COMPRESSED_KEY
+        others = [key for key in keys if key != wanted and key in lic]
+        if not others:
+            return
+        data = cls._decode_bytes(lic)
+        for key in others:
+            del lic[key]
+        cls.add_data(data, lic)
+
+    @classmethod
+    def expand(cls, lic: dict) -> dict:
+        """Return lic with any text held in the store embedded in the configured encoding.
+
+        The entry itself is not changed, and the text is encoded as it is read from the
+        store, so that only one text at a time is held in memory.
+        """
+        digest = lic.get(cls.STORED_KEY, None)
+        if not digest:
+            return lic
+        lic = {name: value for name, value in lic.items() if name != cls.STORED_KEY}
+        with cls._get_store().open(digest) as infile:
+            if cls.compress:
+                lic[cls.COMPRESSED_KEY] = _encode_stream(infile, zlib.compressobj(9))
+            else:
+                lic[cls.ENCODED_KEY] = _encode_stream(infile, None)
+        return lic
+
+    @classmethod
+    def add_data(cls, data: bytes, lic: dict):
+        """Store the given license text in lic."""
+        if not cls.enabled:
+            return
+        if cls.max_size is not None and len(data) > cls.max_size:
+            logging.warning("Not including the text (%d bytes) in '%s'",
+                            len(data), lic.get('moduleName', ''))
+        elif cls.store:
+            lic[cls.STORED_KEY] = cls.store.put(data)
+        elif cls.compress:
+            lic[cls.COMPRESSED_KEY] = base64.b64encode(zlib.compress(data, 9)).decode('utf-8')
+        else:
+            lic[cls.ENCODED_KEY] = base64.b64encode(data).decode('utf-8')
+
+    @classmethod
+    def get_data(cls, lic: dict) -> bytes:
+        """Return the license text of lic, in either encoding, or None if there is none."""
+        return cls._decode_bytes(lic)
+
+    @classmethod
+    def _decode_bytes(cls, lic: dict) -> bytes:
+        compressed = lic.get(cls.COMPRESSED_KEY, None)
+        if compressed:
+            return zlib.decompress(base64.b64decode(compressed))
+        encoded = lic.get(cls.ENCODED_KEY, None)
+        if encoded:
+            return base64.b64decode(encoded)
+        digest = lic.get(cls.STORED_KEY, None)
+        if digest:
+            return cls._get_store().get(digest)
         return None
 
+    @classmethod
+    def _get_store(cls):
+        if cls.store is None:
+            raise ValueError("The license text is held in a text store, but none is configured")
+        return cls.store
+
 
 class SPDX:
     """Utility class used to access the SPDX database."""
@@ -115,7 +709,7 @@ class SPDX:
             licenses = {}
             namemap = {}
             data = pkgutil.get_data(__name__, 'resources/spdx-licenses.json')
-            for lic in json.loads(data)['licenses']:
+            for lic in jsonfile.loads(data)['licenses']:
                 licenses[lic['licenseId']] = lic
                 namemap[lic['name']] = lic['licenseId']
             SPDX._licenses = licenses
@@ -165,6 +759,29 @@ class GitHub:
     # use the same cache and remaining call count. Note that this means the class is
     # not thread-safe, but that should be fine for our current scanner implementation.
 
+    _deferred = False
+
+    @classmethod
+    def set_deferred(cls, deferred: bool = False) -> bool:
+        """Set whether the lookups that would call the GitHub API are deferred.
+
+        While they are, `is_deferred()` identifies the lookups that should be left for
+        later. Returns the previous setting.
+        """
+        previous = GitHub._deferred
+        GitHub._deferred = deferred
+        return previous
+
+    def is_deferred(self, url: str) -> bool:
+        """Returns True if the lookup of the URL would call the API while it is deferred.
+
+        The lookups are also deferred once the deadline (see `Timeouts`) has passed.
+        """
+        if not (GitHub._deferred or Timeouts.expired()):
+            return False
+        host, organization, _ = self._parse_url(url)
+        return host == 'github.com' and organization not in self._cached
+
     def lookup(self, url: str) -> str:
         """Lookup the project specified by the URL using the GitHub API.
 
@@ -187,14 +804,24 @@ class GitHub:
     def _try_api(self, key: str, organization: str) -> list:
         self._ensure_can_call_github()
         try:
-            return jsonreader.from_url("https://api.github.com/%s/%s/repos"
-                                       % (key, organization))
+            return self._read_url("https://api.github.com/%s/%s/repos" % (key, organization))
+        except TimeoutError:
+            raise
         # pylint: disable=broad-except
         #   Justification: We really do want to trap all non-system-exiting exceptions.
         except Exception:
             pass
         return None
 
+    @classmethod
+    def _read_url(cls, url: str):
+        if Timeouts.expired():
+            raise TimeoutError("The deadline has passed")
+        try:
+            return jsonfile.read_url(url, Timeouts.limit(Timeouts.network))
+        except requests.exceptions.Timeout as ex:
+            raise TimeoutError("GitHub did not respond in time") from ex
+
     @classmethod
     def _parse_url(cls, url):
         host = None
@@ -219,7 +846,7 @@ class GitHub:
     def _ensure_can_call_github(self):
         allowable_calls = 0
         if self._remaining_calls == -1:
-            result = jsonreader.from_url("https://api.github.com/rate_limit")
+            result = self._read_url("https://api.github.com/rate_limit")
             self._remaining_calls = result['rate']['remaining']
             allowable_calls = result['rate']['limit']
         logging.debug("GitHub API calls remaining: %d of %d",
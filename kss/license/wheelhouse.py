@@ -0,0 +1,231 @@
+"""Offline resolution of pip prerequisites from a local wheelhouse."""
+
+import concurrent.futures
+import email.parser
+import logging
+import os
+import re
+import zipfile
+
+from kss.util.strings import remove_suffix
+
+from . import jsonfile
+from .util import cache_directory
+
+
+def normalize_name(name: str) -> str:
+    """Return the PEP 503 normalized form of a distribution name."""
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def read_pins(filename: str) -> dict:
+    """Read the pinned versions from a requirements or lock file.
+
+    Both requirements style files (lines of the form `name==version`) and `Pipfile.lock`
+    files are understood. Returns a dictionary mapping the normalized module names to
+    their pinned versions. Entries that are not pinned to an exact version are ignored.
+    """
+    if filename.endswith('.lock'):
+        return _read_pipfile_lock_pins(filename)
+    pins = {}
+    with open(filename, 'r') as infile:
+        for line in infile:
+            line = line.split('#', 1)[0].split(';', 1)[0].strip()
+            if not line or line.startswith('-'):
+                continue
+            match = re.match(r"^([A-Za-z0-9][A-Za-z0-9._-]*)(\[[^\]]*\])?\s*===?\s*([^\s\\]+)",
+                             line)
+            if match:
+                pins[normalize_name(match.group(1))] = match.group(3)
+    return pins
+
+
+def _read_pipfile_lock_pins(filename: str) -> dict:
+    pins = {}
+    data = jsonfile.read_file(filename)
+    for section in ('default', 'develop'):
+        for name, entry in data.get(section, {}).items():
+            version = entry.get('version', '')
+            if version.startswith('=='):
+                pins.setdefault(normalize_name(name), version[2:])
+    return pins
+
+
+def details_from_metadata(metadata, location: str) -> dict:
+    """Return the details of a module, in the same form as `pip show`, from its METADATA.
+
+    Parameters:
+        metadata: the parsed METADATA file
+        location: the directory containing the module's .dist-info directory
+    """
+    details = {'Location': location}
+    for key in ('Name', 'Version', 'License', 'Home-page'):
+        value = metadata.get(key, None)
+        if value and value.strip() and value.strip() != 'UNKNOWN':
+            details[key] = value.strip().splitlines()[0]
+    requires = []
+    for req in metadata.get_all('Requires-Dist', []):
+        if re.search(r"\bextra\s*==", req):
+            continue
+        match = re.match(r"^\s*([A-Za-z0-9][A-Za-z0-9._-]*)", req)
+        if match and match.group(1) not in requires:
+            requires.append(match.group(1))
+    if requires:
+        details['Requires'] = requires
+    details.update(license_metadata(metadata))
+    return details
+
+
+def installed_details(name: str) -> dict:
+    """Return the details of a module installed for the running interpreter, as `pip show`.
+
+    Returns an empty dictionary if the module is not installed.
+    """
+    # pylint: disable=import-outside-toplevel
+    #   Justification: Python 3.7 does not have importlib.metadata, and does not use this.
+    import importlib.metadata
+    try:
+        distribution = importlib.metadata.distribution(name)
+    except importlib.metadata.PackageNotFoundError:
+        logging.warning("The pip module '%s' is not installed", name)
+        return {}
+    location = os.path.normpath(str(distribution.locate_file('')))
+    details = details_from_metadata(distribution.metadata, location)
+    if 'Requires' in details:
+        # In the same order as pip show.
+        details['Requires'].sort(key=str.lower)
+    return details
+
+
+def _version_key(version: str) -> tuple:
+    return tuple((0, int(part), '') if part.isdigit() else (-1, 0, part)
+                 for part in re.split(r"[.+-]", version))
+
+
+def license_metadata(metadata) -> dict:
+    """Return the structured license fields of a parsed METADATA file.
+
+    The result may contain `License-Expression` (the SPDX license expression of
+    metadata version 2.4 and later) and `Classifiers` (the license trove classifiers).
+    """
+    details = {}
+    expression = metadata.get('License-Expression', None)
+    if expression and expression.strip():
+        details['License-Expression'] = expression.strip()
+    classifiers = [classifier.strip() for classifier in metadata.get_all('Classifier', [])
+                   if classifier.strip().startswith('License ::')]
+    if classifiers:
+        details['Classifiers'] = classifiers
+    return details
+
+
+class Wheelhouse:
+    """Resolves pip module details by reading wheels in place.
+
+    The directory may be either a flat wheelhouse (as produced by `pip wheel` or
+    `pip download`) or a nested wheel cache such as `~/.cache/pip/wheels`. Wheels are
+    opened as zip files and only their `METADATA` and license files are read, so nothing
+    needs to be installed in order to determine the licenses.
+
+    The details returned by `get_details()` use the same keys as the output of
+    `pip show`, so they can be used interchangeably by the scanners. The license files
+    of each wheel are copied into the scanner cache directory, and the `Location` key
+    refers to that copy.
+    """
+
+    def __init__(self, directory: str, pins: dict = None, max_workers: int = None):
+        self._directory = directory
+        self._pins = pins or {}
+        self._max_workers = max_workers
+        self._wheels = None
+        self._details = {}
+
+    def get_details(self, pip: str) -> dict:
+        """Return the details of the given module or None if there is no suitable wheel."""
+        name = normalize_name(pip)
+        if name not in self._details:
+            self.prefetch([name])
+        return self._details.get(name, None)
+
+    def get_pinned_version(self, pip: str) -> str:
+        """Return the version that the given module is pinned to, or None if it is not."""
+        return self._pins.get(normalize_name(pip), None)
+
+    def prefetch(self, pips: list):
+        """Read the given modules, and everything they require, in parallel."""
+        pending = {normalize_name(pip) for pip in pips} - set(self._details)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+            while pending:
+                names = sorted(pending)
+                results = executor.map(self._read_details_for, names)
+                pending = set()
+                for name, details in zip(names, results):
+                    self._details[name] = details
+                    for req in (details or {}).get('Requires', []):
+                        if normalize_name(req) not in self._details:
+                            pending.add(normalize_name(req))
+
+    def _read_details_for(self, name: str) -> dict:
+        filename = self._find_wheel(name)
+        if not filename:
+            logging.debug("No wheel for '%s' found in '%s'", name, self._directory)
+            return None
+        logging.debug("Reading details for '%s' from '%s'", name, filename)
+        with zipfile.ZipFile(filename) as wheel:
+            distinfo = self._find_dist_info(wheel)
+            if not distinfo:
+                logging.warning("'%s' does not contain a dist-info directory", filename)
+                return None
+            metadata = email.parser.BytesParser().parsebytes(
+                wheel.read("%s/METADATA" % distinfo), headersonly=True)
+            location = cache_directory('wheels', remove_suffix(os.path.basename(filename), '.whl'))
+            self._extract_license_files(wheel, distinfo, location)
+        return details_from_metadata(metadata, location)
+
+    def _find_wheel(self, name: str) -> str:
+        candidates = self._get_wheels().get(name, [])
+        pinned = self._pins.get(name, None)
+        if pinned:
+            candidates = [wheel for wheel in candidates if wheel[0] == pinned]
+        if not candidates:
+            return None
+        return max(candidates, key=lambda wheel: _version_key(wheel[0]))[1]
+
+    def _get_wheels(self) -> dict:
+        if self._wheels is None:
+            wheels = {}
+            for dirpath, _, fnames in os.walk(self._directory):
+                for fname in fnames:
+                    if fname.endswith('.whl'):
+                        parts = fname.split('-')
+                        if len(parts) >= 5:
+                            wheels.setdefault(normalize_name(parts[0]), []).append(
+                                (parts[1], os.path.join(dirpath, fname)))
+            logging.info("   found %d wheels in '%s'", len(wheels), self._directory)
+            self._wheels = wheels
+        return self._wheels
+
+    @classmethod
+    def _find_dist_info(cls, wheel: zipfile.ZipFile) -> str:
+        for name in wheel.namelist():
+            parts = name.split('/')
+            if len(parts) == 2 and parts[0].endswith('.dist-info') and parts[1] == 'METADATA':
+                return parts[0]
+        return None
+
+    @classmethod
+    def _extract_license_files(cls, wheel: zipfile.ZipFile, distinfo: str, location: str):
+        location = os.path.normpath(location)
+        for info in wheel.infolist():
+            if info.is_dir() or not info.filename.startswith(distinfo + '/'):
+                continue
+            relname = info.filename[len(distinfo) + 1:]
+            if relname.upper().startswith(('LICENSE', 'LICENCE', 'COPYING', 'NOTICE')):
+                target = os.path.normpath(os.path.join(location, distinfo, relname))
+                if not target.startswith(location + os.sep):
+                    logging.warning("Not extracting '%s', which is outside the wheel",
+                                    info.filename)
+                    continue
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with wheel.open(info) as infile, open(target, 'wb') as outfile:
+                    outfile.write(infile.read())